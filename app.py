@@ -5,12 +5,46 @@ import tempfile
 
 import streamlit as st
 
-from uav_traffic_ai.ingest.media import read_image_bgr
-from uav_traffic_ai.ingest.traffic_dataset import load_scenes, list_scene_frames, sample_frames
+from uav_traffic_ai.blockchain.anchor_queue import VERIFIED, AnchorQueue, anchor_queue_from_settings
+from uav_traffic_ai.cache import ResultCache, cache_from_settings
+from uav_traffic_ai.ingest.media import image_encoding_from_settings, read_image_bgr
+from uav_traffic_ai.ingest.traffic_dataset import (
+    DatasetManifest,
+    dataset_manifest_from_settings,
+    list_scene_frames,
+    load_scenes,
+    sample_frames,
+)
+from uav_traffic_ai.reporting.catalog import EvidenceCatalog, catalog_from_settings
 from uav_traffic_ai.schemas import SceneMeta
-from uav_traffic_ai.settings import load_settings
-from uav_traffic_ai.pipeline import anchor_and_verify, persist_artifacts, run_analysis_on_image
-from uav_traffic_ai.vision.detector import YoloDetector
+from uav_traffic_ai.settings import AppSettings, load_settings
+from uav_traffic_ai.pipeline import persist_artifacts, run_analysis_on_image
+from uav_traffic_ai.vision.detector import detector_from_settings
+from uav_traffic_ai.vision.registry import default_registry
+
+
+@st.cache_resource
+def get_result_cache(_s: AppSettings) -> ResultCache | None:
+    # Una sola instancia por proceso: el índice LRU y las estadísticas sobreviven a los reruns.
+    return cache_from_settings(_s)
+
+
+@st.cache_resource
+def get_dataset_manifest(_s: AppSettings) -> DatasetManifest | None:
+    # Streamlit re-ejecuta el script en cada interacción: las listas de frames y scenes.csv se quedan en memoria
+    # y solo se re-escanea una escena si cambia el mtime de alguna de sus carpetas.
+    return dataset_manifest_from_settings(_s)
+
+
+@st.cache_resource
+def get_catalog(_s: AppSettings) -> EvidenceCatalog | None:
+    return catalog_from_settings(_s)
+
+
+@st.cache_resource
+def get_anchor_queue(_s: AppSettings) -> AnchorQueue:
+    # La cola emite y verifica en hilos de fondo: la UI no espera a la propagación en la red.
+    return anchor_queue_from_settings(_s, catalog=get_catalog(_s)).start()
 
 
 def main() -> None:
@@ -18,7 +52,17 @@ def main() -> None:
     st.set_page_config(page_title=s.app_name, layout="wide")
     st.title("UAV Traffic AI — Demo MVP")
 
-    detector = YoloDetector(weights=s.yolo_weights, conf=s.yolo_conf, iou=s.yolo_iou)
+    result_cache = get_result_cache(s)
+    anchor_queue = get_anchor_queue(s)
+
+    st.sidebar.header("Modelo")
+    conf = st.sidebar.slider("Confianza mínima (conf)", 0.05, 0.95, float(s.yolo_conf), 0.05)
+    iou = st.sidebar.slider("IoU del NMS", 0.10, 0.95, float(s.yolo_iou), 0.05)
+    # Registro del proceso: los pesos se cargan (y calientan) una vez; cambiar conf/iou no los recarga.
+    detector = detector_from_settings(s, conf=conf, iou=iou)
+    model_stats = default_registry().stats_for(detector)
+    if model_stats is not None:
+        st.sidebar.caption(model_stats.summary())
 
     st.sidebar.header("Entrada")
     mode = st.sidebar.radio("Modo", ["Subir imagen", "Dataset Traffic (escena)"])
@@ -40,14 +84,18 @@ def main() -> None:
             scene_meta = SceneMeta(scene_id="upload", scene_name="User Upload")
     else:
         try:
-            scenes = load_scenes(s.traffic_scenes_csv, s.traffic_dataset_dir)
+            manifest = get_dataset_manifest(s)
+            if manifest is not None:
+                scenes = manifest.scenes(s.traffic_scenes_csv, s.traffic_dataset_dir)
+            else:
+                scenes = load_scenes(s.traffic_scenes_csv, s.traffic_dataset_dir)
             scene_labels = [f"{x.scene_id} — {x.scene_name}" for x in scenes]
             choice = st.sidebar.selectbox("Escena", scene_labels)
             stride = st.sidebar.slider("Stride (1 = todos, 8 = 1/8)", 1, 30, 8)
             max_frames = st.sidebar.slider("Máx frames", 1, 200, 64)
 
             scene = scenes[scene_labels.index(choice)]
-            frames = list_scene_frames(scene.folder)
+            frames = manifest.frames(scene.folder) if manifest is not None else list_scene_frames(scene.folder)
             sampled = sample_frames(frames, stride=stride, max_frames=max_frames)
 
             frame_idx = st.sidebar.slider("Frame index", 0, len(sampled) - 1, 0)
@@ -65,6 +113,7 @@ def main() -> None:
 
     st.sidebar.header("Blockchain")
     do_anchor = st.sidebar.checkbox("Anclar en BSV testnet", value=False)
+    st.sidebar.caption(f"Cola de anclaje: {anchor_queue.counts()}")
 
     run = st.button("Analizar", type="primary", disabled=(img_path is None))
 
@@ -72,31 +121,18 @@ def main() -> None:
         img_bgr = read_image_bgr(img_path)
 
         # 1. Ejecutar análisis (CV + Métricas + Hash inicial)
-        evidence, annotated_png = run_analysis_on_image(
+        # La UI es donde se mira la imagen anotada: aquí sí se dibuja (formato de ANNOTATED_FORMAT)
+        encoding = image_encoding_from_settings(s)
+        evidence, annotated = run_analysis_on_image(
             img_bgr=img_bgr,
             scene=scene_meta,
             detector=detector,
-            model_weights=s.yolo_weights,
+            model_weights=detector.model_id,
+            cache=result_cache,
+            annotate=encoding,
         )
 
-        # 2. (OPCIONAL) Anclar antes de persistir
-        # Así el JSON guardado y mostrado ya incluye el TXID.
-        if do_anchor:
-            with st.spinner("Anclando en Blockchain (BSV Testnet)..."):
-                try:
-                    evidence = anchor_and_verify(
-                        evidence=evidence,
-                        chain_name=s.bsv_chain,
-                        wif=s.bsv_wif_testnet,
-                        dust_sats=s.bsv_dust_sats,
-                        woc_base=s.woc_base,
-                    )
-                    st.toast(f"Anclado correctamente! TXID: {evidence.txid[:8]}...", icon="🔗")
-                except Exception as e:
-                    st.error(f"Error en Blockchain: {e}")
-                    # No detenemos la ejecución, guardamos la evidencia aunque falle el anclaje
-
-        # 3. Definir nombre limpio para los archivos (Prefix)
+        # 2. Definir nombre limpio para los archivos (Prefix)
         if mode == "Subir imagen" and upload_orig_name:
             # Usamos el nombre original del archivo subido
             clean_stem = Path(upload_orig_name).stem
@@ -105,34 +141,48 @@ def main() -> None:
             # Usamos ID escena + nombre frame original
             prefix = f"{scene_meta.scene_id}_{img_path.stem}"
 
-        # 4. Persistir (Guardar JSON, CSV, PNG, SHA256)
+        # 3. Persistir (Guardar JSON, CSV, imagen anotada, SHA256)
         paths = persist_artifacts(
             artifacts_base=s.artifacts_dir,
             evidence=evidence,
-            annotated_png=annotated_png,
+            annotated_image=annotated,
             prefix=prefix,
+            encoding=encoding,
+            catalog=get_catalog(s),
         )
 
+        # 4. (OPCIONAL) Encolar el anclaje: la cola actualiza el JSON con txid/verified al terminar
+        job_id = None
+        if do_anchor:
+            job_id = anchor_queue.submit(evidence, paths["json"])
+            st.toast("Anclaje encolado en segundo plano", icon="🔗")
+
         # 5. Visualizar resultados finales
         col1, col2 = st.columns([1, 1])
 
         with col1:
             st.subheader("Imagen anotada")
-            st.image(annotated_png, use_container_width=True)
+            st.image(annotated, use_container_width=True)
             st.success(f"Archivos guardados en: {paths['json'].parent}")
+            if result_cache is not None:
+                cs = result_cache.stats
+                st.caption(f"Caché de resultados: {cs.hits} hits / {cs.misses} misses ({cs.hit_rate:.0%})")
 
         with col2:
             st.subheader("Métricas")
             st.json(evidence.metrics.model_dump())
 
             st.subheader("Evidencia Digital (JSON)")
-            # Ahora este JSON ya tiene el TXID si se activó el checkbox
             st.code(evidence.model_dump_json(indent=2), language="json")
             
-            if do_anchor and evidence.verified:
-                st.info(f"✅ **Verificado en Blockchain**\n\nTXID: `{evidence.txid}`")
-            elif do_anchor and not evidence.verified:
-                st.warning("⚠️ Transacción enviada pero no verificada aún (timeout en propagación).")
+            job = anchor_queue.job(job_id) if job_id else None
+            if job is not None and job.status == VERIFIED:
+                st.info(f"✅ **Verificado en Blockchain**\n\nTXID: `{job.txid}`")
+            elif job is not None:
+                st.warning(
+                    f"⏳ Anclaje en cola (estado: {job.status}). El JSON guardado se actualizará con el TXID "
+                    "al verificarse en WhatsOnChain."
+                )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,31 +1,361 @@
 from __future__ import annotations
 
 import argparse
+import json
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
-from uav_traffic_ai.ingest.media import read_image_bgr
-from uav_traffic_ai.schemas import SceneMeta
-from uav_traffic_ai.settings import load_settings
+from pydantic import ValidationError
+
+from uav_traffic_ai.blockchain.anchor_queue import anchor_queue_from_settings
+from uav_traffic_ai.blockchain.bulk_verify import bulk_verifier_from_settings
+from uav_traffic_ai.blockchain.merkle import (
+    BATCH_PREFIX,
+    BatchRootVerifier,
+    load_proof,
+    proof_path_for,
+    verify_proof_offline,
+)
+from uav_traffic_ai.cache import cache_from_settings
+from uav_traffic_ai.batch import resolve_path_frames, resolve_scene_frames, run_adaptive_batch, run_batch_pipeline
+from uav_traffic_ai.ingest.dedup import deduper_from_settings
+from uav_traffic_ai.ingest.media import IMAGE_FORMATS, PNG, ImageEncoding, image_encoding_from_settings, read_image_bgr
+from uav_traffic_ai.ingest.frame_cache import DecodedFrames, frame_cache_from_settings
+from uav_traffic_ai.ingest.sampling import sampling_config_from_settings
+from uav_traffic_ai.ingest.stream import FrameStream
+from uav_traffic_ai.ingest.traffic_dataset import dataset_manifest_from_settings
+from uav_traffic_ai.metrics.aggregation import TrafficRollup, rollup_from_settings, save_window_summary
+from uav_traffic_ai.profiling import Profiler, profiler_from_settings
+from uav_traffic_ai.reporting.catalog import (
+    EvidenceCatalog,
+    catalog_from_settings,
+    parse_since,
+    rebuild_catalog,
+    row_from_evidence,
+)
+from uav_traffic_ai.reporting.exporter import ensure_dirs, save_json, save_json_bytes
+from uav_traffic_ai.reporting.run_store import RunStore, run_store_from_settings
+from uav_traffic_ai.schemas import Evidence, SceneMeta
+from uav_traffic_ai.service import make_server, service_from_settings
+from uav_traffic_ai.settings import AppSettings, load_settings
+from uav_traffic_ai.sharding import run_sharded
 from uav_traffic_ai.pipeline import (
     anchor_and_verify,
+    anchor_batch_and_verify,
+    evidence_json_bytes,
+    export_run_store,
     persist_artifacts,
+    persist_batch_anchor,
     run_analysis_on_image,
+    run_analysis_on_stream,
+    recompute_evidence_sha256,
+    store_batch_anchor,
 )
-from uav_traffic_ai.vision.detector import YoloDetector
+from uav_traffic_ai.tracking.tracker import CountingLine, IouTracker
+from uav_traffic_ai.vision.detector import Detector, detector_from_settings, tile_config_from_settings
+from uav_traffic_ai.vision.registry import default_registry
 
 
-def main() -> None:
-    s = load_settings()
+def _load_detector(s: AppSettings) -> Detector:
+    detector = detector_from_settings(s)
+    stats = default_registry().stats_for(detector)
+    if stats is not None:
+        print(stats.summary())
+    return detector
+
+
+def _add_profile_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Medir tiempos por etapa (como PROFILE=1): tabla al terminar, PROFILE_DIR/<run>.json y metrics.prom.",
+    )
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--image", type=str, required=True, help="Ruta a imagen (png/jpg).")
+
+def _save_profile(s: AppSettings, profiler: Profiler, command: str) -> None:
+    run_name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}_{command}"
+    paths = profiler.save(s.profile_dir, run_name)
+    print(profiler.format_table())
+    print(f"Perfil: {paths['json']} ({paths['prometheus'].name})")
+
+
+def _add_dedup_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Frames casi iguales al último inferido reutilizan sus detecciones (como DEDUP=1; umbrales DEDUP_*).",
+    )
+
+
+def _add_scene_args(parser: argparse.ArgumentParser) -> None:
     parser.add_argument("--scene-id", type=str, default=None)
     parser.add_argument("--scene-name", type=str, default=None)
     parser.add_argument("--lat", type=float, default=None)
     parser.add_argument("--lon", type=float, default=None)
-    parser.add_argument("--anchor", action="store_true", help="Anclar hash en BSV testnet.")
-    args = parser.parse_args()
 
+
+def _make_tracker(args: argparse.Namespace) -> IouTracker | None:
+    if not args.track:
+        return None
+    lines = [CountingLine.parse(spec, name=f"line{i + 1}") for i, spec in enumerate(args.line or [])]
+    return IouTracker(lines=lines)
+
+
+def _save_flow(s: AppSettings, scene: SceneMeta, tracker: IouTracker, fps: float | None) -> None:
+    flow = tracker.summary(fps=fps)
+    out = ensure_dirs(s.artifacts_dir)["outputs"] / f"{scene.scene_id or 'run'}_flow.json"
+    save_json(out, flow.model_dump(mode="json"))
+    print(f"Flujo: {out} únicos={flow.unique_counts_by_typology} cruces={flow.line_crossings}")
+
+
+def _add_track_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--track", action="store_true", help="Tracking multi-frame: vehículos únicos y flujo.")
+    parser.add_argument(
+        "--line", type=str, action="append", help="Línea de conteo x1,y1,x2,y2 (px). Se puede repetir."
+    )
+
+
+def _add_annotate_args(parser: argparse.ArgumentParser, s: AppSettings) -> None:
+    parser.add_argument(
+        "--annotate",
+        nargs="?",
+        const=s.annotated_format,
+        default=None,
+        choices=IMAGE_FORMATS,
+        help=f"Generar la imagen anotada (por defecto no: headless). Sin valor usa ANNOTATED_FORMAT={s.annotated_format}.",
+    )
+
+
+def _annotation(s: AppSettings, args: argparse.Namespace) -> ImageEncoding | None:
+    return image_encoding_from_settings(s, args.annotate) if args.annotate else None
+
+
+def _add_run_store_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--run-store",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="NOMBRE",
+        help="Guardar el run en ARTIFACTS_DIR/runs/<NOMBRE> (pocos ficheros grandes) en vez de ficheros por frame. "
+        "Sin nombre: <escena>_<fecha UTC>. Los ficheros por frame se sacan después con `main.py export`.",
+    )
+
+
+def _open_run_store(s: AppSettings, args: argparse.Namespace, scene_id: str | None) -> RunStore | None:
+    if args.run_store is None:
+        return None
+    name = args.run_store or f"{scene_id or 'run'}_{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+    return run_store_from_settings(s, name)
+
+
+def _add_to_rollup(
+    rollup: TrafficRollup | None, evidences: list, args: argparse.Namespace, positions: list[int] | None = None
+) -> None:
+    if rollup is None:
+        return
+    # con --fps la ventana es la posición en la escena (frame * stride / fps); sin él, created_at_utc.
+    # positions: índice de cada evidencia en la escena cuando no van a intervalos fijos (--adaptive)
+    dt = max(1, args.stride) / args.fps if args.fps else None
+    for i, e in enumerate(evidences):
+        pos = positions[i] if positions is not None else i
+        rollup.add(e, t=pos * dt if dt else None)
+
+
+def _window_time(value: str) -> float:
+    # segundos (posición en el vídeo, o epoch) o fecha ISO/relativa como en `catalog`
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(parse_since(value).replace("Z", "+00:00")).timestamp()
+
+
+def _decoded_scenes(s: AppSettings, args: argparse.Namespace, scenes: list) -> list[DecodedFrames | None]:
+    if not args.frame_cache:
+        return [None] * len(scenes)
+    frame_cache = frame_cache_from_settings(s)
+    if frame_cache is None:
+        raise SystemExit("Caché de frames desactivada (FRAME_CACHE_MAX_GB=0)")
+    if frame_cache.size > 0:
+        # las evidencias se sellan con el tamaño, las cajas y la ocupación del frame: deben ser los del original
+        raise SystemExit(
+            "--frame-cache guarda evidencias: necesita FRAME_CACHE_SIZE=0 (los frames reducidos o con letterbox "
+            "cambiarían el tamaño de imagen, las cajas y las métricas de la evidencia)"
+        )
+    out: list[DecodedFrames | None] = []
+    for scene, frames in scenes:
+        t0 = time.perf_counter()
+        decoded = frame_cache.get(frames)
+        state = "hit"
+        if decoded is None:
+            decoded, state = frame_cache.build(frames), "construida"
+        print(f"Caché de frames [{scene.scene_id}]: {state} {decoded.path.name} ({time.perf_counter() - t0:.2f}s)")
+        out.append(decoded)
+    return out
+
+
+def _anchor_scene(
+    s: AppSettings,
+    scene: SceneMeta,
+    evidences: list,
+    paths: list,
+    store: RunStore | None = None,
+    catalog: EvidenceCatalog | None = None,
+) -> None:
+    # Una sola tx por escena: se ancla la raíz Merkle y cada JSON guarda su prueba de inclusión.
+    evidences, proofs = anchor_batch_and_verify(
+        evidences=evidences,
+        chain_name=s.bsv_chain,
+        wif=s.bsv_wif_testnet,
+        dust_sats=s.bsv_dust_sats,
+        woc_base=s.woc_base,
+        scene_id=scene.scene_id,
+    )
+    if store is not None:
+        store_batch_anchor(store=store, evidences=evidences, proofs=proofs, catalog=catalog)
+    else:
+        persist_batch_anchor(evidences=evidences, paths=paths, proofs=proofs, catalog=catalog)
+    print(f"TXID lote [{scene.scene_id}]: {evidences[0].txid} raíz={proofs[0].root} (verified={evidences[0].verified})")
+
+
+def run_verify_batch(s: AppSettings, args: argparse.Namespace) -> None:
+    target = Path(args.json)
+    json_paths = (
+        sorted(p for p in target.glob("*.json") if not p.name.endswith(".merkle.json")) if target.is_dir() else [target]
+    )
+    verifier = BatchRootVerifier(woc_base=s.woc_base, chain_name=s.bsv_chain)
+
+    n_ok = 0
+    for jp in json_paths:
+        if not proof_path_for(jp).exists():
+            continue
+        evidence = Evidence.model_validate_json(jp.read_text(encoding="utf-8"))
+        # el sha256 del JSON no basta: se recalcula del contenido antes de mirar la prueba y la cadena
+        if recompute_evidence_sha256(evidence) != evidence.sha256:
+            print(f"❌ {jp.name} (el contenido no coincide con su sha256)")
+            continue
+        ok = verifier.verify(evidence.sha256, load_proof(jp))
+        n_ok += int(ok)
+        print(f"{'✅' if ok else '❌'} {jp.name}")
+    print(f"verificadas={n_ok} consultas a WhatsOnChain={verifier.lookups}")
+
+
+def _content_matches_sha256(data: dict) -> bool:
+    try:
+        return recompute_evidence_sha256(Evidence.model_validate(data)) == data["sha256"]
+    except ValidationError:
+        return False  # ya no es una Evidence válida: tampoco coincide con lo que se ancló
+
+
+def run_reverify(s: AppSettings, args: argparse.Namespace) -> None:
+    # Re-verificación masiva de un archivo de evidencias: una consulta por txid distinto, en paralelo,
+    # y las txs ya confirmadas salen de la caché local sin tocar la red.
+    json_paths = sorted(p for p in Path(args.dir).rglob("*.json") if not p.name.endswith(".merkle.json"))
+    items = []  # (json_path, evidence dict, txid, hash esperado en el OP_RETURN, prefijo esperado)
+    offline_bad = []  # (json_path, evidence dict) que fallan sin consultar la red: contenido editado o prueba inválida
+    for jp in json_paths:
+        data = json.loads(jp.read_text(encoding="utf-8"))
+        if not isinstance(data, dict) or not data.get("sha256"):
+            continue  # no es una evidencia (p.ej. *_flow.json)
+        if not (proof_path_for(jp).exists() or data.get("txid")):
+            continue  # sin anclar
+        # el sha256 del JSON no basta: se recalcula del contenido antes de mirar la prueba y la cadena
+        if not _content_matches_sha256(data):
+            offline_bad.append((jp, data))
+            print(f"❌ {jp.name} (el contenido no coincide con su sha256)")
+            continue
+        if proof_path_for(jp).exists():
+            proof = load_proof(jp)
+            if not verify_proof_offline(data["sha256"], proof) or not proof.txid:
+                offline_bad.append((jp, data))
+                print(f"❌ {jp.name} (prueba Merkle inválida)")
+                continue
+            items.append((jp, data, proof.txid, proof.root, BATCH_PREFIX))
+        else:
+            items.append((jp, data, data["txid"], data["sha256"], None))
+
+    verifier = bulk_verifier_from_settings(
+        s, use_cache=not args.no_cache, concurrency=args.concurrency, max_rps=args.max_rps
+    )
+    try:
+        results = verifier.verify_many([(txid, expected, prefix) for _, _, txid, expected, prefix in items])
+    finally:
+        verifier.close()
+
+    catalog = catalog_from_settings(s) if args.update else None
+    updates = [(jp, data, False) for jp, data in offline_bad]
+    n_ok = 0
+    for (jp, data, txid, _, _), res in zip(items, results):
+        n_ok += int(res.ok)
+        if not res.ok or args.verbose:
+            print(f"{'✅' if res.ok else '❌'} {jp.name} txid={txid} {verifier.errors.get(txid, '')}".rstrip())
+        updates.append((jp, data, res.ok))
+    if args.update:
+        for jp, data, ok in updates:
+            if data.get("verified") != ok:
+                data["verified"] = ok
+                save_json(jp, data)
+                if catalog is not None:
+                    catalog.set_verified(data["sha256"], ok)
+
+    st = verifier.stats
+    print(f"verificadas={n_ok}/{len(items) + len(offline_bad)} txids={st.unique_txids} wall={st.wall_s:.2f}s")
+    print(
+        f"  WhatsOnChain: consultas={st.fetched} caché={st.cache_hits} no_encontradas={st.not_found} "
+        f"429={st.rate_limited} errores={st.errors}"
+    )
+
+
+def run_anchor_worker(s: AppSettings, args: argparse.Namespace) -> None:
+    queue = anchor_queue_from_settings(s, on_done=lambda j: print(f"[{j.status}] {Path(j.json_path).name} txid={j.txid}"))
+    print(f"Cola: {s.anchor_queue_dir} {queue.counts()}")
+    queue.start()
+    try:
+        if args.once:
+            queue.drain()
+        else:
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.stop()
+    print(f"Cola: {queue.counts()}")
+
+
+def run_serve(s: AppSettings, args: argparse.Namespace) -> None:
+    catalog = catalog_from_settings(s)
+    service = service_from_settings(
+        s,
+        detector=_load_detector(s),
+        max_batch=args.max_batch or s.service_max_batch,
+        max_wait_ms=s.service_max_wait_ms if args.max_wait_ms is None else args.max_wait_ms,
+        annotate=_annotation(s, args),
+        cache=None if args.no_cache else cache_from_settings(s),
+        catalog=catalog,
+        anchor_queue=None if args.no_anchor_queue else anchor_queue_from_settings(s, catalog=catalog),
+    )
+    host = args.host or s.service_host
+    port = s.service_port if args.port is None else args.port
+    server = make_server(service, host, port)
+    service.start()
+    print(
+        f"Escuchando en http://{host}:{server.server_address[1]} "
+        f"(lotes de hasta {service.batcher.max_batch} frames, espera máx {1000 * service.batcher.max_wait_s:g} ms)"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    st = service.batcher.stats
+    print(f"peticiones={st.requests} lotes={st.batches} frames/lote={st.mean_batch:.2f} máx={st.largest_batch}")
+
+
+def run_single(s: AppSettings, args: argparse.Namespace) -> None:
     img_path = Path(args.image).resolve()
     img_bgr = read_image_bgr(img_path)
 
@@ -36,25 +366,28 @@ def main() -> None:
         lon=args.lon,
     )
 
-    detector = YoloDetector(
-        weights=s.yolo_weights,
-        conf=s.yolo_conf,
-        iou=s.yolo_iou,
-    )
+    # una sola imagen: la inferencia de calentamiento sería un frame extra
+    detector = detector_from_settings(s, warmup=False)
 
-    evidence, annotated_png = run_analysis_on_image(
+    annotate = _annotation(s, args)
+    evidence, annotated = run_analysis_on_image(
         img_bgr=img_bgr,
         scene=scene,
         detector=detector,
-        model_weights=s.yolo_weights,
+        model_weights=detector.model_id,
+        cache=cache_from_settings(s),
+        annotate=annotate,
     )
 
     prefix = img_path.stem
+    catalog = catalog_from_settings(s)
     paths = persist_artifacts(
         artifacts_base=s.artifacts_dir,
         evidence=evidence,
-        annotated_png=annotated_png,
+        annotated_image=annotated,
         prefix=prefix,
+        encoding=annotate or PNG,
+        catalog=catalog,
     )
 
     if args.anchor:
@@ -65,16 +398,527 @@ def main() -> None:
             dust_sats=s.bsv_dust_sats,
             woc_base=s.woc_base,
         )
-        # re-guardar JSON con txid/verified
-        (paths["json"]).write_text(evidence.model_dump_json(indent=2), encoding="utf-8")
+        # re-guardar JSON con txid/verified (mismo formato canónico que persist_artifacts)
+        save_json_bytes(paths["json"], evidence_json_bytes(evidence))
+        if catalog is not None:
+            catalog.set_anchors([evidence])
+    elif args.anchor_async:
+        # solo se registra el trabajo: lo emite/verifica `main.py anchor-worker` (o la UI)
+        job_id = anchor_queue_from_settings(s).submit(evidence, paths["json"])
+        print(f"Anclaje encolado: {job_id} ({s.anchor_queue_dir})")
 
     print("✅ OK")
     print(f"JSON: {paths['json']}")
-    print(f"PNG:  {paths['png']}")
+    if "image" in paths:
+        print(f"IMG:  {paths['image']}")
     print(f"HASH: {paths['sha256']}")
     if evidence.txid:
         print(f"TXID: {evidence.txid} (verified={evidence.verified})")
 
 
+def run_batch(s: AppSettings, args: argparse.Namespace) -> None:
+    # con --adaptive se resuelve la escena completa: el sampler elige los frames y --max-frames es el presupuesto
+    stride, max_frames = (1, None) if args.adaptive else (args.stride, args.max_frames)
+    if args.scene:
+        manifest = dataset_manifest_from_settings(s)
+        scenes = [
+            resolve_scene_frames(
+                scene_id=scene_id,
+                scenes_csv=s.traffic_scenes_csv,
+                dataset_dir=s.traffic_dataset_dir,
+                stride=stride,
+                max_frames=max_frames,
+                manifest=manifest,
+            )
+            for scene_id in args.scene
+        ]
+    else:
+        frames = resolve_path_frames(args.input)
+        frames = frames[:: max(1, stride)][: max_frames or len(frames)]
+        scene = SceneMeta(
+            scene_id=args.scene_id or (Path(args.input).name if Path(args.input).is_dir() else "batch"),
+            scene_name=args.scene_name,
+            lat=args.lat,
+            lon=args.lon,
+        )
+        scenes = [(scene, frames)]
+
+    batch_size = args.batch_size or s.yolo_batch_size
+    catalog = catalog_from_settings(s)
+    rollup = rollup_from_settings(s)
+    decoded = _decoded_scenes(s, args, scenes)
+
+    if args.workers > 1:
+        results, shard_stats = run_sharded(
+            scenes=scenes,
+            workers=args.workers,
+            weights=s.yolo_weights,
+            conf=s.yolo_conf,
+            iou=s.yolo_iou,
+            batch_size=batch_size,
+            artifacts_base=s.artifacts_dir,
+            tiling=tile_config_from_settings(s),
+            backend=s.detector_backend,
+            model_path=s.detector_model_path,
+            annotate=_annotation(s, args),
+            decoded=decoded,
+        )
+        if catalog is not None:
+            # los workers solo escriben ficheros: el catálogo se actualiza aquí, en una transacción
+            catalog.add_rows(
+                row_from_evidence(r.evidence, path=r.paths["json"], prefix=r.paths["json"].stem)
+                for r in results
+                if r.paths
+            )
+        if rollup is not None:
+            for scene, _ in scenes:
+                _add_to_rollup(rollup, [r.evidence for r in results if r.scene_id == scene.scene_id], args)
+            rollup.flush()
+        print("✅ OK")
+        print(f"Salida: {s.artifacts_dir / 'outputs'} ({len(results)} evidencias)")
+        print(f"workers={shard_stats.workers} wall={shard_stats.wall_s:.2f}s fps={shard_stats.fps:.2f}")
+        if args.anchor:
+            for scene, _ in scenes:
+                scene_results = [r for r in results if r.scene_id == scene.scene_id]
+                if scene_results:
+                    _anchor_scene(
+                        s,
+                        scene,
+                        [r.evidence for r in scene_results],
+                        [r.paths for r in scene_results],
+                        catalog=catalog,
+                    )
+        if args.track:
+            # el merge sale ordenado por (escena, frame): trackeamos después, escena a escena
+            for scene, _ in scenes:
+                tracker = _make_tracker(args)
+                scene_results = [r for r in results if r.scene_id == scene.scene_id]
+                for i, r in enumerate(scene_results):
+                    tracker.update_from_detections(r.evidence.detections, frame_index=i)
+                _save_flow(s, scene, tracker, fps=args.fps / max(1, args.stride) if args.fps else None)
+        return
+
+    detector = _load_detector(s)
+    cache = None if args.no_cache else cache_from_settings(s)
+    # un único store para todas las escenas del run (los prefijos ya llevan el scene_id)
+    store = _open_run_store(s, args, scenes[0][0].scene_id if len(scenes) == 1 else "batch")
+
+    try:
+        for (scene, frames), scene_decoded in zip(scenes, decoded):
+            tracker = _make_tracker(args)
+            # uno por escena; con --adaptive los frames no llegan seguidos y no hay duplicados que buscar
+            deduper = None if args.adaptive else deduper_from_settings(s, enabled=args.dedup)
+            sampler, positions = None, None
+            if args.adaptive:
+                sampled, stats, sampler = run_adaptive_batch(
+                    frame_paths=frames,
+                    scene=scene,
+                    detector=detector,
+                    model_weights=detector.model_id,
+                    artifacts_base=s.artifacts_dir,
+                    sampling=sampling_config_from_settings(s, budget=args.max_frames, round_size=batch_size),
+                    batch_size=batch_size,
+                    queue_size=args.queue_size,
+                    cache=cache,
+                    annotate=_annotation(s, args),
+                    store=store,
+                    catalog=catalog,
+                )
+                written = [(e, p) for _, e, p in sampled]
+                positions = [i for i, _, _ in sampled]
+            else:
+                written, stats = run_batch_pipeline(
+                    frame_paths=frames,
+                    scene=scene,
+                    detector=detector,
+                    model_weights=detector.model_id,
+                    artifacts_base=s.artifacts_dir,
+                    batch_size=batch_size,
+                    queue_size=args.queue_size,
+                    cache=cache,
+                    tracker=tracker,
+                    annotate=_annotation(s, args),
+                    store=store,
+                    catalog=catalog,
+                    decoded=scene_decoded,
+                    deduper=deduper,
+                )
+
+            if args.anchor and written:
+                _anchor_scene(s, scene, [e for e, _ in written], [p for _, p in written], store, catalog)
+            _add_to_rollup(rollup, [e for e, _ in written], args, positions)
+
+            print(f"✅ OK [{scene.scene_id}]")
+            out_dir = store.root if store is not None else s.artifacts_dir / "outputs"
+            print(f"Salida: {out_dir} ({len(written)} evidencias)")
+            print(stats.summary())
+            if cache is not None:
+                cs = cache.stats
+                print(f"  caché: hits={cs.hits} misses={cs.misses} evictions={cs.evictions} ({cs.hit_rate:.0%})")
+            if deduper is not None:
+                print(deduper.stats.summary())
+            if sampler is not None:
+                print(f"  muestreo adaptativo: {len(written)}/{len(frames)} frames analizados")
+                print(sampler.estimate().summary())
+            if tracker is not None:
+                # los frames de la escena no llevan timestamp: la duración sale de --fps / stride
+                _save_flow(s, scene, tracker, fps=args.fps / max(1, args.stride) if args.fps else None)
+    finally:
+        if store is not None:
+            store.close()
+        if rollup is not None:
+            rollup.flush()
+
+
+def run_stream(s: AppSettings, args: argparse.Namespace) -> None:
+    stream = FrameStream(
+        args.source,
+        target_fps=args.target_fps,
+        max_buffer=args.buffer,
+        realtime=args.realtime,
+    )
+    scene = SceneMeta(
+        scene_id=args.scene_id or "stream",
+        scene_name=args.scene_name,
+        lat=args.lat,
+        lon=args.lon,
+    )
+    detector = _load_detector(s)
+    tracker = _make_tracker(args)
+    store = _open_run_store(s, args, scene.scene_id)
+    rollup = rollup_from_settings(s)
+    deduper = deduper_from_settings(s, enabled=args.dedup)
+    window = None
+
+    n = 0
+    try:
+        for evidence, paths in run_analysis_on_stream(
+            stream=stream,
+            scene=scene,
+            detector=detector,
+            model_weights=detector.model_id,
+            artifacts_base=s.artifacts_dir,
+            batch_size=args.batch_size,
+            annotate=_annotation(s, args),
+            store=store,
+            catalog=catalog_from_settings(s),
+            deduper=deduper,
+        ):
+            n += 1
+            src = evidence.source
+            if tracker is not None:
+                tracker.update_from_detections(
+                    evidence.detections,
+                    frame_index=src.frame_index if src else n,
+                    timestamp_s=src.timestamp_s if src else None,
+                )
+            if rollup is not None:
+                rollup.add(evidence)
+                # al cerrar cada ventana se vuelca: un feed en vivo se puede consultar mientras corre
+                if window is not None and window != rollup.window_of(evidence):
+                    rollup.flush()
+                window = rollup.window_of(evidence)
+            if src is not None:
+                out = paths["json"].name if "json" in paths else f"{paths['run'].name} sha256={evidence.sha256[:16]}"
+                print(f"[{src.frame_index:06d} @ {src.timestamp_s:8.2f}s] {out}")
+            if args.max_frames and n >= args.max_frames:
+                break
+    finally:
+        if store is not None:
+            store.close()
+        if rollup is not None:
+            rollup.flush()
+
+    st = stream.stats
+    print("✅ OK")
+    print(
+        f"leídos={st.read} procesados={st.yielded} "
+        f"descartados_fps={st.skipped_fps} descartados_backpressure={st.dropped_backpressure}"
+    )
+    if deduper is not None:
+        print(deduper.stats.summary())
+    if tracker is not None:
+        _save_flow(s, scene, tracker, fps=None)
+
+
+def run_export(s: AppSettings, args: argparse.Namespace) -> None:
+    root = Path(args.run)
+    if not root.exists():
+        root = s.artifacts_dir / "runs" / args.run
+    store = RunStore(root, readonly=True)
+    out_base = Path(args.out) if args.out else s.artifacts_dir
+    written = export_run_store(store=store, artifacts_base=out_base, prefixes=args.prefix)
+    print("✅ OK")
+    print(f"Exportadas {len(written)}/{len(store)} evidencias de {root} a {out_base / 'outputs'}")
+
+
+def run_catalog(s: AppSettings, args: argparse.Namespace) -> None:
+    catalog = catalog_from_settings(s)
+    if catalog is None:
+        raise SystemExit("Catálogo desactivado (EVIDENCE_CATALOG_PATH=0)")
+    min_counts = {}
+    for spec in args.min_count or []:
+        typology, _, n = spec.partition("=")
+        min_counts[typology] = int(n or 1)
+    t0 = time.perf_counter()
+    rows = catalog.query(
+        scene_id=args.scene_id,
+        since=parse_since(args.since) if args.since else None,
+        until=parse_since(args.until) if args.until else None,
+        sha256=args.sha256,
+        txid=args.txid,
+        verified=True if args.verified else (False if args.unverified else None),
+        anchored=True if args.anchored else (False if args.not_anchored else None),
+        min_counts=min_counts,
+        limit=args.limit,
+    )
+    elapsed_ms = 1000 * (time.perf_counter() - t0)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    for r in rows:
+        counts = " ".join(f"{k}={v}" for k, v in sorted(r["counts"].items()))
+        state = "sin anclar" if r["txid"] is None else ("verificada" if r["verified"] else "NO verificada")
+        print(f"{r['created_at_utc']} {r['scene_id'] or '-'} {r['prefix']} {r['sha256'][:16]} [{state}] {counts}")
+    print(f"{len(rows)} evidencias ({elapsed_ms:.1f} ms) catálogo={catalog.path} total={len(catalog)}")
+
+
+def run_catalog_rebuild(s: AppSettings, args: argparse.Namespace) -> None:
+    catalog = catalog_from_settings(s)
+    if catalog is None:
+        raise SystemExit("Catálogo desactivado (EVIDENCE_CATALOG_PATH=0)")
+    if args.clear:
+        catalog.clear()
+    t0 = time.perf_counter()
+    n = rebuild_catalog(catalog, Path(args.dir) if args.dir else s.artifacts_dir, workers=args.workers)
+    print("✅ OK")
+    print(f"{n} evidencias indexadas en {time.perf_counter() - t0:.2f}s catálogo={catalog.path} total={len(catalog)}")
+
+
+def run_dataset_index(s: AppSettings, args: argparse.Namespace) -> None:
+    manifest = dataset_manifest_from_settings(s)
+    if manifest is None:
+        raise SystemExit("Manifest desactivado (DATASET_MANIFEST_PATH=0)")
+    if args.workers:
+        manifest.workers = args.workers
+    t0 = time.perf_counter()
+    scenes = manifest.scenes(s.traffic_scenes_csv, s.traffic_dataset_dir)
+    scanned = manifest.refresh(sc.folder for sc in scenes)
+    elapsed = time.perf_counter() - t0
+    total = 0
+    for sc in scenes:
+        try:
+            n = len(manifest.frames(sc.folder))
+        except FileNotFoundError:
+            n = 0
+        total += n
+        print(f"{sc.scene_id:<12} {n:7d} frames  {sc.folder}")
+    print("✅ OK")
+    print(f"{len(scenes)} escenas, {total} frames; re-escaneadas {scanned} en {elapsed:.2f}s ({manifest.path})")
+
+
+def run_rollup(s: AppSettings, args: argparse.Namespace) -> None:
+    rollup = rollup_from_settings(s)
+    if rollup is None:
+        raise SystemExit("Agregados desactivados (ROLLUP_WINDOW_S=0)")
+    if args.compact:
+        print(f"Compactado {rollup.path}: {rollup.compact()} filas")
+    t0 = time.perf_counter()
+    rows = rollup.windows(
+        scene_id=args.scene_id,
+        run_id=args.run,
+        start=_window_time(args.since) if args.since else None,
+        end=_window_time(args.until) if args.until else None,
+        window_s=args.window,
+    )
+    elapsed_ms = 1000 * (time.perf_counter() - t0)
+    if args.out:
+        save_window_summary(Path(args.out), rows)
+        print(f"Tabla: {args.out}")
+    else:
+        for r in rows:
+            st = r.stats
+            counts = " ".join(f"{t}={v:.2f}" for t, v in st.mean_counts().items())
+            run = f" run={r.run_id}" if r.run_id else ""
+            print(
+                f"{r.summary()['window_start']} {r.scene_id}{run} frames={st.frames} "
+                f"densidad={st.mean_density:.2f}/{st.density_max:.2f} ocupación_pico={st.occupancy_max:.4f} {counts}"
+            )
+    window_s = args.window or rollup.window_s
+    print(f"{len(rows)} ventanas de {window_s:g}s ({elapsed_ms:.1f} ms) fichero={rollup.path}")
+
+
+def main() -> None:
+    s = load_settings()
+
+    # sin abreviaturas: el parser principal vería `batch --scene` como prefijo ambiguo de --scene-id/--scene-name
+    parser = argparse.ArgumentParser(allow_abbrev=False)
+    parser.add_argument("--image", type=str, default=None, help="Ruta a imagen (png/jpg).")
+    _add_scene_args(parser)
+    _add_annotate_args(parser, s)
+    anchor_mode = parser.add_mutually_exclusive_group()
+    anchor_mode.add_argument("--anchor", action="store_true", help="Anclar hash en BSV testnet.")
+    anchor_mode.add_argument(
+        "--anchor-async", action="store_true", help="Encolar el anclaje (no bloquea); lo procesa anchor-worker."
+    )
+    _add_profile_args(parser)
+
+    sub = parser.add_subparsers(dest="command")
+    p_batch = sub.add_parser("batch", help="Procesar una escena completa o un directorio/glob de frames.")
+    src = p_batch.add_mutually_exclusive_group(required=True)
+    src.add_argument("--scene", type=str, nargs="+", help="Sequence(s) de scenes.csv (p.ej. sec2).")
+    src.add_argument("--input", type=str, help="Directorio o patrón glob de imágenes.")
+    _add_scene_args(p_batch)
+    p_batch.add_argument("--stride", type=int, default=1)
+    p_batch.add_argument("--max-frames", type=int, default=None, help="Con --adaptive, presupuesto por escena.")
+    p_batch.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Muestreo adaptativo en vez de --stride: densifica donde cambian las métricas (SAMPLING_BUDGET).",
+    )
+    p_batch.add_argument("--batch-size", type=int, default=None, help="Por defecto YOLO_BATCH_SIZE.")
+    p_batch.add_argument("--queue-size", type=int, default=32, help="Frames en vuelo entre etapas.")
+    p_batch.add_argument("--workers", type=int, default=1, help="N procesos (>1 activa el modo sharded).")
+    p_batch.add_argument("--no-cache", action="store_true", help="Ignorar la caché de resultados.")
+    p_batch.add_argument(
+        "--frame-cache",
+        action="store_true",
+        help="Leer los frames ya decodificados de FRAME_CACHE_DIR (se crea en la primera pasada): barridos repetidos.",
+    )
+    _add_annotate_args(p_batch, s)
+    _add_run_store_args(p_batch)
+    _add_track_args(p_batch)
+    _add_dedup_args(p_batch)
+    p_batch.add_argument("--anchor", action="store_true", help="Anclar una raíz Merkle por escena en BSV testnet.")
+    p_batch.add_argument("--fps", type=float, default=None, help="FPS de captura de la escena (para el flujo/min).")
+    _add_profile_args(p_batch)
+
+    p_stream = sub.add_parser("stream", help="Procesar un vídeo (mp4...) o un feed en vivo (rtsp://, cámara).")
+    p_stream.add_argument("--source", type=str, required=True, help="Fichero de vídeo, URL o índice de cámara.")
+    _add_scene_args(p_stream)
+    p_stream.add_argument("--target-fps", type=float, default=None, help="FPS a analizar (decima la fuente).")
+    p_stream.add_argument("--buffer", type=int, default=8, help="Frames máximos en cola entre lector e inferencia.")
+    p_stream.add_argument("--realtime", action="store_true", help="Reproducir el fichero a su ritmo, como un feed en vivo.")
+    p_stream.add_argument("--batch-size", type=int, default=1)
+    p_stream.add_argument("--max-frames", type=int, default=None)
+    _add_annotate_args(p_stream, s)
+    _add_run_store_args(p_stream)
+    _add_track_args(p_stream)
+    _add_dedup_args(p_stream)
+    _add_profile_args(p_stream)
+
+    p_ex = sub.add_parser("export", help="Sacar los ficheros por frame (JSON/CSV/sha256/imagen) de un run store.")
+    p_ex.add_argument("--run", type=str, required=True, help="Nombre en ARTIFACTS_DIR/runs o ruta del run.")
+    p_ex.add_argument("--prefix", type=str, nargs="+", default=None, help="Solo estos frames (por defecto todos).")
+    p_ex.add_argument("--out", type=str, default=None, help="Directorio base de salida (por defecto ARTIFACTS_DIR).")
+
+    p_cat = sub.add_parser("catalog", help="Buscar evidencias en el catálogo (escena, fechas, hash, txid, estado).")
+    p_cat.add_argument("--scene-id", type=str, default=None)
+    p_cat.add_argument("--since", type=str, default=None, help="Fecha ISO o relativa: 7d, 24h, 30m.")
+    p_cat.add_argument("--until", type=str, default=None, help="Fecha ISO o relativa (excluida).")
+    p_cat.add_argument("--sha256", type=str, default=None)
+    p_cat.add_argument("--txid", type=str, default=None)
+    verified = p_cat.add_mutually_exclusive_group()
+    verified.add_argument("--verified", action="store_true", help="Solo ancladas y verificadas.")
+    verified.add_argument("--unverified", action="store_true", help="Sin anclar o con la verificación fallida.")
+    anchored = p_cat.add_mutually_exclusive_group()
+    anchored.add_argument("--anchored", action="store_true", help="Solo con txid.")
+    anchored.add_argument("--not-anchored", action="store_true", help="Solo sin txid.")
+    p_cat.add_argument(
+        "--min-count", type=str, action="append", help="tipología=N (p.ej. heavy=3): al menos N cajas. Repetible."
+    )
+    p_cat.add_argument("--limit", type=int, default=100, help="0 = sin límite.")
+    p_cat.add_argument("--json", action="store_true", help="Salida JSON (con rutas y conteos).")
+
+    p_cr = sub.add_parser("catalog-rebuild", help="Reconstruir el catálogo recorriendo un directorio de artefactos.")
+    p_cr.add_argument("--dir", type=str, default=None, help="Por defecto ARTIFACTS_DIR (JSON por frame y run stores).")
+    p_cr.add_argument("--workers", type=int, default=0, help="Procesos para parsear (0 = nº de CPUs).")
+    p_cr.add_argument("--clear", action="store_true", help="Vaciar antes el catálogo (quita ficheros ya borrados).")
+
+    p_di = sub.add_parser("dataset-index", help="Precalcular el índice de frames de todas las escenas del dataset.")
+    p_di.add_argument("--workers", type=int, default=0, help="Hilos para escanear carpetas (0 = automático).")
+
+    p_ru = sub.add_parser("rollup", help="Series por escena y ventana: densidad media, ocupación pico, conteos.")
+    p_ru.add_argument("--scene-id", type=str, default=None)
+    p_ru.add_argument("--run", type=str, default=None, help="Solo las ventanas relativas de ese run (run_id).")
+    p_ru.add_argument("--window", type=float, default=None, help="Segundos (múltiplo de ROLLUP_WINDOW_S).")
+    p_ru.add_argument("--since", type=str, default=None, help="Segundos (vídeo/epoch) o fecha ISO/relativa (7d, 24h).")
+    p_ru.add_argument("--until", type=str, default=None, help="Igual que --since (excluido).")
+    p_ru.add_argument("--out", type=str, default=None, help="Exportar la tabla (CSV) en vez de listarla.")
+    p_ru.add_argument("--compact", action="store_true", help="Combinar antes las filas parciales del fichero.")
+
+    p_vb = sub.add_parser("verify-batch", help="Verificar evidencias ancladas por lote (prueba Merkle + raíz on-chain).")
+    p_vb.add_argument("--json", type=str, required=True, help="JSON de evidencia o directorio de outputs.")
+
+    p_rv = sub.add_parser("reverify", help="Re-verificar en bloque todas las evidencias ancladas de un directorio.")
+    p_rv.add_argument("--dir", type=str, default=None, help="Por defecto ARTIFACTS_DIR/outputs (recursivo).")
+    p_rv.add_argument("--concurrency", type=int, default=None, help="Por defecto WOC_CONCURRENCY.")
+    p_rv.add_argument("--max-rps", type=float, default=None, help="Por defecto WOC_MAX_RPS (0 = sin límite).")
+    p_rv.add_argument("--no-cache", action="store_true", help="Consultar todas las txs aunque ya estén confirmadas.")
+    p_rv.add_argument("--update", action="store_true", help="Reescribir `verified` en los JSON.")
+    p_rv.add_argument("--verbose", action="store_true", help="Listar también las evidencias verificadas.")
+
+    p_aw = sub.add_parser("anchor-worker", help="Emitir y verificar en segundo plano los anclajes encolados.")
+    p_aw.add_argument("--once", action="store_true", help="Vaciar la cola y salir.")
+
+    p_sv = sub.add_parser("serve", help="API HTTP local: /analyze, /anchor, /verify (inferencia agrupada en lotes).")
+    p_sv.add_argument("--host", type=str, default=None, help="Por defecto SERVICE_HOST.")
+    p_sv.add_argument("--port", type=int, default=None, help="Por defecto SERVICE_PORT (0 = puerto libre).")
+    p_sv.add_argument("--max-batch", type=int, default=None, help="Por defecto SERVICE_MAX_BATCH.")
+    p_sv.add_argument("--max-wait-ms", type=float, default=None, help="Por defecto SERVICE_MAX_WAIT_MS.")
+    p_sv.add_argument("--no-cache", action="store_true", help="Ignorar la caché de resultados.")
+    p_sv.add_argument("--no-anchor-queue", action="store_true", help="Sin cola de anclaje (/anchor responde 500).")
+    _add_annotate_args(p_sv, s)
+    _add_profile_args(p_sv)
+
+    args = parser.parse_args()
+    # PROFILE=1 mide cualquier subcomando; --profile solo existe en los que procesan frames
+    profiler = profiler_from_settings(s, enabled=getattr(args, "profile", False))
+
+    try:
+        if args.command == "batch":
+            if args.run_store is not None and args.workers > 1:
+                parser.error("--run-store todavía no está soportado con --workers > 1")
+            if (args.dedup or s.dedup) and args.workers > 1:
+                # cada shard empezaría con su propio keyframe: reused_from (y el sha256) no serían los del modo serial
+                parser.error("--dedup (o DEDUP=1) no se combina con --workers > 1")
+            if args.adaptive and (args.workers > 1 or args.track or args.dedup or args.frame_cache or args.stride > 1):
+                # las rondas van saltando por la escena: sin frames consecutivos ni un reparto fijo en shards
+                parser.error("--adaptive no se combina con --workers > 1, --track, --dedup, --frame-cache ni --stride")
+            run_batch(s, args)
+        elif args.command == "stream":
+            run_stream(s, args)
+        elif args.command == "export":
+            run_export(s, args)
+        elif args.command == "catalog":
+            run_catalog(s, args)
+        elif args.command == "catalog-rebuild":
+            run_catalog_rebuild(s, args)
+        elif args.command == "dataset-index":
+            run_dataset_index(s, args)
+        elif args.command == "rollup":
+            run_rollup(s, args)
+        elif args.command == "verify-batch":
+            run_verify_batch(s, args)
+        elif args.command == "reverify":
+            args.dir = args.dir or str(s.artifacts_dir / "outputs")
+            run_reverify(s, args)
+        elif args.command == "anchor-worker":
+            run_anchor_worker(s, args)
+        elif args.command == "serve":
+            run_serve(s, args)
+        elif args.image:
+            run_single(s, args)
+        else:
+            parser.error(
+                "Indica --image o un subcomando "
+                "(batch, stream, export, catalog, catalog-rebuild, dataset-index, rollup, verify-batch, reverify, "
+                "anchor-worker, serve)."
+            )
+    finally:
+        if profiler.enabled and profiler.snapshot()["stages"]:
+            _save_profile(s, profiler, args.command or "image")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,195 @@
+"""
+Muestreo adaptativo frente a stride fijo con el mismo presupuesto de inferencias, contra el procesado exhaustivo.
+Para cada presupuesto se compara la estimación de la escena (medias por frame de vehículos, densidad, ocupación y
+tipologías, ingest/sampling.estimate_scene) con la exacta sobre todos los frames: error relativo medio y coste
+estimado (inferencias x ms por inferencia). El stride fijo es el de batch --stride: un frame de cada
+ceil(N / presupuesto).
+
+--synthetic N: series de métricas generadas (carretera casi vacía, una retención que sube, se mantiene y se
+disuelve, y un pico corto), sin modelo; se promedian --seeds series. --scene: una pasada exhaustiva del detector
+sobre la escena y después ambos muestreos sobre las Metrics ya calculadas (el coste por inferencia es el medido).
+
+Uso:
+    python scripts/bench_adaptive_sampling.py --synthetic 600
+    python scripts/bench_adaptive_sampling.py --synthetic 2000 --budgets 32,64,128 --seeds 50
+    python scripts/bench_adaptive_sampling.py --scene sec1 --budgets 16,32
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from dataclasses import replace
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from uav_traffic_ai.ingest.sampling import (
+    SamplingConfig,
+    SceneEstimate,
+    adaptive_sample,
+    estimate_scene,
+    metric_signals,
+)
+from uav_traffic_ai.schemas import Metrics
+
+TYPOLOGY_SHARE = {"tourism": 0.7, "other": 0.2, "heavy": 0.1}
+MEGAPIXELS = 1920 * 1080 / 1_000_000
+VEHICLE_AREA = 0.0035  # fracción de imagen de un vehículo medio visto desde el dron
+
+
+def synthetic_series(n: int, seed: int, corr_frames: float = 25.0) -> List[Metrics]:
+    """
+    El ruido es AR(1) con correlación corr_frames: un vehículo sigue en imagen durante muchos frames seguidos, así que
+    el recuento no salta de forma independiente de un frame al siguiente.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / max(1, n - 1)
+    start, hold, end = sorted(rng.uniform(0.25, 0.9, size=3))
+    level = np.full(n, 2.0)
+    level += 20.0 * np.clip((t - start) / max(hold - start, 1e-3), 0, 1)  # la retención se forma
+    level -= 20.0 * np.clip((t - hold) / max(end - hold, 1e-3), 0, 1) * (t > hold)  # y se disuelve
+    peak = rng.uniform(0.05, 0.2)
+    level += 8.0 * (np.abs(t - peak) < 0.015)  # un grupo que cruza en pocos frames
+    phi = math.exp(-1.0 / max(corr_frames, 1e-3))
+    noise = np.zeros(n)
+    for i, e in enumerate(rng.normal(size=n).tolist()):
+        noise[i] = phi * noise[i - 1] + math.sqrt(1 - phi * phi) * e if i else e
+    out = []
+    for lam in np.maximum(0, np.round(level + np.sqrt(level) * noise)).astype(int).tolist():
+        counts = rng.multinomial(lam, list(TYPOLOGY_SHARE.values()))
+        typ = {k: int(c) for k, c in zip(TYPOLOGY_SHARE, counts.tolist()) if c}
+        vehicles = sum(typ.values())
+        out.append(
+            Metrics(
+                counts_by_typology=typ,
+                density_per_megapixel=vehicles / MEGAPIXELS,
+                occupancy_ratio=float(sum(rng.uniform(0.5, 1.5) * VEHICLE_AREA for _ in range(vehicles))),
+            )
+        )
+    return out
+
+
+def scene_series(args: argparse.Namespace) -> Tuple[str, List[Metrics], float]:
+    from uav_traffic_ai.batch import resolve_scene_frames
+    from uav_traffic_ai.ingest.media import image_size, read_image_bgr
+    from uav_traffic_ai.metrics.traffic_metrics import compute_metrics
+    from uav_traffic_ai.settings import load_settings
+    from uav_traffic_ai.vision.detector import detector_from_settings
+
+    s = load_settings()
+    _, paths = resolve_scene_frames(
+        scene_id=args.scene, scenes_csv=s.traffic_scenes_csv, dataset_dir=s.traffic_dataset_dir
+    )
+    detector = detector_from_settings(s)
+    series, spent = [], []
+    for p in paths:
+        img = read_image_bgr(p)
+        t0 = time.perf_counter()
+        res = detector.detect_image(img, annotate=False)
+        w, h = image_size(img)
+        series.append(compute_metrics(res.arrays, w, h))
+        spent.append(time.perf_counter() - t0)
+    return f"escena {args.scene}", series, 1000 * float(np.median(spent[1:] or spent))
+
+
+def _signals(e: SceneEstimate) -> Dict[str, float]:
+    return {"vehículos": e.vehicles, "densidad": e.density_per_megapixel, "ocupación": e.occupancy_ratio}
+
+
+def errors(est: SceneEstimate, exact: SceneEstimate) -> Dict[str, float]:
+    """Error relativo de cada media y, para tipologías, el mayor error absoluto (vehículos/frame)."""
+    ref = _signals(exact)
+    out = {k: abs(v - ref[k]) / max(abs(ref[k]), 1e-9) for k, v in _signals(est).items()}
+    typ = set(est.counts_by_typology) | set(exact.counts_by_typology)
+    out["tipologías"] = max(
+        (abs(est.counts_by_typology.get(t, 0.0) - exact.counts_by_typology.get(t, 0.0)) for t in typ), default=0.0
+    )
+    return out
+
+
+def profile_errors(sampled: List[int], series: List[Metrics]) -> Dict[str, float]:
+    """
+    Lo que interesa de una escena además de las medias: la curva de vehículos por frame (reconstruida interpolando,
+    error medio relativo al nivel medio) y su máximo (la hora punta de la escena).
+    """
+    exact = np.array([metric_signals(m)[0] for m in series])
+    curve = np.interp(np.arange(len(series)), sampled, exact[sampled])
+    return {
+        "perfil": float(np.abs(curve - exact).mean()) / max(float(exact.mean()), 1e-9),
+        "pico": abs(float(curve.max()) - float(exact.max())) / max(float(exact.max()), 1e-9),
+    }
+
+
+def stride_indices(n: int, budget: int) -> List[int]:
+    return list(range(0, n, max(1, math.ceil(n / budget))))
+
+
+def run_case(
+    series: List[Metrics], budget: int, config: SamplingConfig
+) -> Dict[str, Tuple[int, Dict[str, float], float]]:
+    n = len(series)
+    exact = estimate_scene(dict(enumerate(series)), n)
+    evaluate: Callable[[List[int]], Sequence[Metrics]] = lambda idx: [series[i] for i in idx]  # noqa: E731
+
+    t0 = time.perf_counter()
+    sampler = adaptive_sample(n, evaluate, replace(config, budget=budget))
+    overhead = time.perf_counter() - t0
+    fixed = stride_indices(n, budget)
+    return {
+        "adaptativo": (
+            len(sampler.metrics),
+            {**errors(sampler.estimate(), exact), **profile_errors(sorted(sampler.metrics), series)},
+            overhead,
+        ),
+        "stride fijo": (
+            len(fixed),
+            {**errors(estimate_scene({i: series[i] for i in fixed}, n), exact), **profile_errors(fixed, series)},
+            0.0,
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--synthetic", type=int, metavar="N", help="Frames de cada serie sintética.")
+    src.add_argument("--scene", help="Escena del dataset (TRAFFIC_DATASET_DIR); necesita el modelo.")
+    parser.add_argument("--budgets", default="16,32,64", help="Inferencias por escena, separadas por comas.")
+    parser.add_argument("--seeds", type=int, default=20, help="Series sintéticas que se promedian.")
+    parser.add_argument("--initial-fraction", type=float, default=SamplingConfig.initial_fraction)
+    parser.add_argument("--round-size", type=int, default=SamplingConfig.round_size)
+    parser.add_argument("--floor", type=float, default=SamplingConfig.floor)
+    parser.add_argument("--corr-frames", type=float, default=25.0, help="Frames de correlación del ruido sintético.")
+    parser.add_argument("--ms-per-frame", type=float, default=35.0, help="Coste por inferencia en --synthetic.")
+    args = parser.parse_args()
+
+    config = SamplingConfig(initial_fraction=args.initial_fraction, round_size=args.round_size, floor=args.floor)
+    if args.scene:
+        label, series, ms = scene_series(args)
+        runs = [series]
+    else:
+        runs = [synthetic_series(args.synthetic, seed, args.corr_frames) for seed in range(args.seeds)]
+        label, ms = f"sintético ({args.seeds} series)", args.ms_per_frame
+    n = len(runs[0])
+    print(f"{label}: {n} frames, {ms:.1f} ms/inferencia, exhaustivo {n * ms / 1000:.1f}s")
+    print(
+        f"{'presupuesto':>11} {'método':<12} {'frames':>7} {'coste':>9} "
+        f"{'vehículos':>10} {'densidad':>9} {'ocupación':>10} {'tipologías':>11} {'perfil':>7} {'pico':>7} "
+        f"{'sampler ms':>11}"
+    )
+    for budget in [int(b) for b in args.budgets.split(",")]:
+        results = [run_case(series, budget, config) for series in runs]
+        for method in results[0]:
+            frames = float(np.mean([r[method][0] for r in results]))
+            err = {k: float(np.mean([r[method][1][k] for r in results])) for k in results[0][method][1]}
+            overhead = 1000 * float(np.mean([r[method][2] for r in results]))
+            print(
+                f"{budget:>11} {method:<12} {frames:>7.0f} {frames * ms / 1000:>7.1f}s "
+                f"{err['vehículos']:>9.1%} {err['densidad']:>9.1%} {err['ocupación']:>9.1%} "
+                f"{err['tipologías']:>11.2f} {err['perfil']:>7.1%} {err['pico']:>7.1%} {overhead:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
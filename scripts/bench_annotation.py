@@ -0,0 +1,107 @@
+"""
+Coste por frame de la imagen anotada: dibujar (render) + codificar, y lo que ocupa en disco, por formato.
+"headless" es el modo por defecto de la CLI (batch/stream sin --annotate): ni se dibuja ni se escribe imagen.
+
+Las detecciones salen del detector configurado (DETECTOR_BACKEND/YOLO_WEIGHTS) o, con --fake-boxes N,
+de cajas aleatorias (sin modelo). Con el detector real también se mide cuánto añade dibujar dentro de
+detect_batch (r0.plot en ultralytics) frente a annotate=False.
+
+Uso:
+    python scripts/bench_annotation.py --input "data/raw/traffic/sec2/*.jpg" --frames 32
+    python scripts/bench_annotation.py --synthetic 16 --size 3840x2160 --fake-boxes 400
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from uav_traffic_ai.batch import resolve_path_frames
+from uav_traffic_ai.ingest.media import ImageEncoding, encode_image_bytes, read_image_bgr
+from uav_traffic_ai.settings import load_settings
+from uav_traffic_ai.vision.detections import DetectionArrays
+from uav_traffic_ai.vision.detector import detector_from_settings, draw_detections
+
+ENCODINGS: List[Tuple[str, ImageEncoding]] = [
+    ("png (nivel 1, actual)", ImageEncoding("png", png_level=1)),
+    ("png nivel 0", ImageEncoding("png", png_level=0)),
+    ("png nivel 6", ImageEncoding("png", png_level=6)),
+    ("jpg q90", ImageEncoding("jpg", quality=90)),
+    ("jpg q75", ImageEncoding("jpg", quality=75)),
+    ("webp q80", ImageEncoding("webp", quality=80)),
+]
+
+
+def fake_detections(img: np.ndarray, n: int, rng: np.random.Generator) -> DetectionArrays:
+    h, w = img.shape[:2]
+    xy = rng.uniform(0, [w - 60, h - 60], size=(n, 2))
+    wh = rng.uniform(12, 60, size=(n, 2))
+    return DetectionArrays.from_yolo(
+        np.hstack([xy, xy + wh]).astype(np.float32),
+        rng.uniform(0.25, 0.99, size=n).astype(np.float32),
+        rng.choice([2, 3, 5, 7], size=n),
+        {2: "car", 3: "motorcycle", 5: "bus", 7: "truck"},
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default=None, help="Directorio o glob de imágenes.")
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--synthetic", type=int, default=0, help="N frames sintéticos en vez de --input.")
+    parser.add_argument("--size", type=str, default="1920x1080", help="Tamaño WxH de los frames sintéticos.")
+    parser.add_argument("--fake-boxes", type=int, default=0, help="Cajas aleatorias por frame (sin modelo).")
+    args = parser.parse_args()
+
+    if not args.synthetic and not args.input:
+        parser.error("Indica --input o --synthetic N")
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        w, h = (int(x) for x in args.size.lower().split("x"))
+        # ruido suave (no blanco): comprime de forma parecida a una foto aérea
+        base = rng.integers(0, 256, size=(h // 8, w // 8, 3), dtype=np.uint8)
+        frames = [np.repeat(np.repeat(np.roll(base, i, axis=1), 8, axis=0), 8, axis=1) for i in range(args.synthetic)]
+    else:
+        frames = [read_image_bgr(p) for p in resolve_path_frames(args.input)[: args.frames]]
+    n = len(frames)
+    h, w = frames[0].shape[:2]
+
+    if args.fake_boxes:
+        dets = [fake_detections(f, args.fake_boxes, rng) for f in frames]
+    else:
+        detector = detector_from_settings(load_settings())
+        detector.detect_batch(frames[:1], annotate=False)  # warm-up
+        t0 = time.perf_counter()
+        res = [detector.detect_image(f, annotate=False) for f in frames]
+        t_plain = (time.perf_counter() - t0) / n
+        t0 = time.perf_counter()
+        for f in frames:
+            detector.detect_image(f, annotate=True)
+        t_annot = (time.perf_counter() - t0) / n
+        dets = [r.arrays for r in res]
+        print(
+            f"detect_image ({detector.backend}): sin anotar {1000 * t_plain:.1f} ms/frame, "
+            f"anotando {1000 * t_annot:.1f} ms/frame (+{1000 * (t_annot - t_plain):.1f})"
+        )
+
+    t0 = time.perf_counter()
+    drawn = [draw_detections(f, d) for f, d in zip(frames, dets)]
+    t_draw = (time.perf_counter() - t0) / n
+    boxes = sum(len(d) for d in dets) / n
+    print(f"{n} frames {w}x{h}, {boxes:.0f} cajas/frame; render (draw_detections) {1000 * t_draw:.1f} ms/frame")
+
+    print(f"{'modo':<24} {'ms/frame':>9} {'KB/frame':>9} {'MB/1000 frames':>15}")
+    print(f"{'headless (sin imagen)':<24} {0.0:9.1f} {0.0:9.1f} {0.0:15.1f}")
+    for label, enc in ENCODINGS:
+        t0 = time.perf_counter()
+        sizes = [len(encode_image_bytes(img, enc)) for img in drawn]
+        t_enc = (time.perf_counter() - t0) / n
+        kb = sum(sizes) / n / 1024
+        print(f"{label:<24} {1000 * (t_draw + t_enc):9.1f} {kb:9.1f} {kb * 1000 / 1024:15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Paridad y latencia de los backends de inferencia en CPU (ultralytics vs onnx vs openvino) sobre los mismos frames.
+
+Paridad: fracción de cajas de ultralytics con una caja del otro backend de la misma clase e IoU >= --match-iou
+(y al revés, para no premiar un backend que detecta de más). Sale con código 1 si algún backend
+queda por debajo de --min-parity: sirve como test antes de cambiar DETECTOR_BACKEND en producción.
+
+Uso:
+    python scripts/export_model.py --format onnx
+    python scripts/bench_backends.py --input "data/raw/traffic/sec2/*.jpg" --frames 16
+    python scripts/bench_backends.py --synthetic 8 --backends ultralytics onnx openvino --threads 4
+"""
+from __future__ import annotations
+
+import os
+
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import argparse
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from uav_traffic_ai.batch import resolve_path_frames
+from uav_traffic_ai.ingest.media import read_image_bgr
+from uav_traffic_ai.settings import load_settings
+from uav_traffic_ai.vision.detections import DetectionArrays
+from uav_traffic_ai.vision.detector import BACKENDS, make_detector
+from uav_traffic_ai.vision.tiling import box_overlap
+
+
+def matched(a: DetectionArrays, b: DetectionArrays, iou: float) -> int:
+    """Cajas de a con alguna de b de la misma clase e IoU >= iou."""
+    if len(a) == 0 or len(b) == 0:
+        return 0
+    ov = box_overlap(a.xyxy, b.xyxy, "iou")
+    ov[a.cls[:, None] != b.cls[None, :]] = 0.0
+    return int((ov.max(axis=1) >= iou).sum())
+
+
+def parity(ref: List[DetectionArrays], other: List[DetectionArrays], iou: float) -> Tuple[float, float]:
+    """(recall, precision) de other respecto a ref, sumando todos los frames."""
+    hit_r = sum(matched(r, o, iou) for r, o in zip(ref, other))
+    hit_p = sum(matched(o, r, iou) for r, o in zip(ref, other))
+    n_r = sum(len(r) for r in ref)
+    n_o = sum(len(o) for o in other)
+    return (hit_r / n_r if n_r else 1.0), (hit_p / n_o if n_o else 1.0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default=None, help="Directorio o glob de imágenes.")
+    parser.add_argument("--frames", type=int, default=16)
+    parser.add_argument("--synthetic", type=int, default=0, help="N frames aleatorios (solo latencia).")
+    parser.add_argument("--size", type=str, default="1280x720")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["ultralytics", "onnx"])
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--match-iou", type=float, default=0.9)
+    parser.add_argument("--min-parity", type=float, default=0.98)
+    args = parser.parse_args()
+
+    if not args.synthetic and not args.input:
+        parser.error("Indica --input o --synthetic N")
+
+    s = load_settings()
+    if args.synthetic:
+        w, h = (int(x) for x in args.size.lower().split("x"))
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8) for _ in range(args.synthetic)]
+    else:
+        frames = [read_image_bgr(p) for p in resolve_path_frames(args.input)[: args.frames]]
+
+    results: Dict[str, List[DetectionArrays]] = {}
+    print(f"{len(frames)} frames weights={s.yolo_weights} threads={args.threads or 'auto'}")
+    print(f"{'backend':<12} {'carga s':>8} {'ms/frame':>9} {'cajas/frame':>11}")
+    for backend in args.backends:
+        t0 = time.perf_counter()
+        det = make_detector(
+            backend=backend,
+            weights=s.yolo_weights,
+            conf=s.yolo_conf,
+            iou=s.yolo_iou,
+            model_path=None if backend == "ultralytics" else s.detector_model_path,
+            threads=args.threads,
+        )
+        load_s = time.perf_counter() - t0
+        det._infer(frames[:1])  # warm-up
+        best = float("inf")
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            out = [det._infer([f])[0] for f in frames]  # latencia por frame (batch 1)
+            best = min(best, time.perf_counter() - t0)
+        results[backend] = out
+        n = sum(len(a) for a in out) / len(frames)
+        print(f"{backend:<12} {load_s:8.2f} {1000 * best / len(frames):9.1f} {n:11.1f}")
+
+    ref_name = args.backends[0]
+    failed = False
+    for backend in args.backends[1:]:
+        rec, prec = parity(results[ref_name], results[backend], args.match_iou)
+        ok = min(rec, prec) >= args.min_parity
+        failed |= not ok
+        print(
+            f"paridad {backend} vs {ref_name} (clase + IoU>={args.match_iou}): "
+            f"recall={rec:.1%} precision={prec:.1%} {'OK' if ok else 'FALLO'}"
+        )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
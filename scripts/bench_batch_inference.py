@@ -0,0 +1,77 @@
+"""
+Benchmark de throughput (frames/s) de YoloDetector.detect_batch según el tamaño de lote, en CPU.
+
+Uso:
+    python scripts/bench_batch_inference.py --scene sec2 --batch-sizes 1,2,4,8,16
+    python scripts/bench_batch_inference.py --synthetic 64 --size 1280x720
+"""
+from __future__ import annotations
+
+import os
+
+# Forzamos CPU antes de importar torch/ultralytics: el objetivo es dimensionar los servidores sin GPU.
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from uav_traffic_ai.ingest.media import read_image_bgr
+from uav_traffic_ai.ingest.traffic_dataset import list_scene_frames, load_scenes, sample_frames
+from uav_traffic_ai.pipeline import iter_batches
+from uav_traffic_ai.settings import load_settings
+from uav_traffic_ai.vision.detector import YoloDetector
+
+
+def _load_frames(args: argparse.Namespace) -> List[np.ndarray]:
+    if args.synthetic:
+        w, h = (int(x) for x in args.size.lower().split("x"))
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8) for _ in range(args.synthetic)]
+
+    s = load_settings()
+    scenes = {x.scene_id: x for x in load_scenes(s.traffic_scenes_csv, s.traffic_dataset_dir)}
+    if args.scene not in scenes:
+        raise SystemExit(f"Escena desconocida: {args.scene}")
+    paths = sample_frames(list_scene_frames(scenes[args.scene].folder), stride=args.stride, max_frames=args.max_frames)
+    return [read_image_bgr(p) for p in paths]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scene", type=str, default=None, help="Sequence de scenes.csv.")
+    parser.add_argument("--stride", type=int, default=1)
+    parser.add_argument("--max-frames", type=int, default=64)
+    parser.add_argument("--synthetic", type=int, default=0, help="N frames aleatorios en vez de una escena.")
+    parser.add_argument("--size", type=str, default="1280x720", help="Tamaño WxH de los frames sintéticos.")
+    parser.add_argument("--batch-sizes", type=str, default="1,2,4,8,16")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if not args.synthetic and not args.scene:
+        parser.error("Indica --scene o --synthetic N")
+
+    s = load_settings()
+    frames = _load_frames(args)
+    detector = YoloDetector(weights=s.yolo_weights, conf=s.yolo_conf, iou=s.yolo_iou)
+
+    # Warm-up: la primera llamada incluye fuse/carga de kernels y distorsiona la medida.
+    detector.detect_batch(frames[:1])
+
+    print(f"frames={len(frames)} weights={s.yolo_weights} threads={os.cpu_count()}")
+    print(f"{'batch':>6} {'frames/s':>10} {'ms/frame':>10}")
+    for bs in [int(x) for x in args.batch_sizes.split(",") if x.strip()]:
+        best = float("inf")
+        for _ in range(max(1, args.repeats)):
+            t0 = time.perf_counter()
+            for batch in iter_batches(frames, bs):
+                detector.detect_batch(batch)
+            best = min(best, time.perf_counter() - t0)
+        fps = len(frames) / best
+        print(f"{bs:>6} {fps:>10.2f} {1000.0 / fps:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
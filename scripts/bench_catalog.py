@@ -0,0 +1,113 @@
+"""
+Catálogo de evidencias: tiempo de rebuild (serie vs procesos) y de las consultas típicas frente a
+recorrer artifacts/outputs abriendo cada JSON (lo que había que hacer sin catálogo).
+
+Genera N evidencias sintéticas como ficheros por frame (persist_artifacts) en un directorio temporal,
+repartidas entre varias escenas y a lo largo de 30 días, con una parte ancladas/verificadas.
+
+Uso:
+    python scripts/bench_catalog.py --evidences 20000 --workers 8
+    python scripts/bench_catalog.py --dir artifacts            # rebuild + consultas sobre artefactos reales
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+from uav_traffic_ai.pipeline import build_evidence, persist_artifacts
+from uav_traffic_ai.reporting.catalog import EvidenceCatalog, parse_since, rebuild_catalog
+from uav_traffic_ai.schemas import SceneMeta
+from uav_traffic_ai.vision.detections import DetectionArrays
+
+NAMES = {2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+
+
+def generate(base: Path, n: int, boxes: int) -> None:
+    rng = np.random.default_rng(0)
+    img = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    now = datetime.now(timezone.utc)
+    for i in range(n):
+        k = int(rng.integers(0, boxes + 1))
+        xy = rng.uniform(0, [1800, 1000], size=(k, 2))
+        dets = DetectionArrays.from_yolo(
+            np.hstack([xy, xy + 40]).astype(np.float32),
+            rng.uniform(0.25, 0.99, size=k).astype(np.float32),
+            rng.choice(list(NAMES), size=k),
+            NAMES,
+        )
+        scene = f"sec{i % 8}"
+        e = build_evidence(
+            detections=dets,
+            img_bgr=img,
+            scene=SceneMeta(scene_id=scene),
+            model_weights="yolov8s.pt",
+            created_at=now - timedelta(minutes=float(rng.uniform(0, 30 * 24 * 60))),
+        )
+        if i % 3 == 0:
+            e.txid, e.verified = f"{i:064x}", bool(i % 2)
+        persist_artifacts(artifacts_base=base, evidence=e, annotated_image=None, prefix=f"{scene}_{i:06d}")
+
+
+def scan_json(outputs: Path, scene: str, since: str) -> int:
+    # sin catálogo: abrir todos los JSON
+    n = 0
+    for p in outputs.glob("*.json"):
+        d = json.loads(p.read_text(encoding="utf-8"))
+        if d.get("scene", {}).get("scene_id") == scene and not d.get("verified") and d["created_at_utc"] >= since:
+            n += 1
+    return n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--evidences", type=int, default=20000)
+    parser.add_argument("--boxes", type=int, default=40, help="Máximo de cajas por evidencia.")
+    parser.add_argument("--workers", type=int, default=0, help="Procesos del rebuild (0 = nº de CPUs).")
+    parser.add_argument("--dir", type=str, default=None, help="Usar un directorio de artefactos existente.")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_catalog_"))
+    try:
+        base = Path(args.dir) if args.dir else tmp / "artifacts"
+        if not args.dir:
+            t0 = time.perf_counter()
+            generate(base, args.evidences, args.boxes)
+            print(f"generadas {args.evidences} evidencias en {time.perf_counter() - t0:.1f}s ({base})")
+
+        for workers in (1, args.workers):
+            catalog = EvidenceCatalog(tmp / f"catalog_{workers}.sqlite")
+            t0 = time.perf_counter()
+            n = rebuild_catalog(catalog, base, workers=workers)
+            label = "serie" if workers == 1 else f"{workers or 'auto'} procesos"
+            print(f"rebuild ({label}): {n} evidencias en {time.perf_counter() - t0:.2f}s")
+
+        since = parse_since("7d")
+        queries = {
+            "sin verificar, sec2, última semana": dict(scene_id="sec2", since=since, verified=False, limit=None),
+            "por sha256": dict(sha256=catalog.query(limit=1)[0]["sha256"] if len(catalog) else "x"),
+            "con >= 5 heavy (todas)": dict(min_counts={"heavy": 5}, limit=None),
+            "ancladas, última semana, 100": dict(since=since, anchored=True, limit=100),
+        }
+        for label, kw in queries.items():
+            t0 = time.perf_counter()
+            rows = catalog.query(**kw)
+            print(f"  {label:<36} {len(rows):6d} filas {1000 * (time.perf_counter() - t0):8.1f} ms")
+
+        outputs = base / "outputs"
+        if outputs.is_dir():
+            t0 = time.perf_counter()
+            n = scan_json(outputs, "sec2", since.replace("Z", ""))
+            print(f"  {'(sin catálogo) recorrer los JSON':<36} {n:6d} filas {1000 * (time.perf_counter() - t0):8.1f} ms")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
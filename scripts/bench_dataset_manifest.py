@@ -0,0 +1,104 @@
+"""
+Arranque del selector de escenas sobre un dataset grande: lo que hacía la UI en cada rerun (pandas + iterrows para
+scenes.csv y rglob + stat de cada fichero para la escena elegida) frente al DatasetManifest:
+escaneo inicial en paralelo, arranque de otro proceso desde el JSON y consulta con las listas ya en memoria.
+
+Genera un dataset sintético (ficheros vacíos) con la estructura de Traffic: scenes.csv y dataset/<escena>/.
+
+Uso:
+    python scripts/bench_dataset_manifest.py --scenes 40 --frames 5000
+    python scripts/bench_dataset_manifest.py --dir data/raw/traffic     # dataset real (no se modifica)
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from uav_traffic_ai.ingest.traffic_dataset import DatasetManifest, list_scene_frames, load_scenes
+
+
+def generate(base: Path, scenes: int, frames: int) -> None:
+    rows = ["Sequence,Scene name,lat,long"]
+    for i in range(scenes):
+        folder = base / "dataset" / f"sec{i}"
+        folder.mkdir(parents=True)
+        for j in range(frames):
+            (folder / f"frame_{j:06d}.jpg").touch()
+        rows.append(f"sec{i},Escena {i},{40 + i / 100},{-3 - i / 100}")
+    (base / "scenes.csv").write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+
+def old_startup(scenes_csv: Path, dataset_dir: Path, scene_index: int) -> int:
+    # la implementación anterior: pandas + iterrows y rglob("*") con is_file() (un stat) por entrada
+    import pandas as pd
+
+    df = pd.read_csv(scenes_csv)
+    folders = [(dataset_dir / "dataset" / str(row["Sequence"])).resolve() for _, row in df.iterrows()]
+    exts = {".png", ".jpg", ".jpeg"}
+    frames = sorted([p for p in folders[scene_index].rglob("*") if p.is_file() and p.suffix.lower() in exts])
+    return len(frames)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", type=int, default=40)
+    parser.add_argument("--frames", type=int, default=5000, help="Frames por escena.")
+    parser.add_argument("--workers", type=int, default=0, help="Hilos del escaneo (0 = automático).")
+    parser.add_argument("--dir", type=str, default=None, help="Usar un dataset existente (TRAFFIC_DATASET_DIR).")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_manifest_"))
+    try:
+        base = Path(args.dir) if args.dir else tmp / "traffic"
+        if not args.dir:
+            t0 = time.perf_counter()
+            generate(base, args.scenes, args.frames)
+            elapsed = time.perf_counter() - t0
+            print(f"dataset sintético: {args.scenes} escenas x {args.frames} frames en {elapsed:.1f}s")
+        scenes_csv = base / "scenes.csv"
+        manifest_path = tmp / "dataset_manifest.json"
+        last = len(load_scenes(scenes_csv, base)) - 1
+
+        def timed(label: str, fn) -> None:
+            t0 = time.perf_counter()
+            n = fn()
+            print(f"{label:<52} {1000 * (time.perf_counter() - t0):9.1f} ms  ({n} frames)")
+
+        try:
+            timed("anterior (pandas + rglob), por selección", lambda: old_startup(scenes_csv, base, last))
+        except ImportError:
+            pass
+        timed(
+            "load_scenes + list_scene_frames (scandir)",
+            lambda: len(list_scene_frames(load_scenes(scenes_csv, base)[last].folder)),
+        )
+
+        manifest = DatasetManifest(manifest_path, workers=args.workers)
+
+        def build() -> int:
+            scenes = manifest.scenes(scenes_csv, base)
+            manifest.refresh(sc.folder for sc in scenes)
+            return sum(len(manifest.frames(sc.folder)) for sc in scenes)
+
+        timed(f"manifest: escaneo inicial de todo ({manifest.workers} hilos)", build)
+
+        def cold_process() -> int:
+            # otro proceso (o reinicio de la UI): lee el JSON y valida por mtime de directorios
+            m = DatasetManifest(manifest_path)
+            return len(m.frames(m.scenes(scenes_csv, base)[last].folder))
+
+        timed("manifest: arranque desde el JSON", cold_process)
+
+        def rerun() -> int:
+            return len(manifest.frames(manifest.scenes(scenes_csv, base)[last].folder))
+
+        timed("manifest: rerun (en memoria, valida mtimes)", rerun)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
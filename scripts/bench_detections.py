@@ -0,0 +1,127 @@
+"""
+Micro-benchmark del post-proceso por frame (sin modelo): salida de YOLO -> detecciones -> métricas -> Evidence
+con sha256. Compara el camino anterior (Detection/BBox pydantic por caja + compute_metrics en Python)
+con DetectionArrays (columnas NumPy, pydantic solo al construir la Evidence) y comprueba que el hash coincide.
+La fila "hash + JSON escrito" compara serializar el dict completo dos veces (hash y fichero, stable_json_dumps)
+con el serializador canónico por campos (las cajas una vez, con orjson si está instalado).
+
+Uso:
+    python scripts/bench_detections.py --boxes 500 1000 2000 --repeats 200
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import numpy as np
+
+from uav_traffic_ai.metrics.traffic_metrics import compute_metrics
+from uav_traffic_ai.pipeline import _evidence_payload_for_hash, build_evidence, evidence_json_bytes, evidence_sha256
+from uav_traffic_ai.reporting.hashing import orjson, sha256_hex, stable_json_dumps
+from uav_traffic_ai.schemas import BBox, Detection, SceneMeta
+from uav_traffic_ai.vision.detections import DetectionArrays
+from uav_traffic_ai.vision.postprocess import map_typology
+
+COCO_VEHICLES = {0: "person", 1: "bicycle", 2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+IMG = np.zeros((2160, 3840, 3), dtype=np.uint8)  # 4K aéreo
+CREATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def fake_yolo_output(n: int, seed: int = 0) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, [3800, 2120], size=(n, 2))
+    wh = rng.uniform(12, 60, size=(n, 2))
+    return {
+        "xyxy": np.hstack([xy, xy + wh]).astype(np.float32),
+        "conf": rng.uniform(0.25, 0.99, size=n).astype(np.float32),
+        "cls": rng.choice([2, 2, 2, 3, 5, 7, 1], size=n).astype(np.float32),
+        "names": COCO_VEHICLES,
+    }
+
+
+def legacy_detections(out: Dict[str, Any]) -> List[Detection]:
+    # Réplica del bucle anterior de YoloDetector._to_detection_result
+    xyxy, confs, clss, names = out["xyxy"], out["conf"], out["cls"].astype(int), out["names"]
+    dets: List[Detection] = []
+    for i in range(len(xyxy)):
+        cls_name = str(names.get(int(clss[i]), "unknown"))
+        dets.append(
+            Detection(
+                cls_name=cls_name,
+                confidence=float(confs[i]),
+                bbox=BBox(x1=float(xyxy[i][0]), y1=float(xyxy[i][1]), x2=float(xyxy[i][2]), y2=float(xyxy[i][3])),
+                typology=map_typology(cls_name),
+            )
+        )
+    return dets
+
+
+def columnar(out: Dict[str, Any]) -> DetectionArrays:
+    return DetectionArrays.from_yolo(out["xyxy"], out["conf"], out["cls"].astype(int), out["names"])
+
+
+def legacy_serialize(e) -> None:
+    # antes: dict completo -> json.dumps para el hash y otra vez para <prefix>.json
+    sha256_hex(stable_json_dumps(_evidence_payload_for_hash(e)))
+    stable_json_dumps(e.model_dump(mode="json")).encode("utf-8")
+
+
+def canonical_serialize(e) -> None:
+    e._detections_json = None  # como recién construida: las cajas se serializan una vez
+    evidence_sha256(e)
+    evidence_json_bytes(e)
+
+
+def timeit(fn, repeats: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return 1000 * (time.perf_counter() - t0) / repeats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boxes", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--repeats", type=int, default=100)
+    args = parser.parse_args()
+
+    h, w = IMG.shape[:2]
+    scene = SceneMeta(scene_id="bench")
+    print(f"orjson: {'sí' if orjson is not None else 'no (json estándar)'}")
+    print(f"{'cajas':>6} | {'etapa':<22} | {'antes ms':>9} | {'después ms':>10} | {'x':>5}")
+    for n in args.boxes:
+        out = fake_yolo_output(n)
+        dets = legacy_detections(out)
+        arrays = columnar(out)
+        ev = build_evidence(detections=arrays, img_bgr=IMG, scene=scene, model_weights="m", created_at=CREATED_AT)
+
+        rows = [
+            ("detecciones", lambda: legacy_detections(out), lambda: columnar(out)),
+            ("compute_metrics", lambda: compute_metrics(dets, w, h), lambda: compute_metrics(arrays, w, h)),
+            (
+                "frame completo + sha256",
+                lambda: build_evidence(
+                    detections=legacy_detections(out), img_bgr=IMG, scene=scene, model_weights="m", created_at=CREATED_AT
+                ),
+                lambda: build_evidence(
+                    detections=columnar(out), img_bgr=IMG, scene=scene, model_weights="m", created_at=CREATED_AT
+                ),
+            ),
+            ("hash + JSON escrito", lambda: legacy_serialize(ev), lambda: canonical_serialize(ev)),
+        ]
+        for label, before, after in rows:
+            tb, ta = timeit(before, args.repeats), timeit(after, args.repeats)
+            print(f"{n:>6} | {label:<22} | {tb:9.3f} | {ta:10.3f} | {tb / ta:5.1f}")
+
+        e_old = build_evidence(detections=dets, img_bgr=IMG, scene=scene, model_weights="m", created_at=CREATED_AT)
+        e_new = build_evidence(detections=arrays, img_bgr=IMG, scene=scene, model_weights="m", created_at=CREATED_AT)
+        assert e_old.sha256 == e_new.sha256, "el sha256 de la evidencia ha cambiado"
+        assert e_old.metrics == e_new.metrics
+    print("sha256 y métricas idénticos en ambos caminos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Coste de "rerun" de la UI: construir el detector en cada interacción (lo que hacía app.py) frente al registro del
+proceso (detector_from_settings), moviendo conf/iou entre reruns. Muestra también la carga y la primera inferencia
+del modelo, y la latencia de una inferencia ya en caliente.
+
+Uso:
+    python scripts/bench_detector_registry.py --reruns 20
+    DETECTOR_BACKEND=onnx python scripts/bench_detector_registry.py --reruns 20
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from uav_traffic_ai.settings import load_settings
+from uav_traffic_ai.vision.detector import detector_from_settings, make_detector, tile_config_from_settings
+from uav_traffic_ai.vision.registry import default_registry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--old-reruns", type=int, default=3, help="Reruns con el detector construido cada vez.")
+    parser.add_argument("--size", type=int, default=1080, help="Lado del frame de prueba.")
+    args = parser.parse_args()
+
+    s = load_settings()
+    frame = np.random.default_rng(0).integers(0, 256, size=(args.size, args.size, 3), dtype=np.uint8)
+    thresholds = [(round(0.1 + 0.05 * (i % 12), 2), 0.7) for i in range(args.reruns)]
+
+    t0 = time.perf_counter()
+    for conf, iou in thresholds[: args.old_reruns]:
+        det = make_detector(
+            backend=s.detector_backend,
+            weights=s.yolo_weights,
+            conf=conf,
+            iou=iou,
+            tiling=tile_config_from_settings(s),
+            model_path=s.detector_model_path,
+            threads=s.detector_threads,
+        )
+        det.detect_image(frame, annotate=False)
+    old = (time.perf_counter() - t0) / max(1, args.old_reruns)
+    print(f"{'anterior: construir + inferir, por rerun':<44} {1000 * old:9.1f} ms")
+
+    t0 = time.perf_counter()
+    detector_from_settings(s, warmup=True)
+    print(f"{'registro: primera petición (carga + warm-up)':<44} {1000 * (time.perf_counter() - t0):9.1f} ms")
+    print(f"  {default_registry().stats_for(detector_from_settings(s)).summary()}")
+
+    t0 = time.perf_counter()
+    for conf, iou in thresholds:
+        detector_from_settings(s, conf=conf, iou=iou).detect_image(frame, annotate=False)
+    new = (time.perf_counter() - t0) / len(thresholds)
+    print(f"{'registro: cambiar conf/iou + inferir, por rerun':<44} {1000 * new:9.1f} ms")
+
+    t0 = time.perf_counter()
+    for conf, iou in thresholds:
+        detector_from_settings(s, conf=conf, iou=iou)
+    print(f"{'registro: solo obtener el detector':<44} {1e6 * (time.perf_counter() - t0) / len(thresholds):9.1f} µs")
+    print(f"modelos cargados: {len(default_registry().stats())}")
+
+
+if __name__ == "__main__":
+    main()
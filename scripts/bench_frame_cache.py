@@ -0,0 +1,100 @@
+"""
+Caché de frames decodificados (FrameCache): cv2.imread de toda una escena en cada pasada frente a leer los frames
+del .npy mapeado en memoria, que es lo que cambia al repetir barridos de conf/iou sobre la misma escena.
+También mide lo que cuesta construir la caché (una pasada de decode + escritura) y, con --size, el modo reducido.
+
+"leído" copia cada frame a un buffer para tocar todas sus páginas (la inferencia las lee igual); "vista" solo
+obtiene el array. Con la caché del SO caliente, que es el caso de los barridos repetidos.
+
+Uso:
+    python scripts/bench_frame_cache.py --frames 300                 # escena sintética 1920x1080 JPEG
+    python scripts/bench_frame_cache.py --scene sec2 --passes 3      # escena real de scenes.csv
+    python scripts/bench_frame_cache.py --frames 300 --size 640 --letterbox
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+
+from uav_traffic_ai.batch import resolve_scene_frames
+from uav_traffic_ai.ingest.frame_cache import FrameCache
+from uav_traffic_ai.ingest.media import read_image_bgr
+from uav_traffic_ai.settings import load_settings
+
+
+def synthetic_scene(folder: Path, n: int) -> List[Path]:
+    # ruido suavizado: un JPEG con un coste de decode parecido al de una foto (el ruido puro comprime mal)
+    rng = np.random.default_rng(0)
+    folder.mkdir(parents=True)
+    base = cv2.GaussianBlur(rng.integers(0, 256, size=(1080, 1920, 3), dtype=np.uint8), (0, 0), 3)
+    paths = []
+    for i in range(n):
+        p = folder / f"frame_{i:05d}.jpg"
+        cv2.imwrite(str(p), np.roll(base, 7 * i, axis=1), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        paths.append(p)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=300, help="Frames de la escena sintética.")
+    parser.add_argument("--scene", type=str, default=None, help="Usar una escena del dataset (scenes.csv).")
+    parser.add_argument("--passes", type=int, default=3, help="Pasadas completas sobre la escena.")
+    parser.add_argument("--size", type=int, default=0, help="Lado mayor de los frames cacheados (0 = original).")
+    parser.add_argument("--letterbox", action="store_true")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_frame_cache_"))
+    try:
+        if args.scene:
+            s = load_settings()
+            _, frames = resolve_scene_frames(
+                scene_id=args.scene, scenes_csv=s.traffic_scenes_csv, dataset_dir=s.traffic_dataset_dir
+            )
+        else:
+            frames = synthetic_scene(tmp / "scene", args.frames)
+        n = len(frames)
+        print(f"{n} frames, {args.passes} pasadas")
+
+        def row(label: str, secs: float) -> None:
+            print(f"{label:<40} {secs:7.2f}s {1000 * secs / n:8.2f} ms/frame")
+
+        t0 = time.perf_counter()
+        for _ in range(args.passes):
+            for p in frames:
+                read_image_bgr(p)
+        row("cv2.imread (por pasada)", (time.perf_counter() - t0) / args.passes)
+
+        cache = FrameCache(tmp / "cache", max_bytes=1 << 62, size=args.size, letterbox=args.letterbox)
+        t0 = time.perf_counter()
+        decoded = cache.build(frames)
+        row(f"construir la caché ({cache.workers} hilos)", time.perf_counter() - t0)
+        arr = decoded.array
+        print(f"  {decoded.path.name}: {arr.shape} {arr.nbytes / 2**20:.0f} MiB")
+
+        t0 = time.perf_counter()
+        for _ in range(args.passes):
+            cache.get(frames)  # incluye la comprobación de la clave (stat de cada fichero)
+            for i in range(n):
+                decoded[i]
+        row("caché: vista (por pasada)", (time.perf_counter() - t0) / args.passes)
+
+        buf = np.empty(arr.shape[1:], dtype=np.uint8)
+        t0 = time.perf_counter()
+        for _ in range(args.passes):
+            for frame in cache.get(frames) or decoded:
+                np.copyto(buf, frame)
+        row("caché: leído (por pasada)", (time.perf_counter() - t0) / args.passes)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
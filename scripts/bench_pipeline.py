@@ -0,0 +1,340 @@
+"""
+Suite de benchmarks del pipeline de análisis, reproducible (semillas fijas, frames sintéticos generados aquí, sin
+descargas) para detectar regresiones al actualizar ultralytics/ONNX Runtime o cambiar la configuración.
+
+Mide, en una rejilla de tamaños de imagen x número de detecciones:
+  detect_image      inferencia del detector de DETECTOR_BACKEND (solo por tamaño: las detecciones las pone el modelo)
+  compute_metrics   métricas de movilidad sobre detecciones sintéticas
+  hash              evidence_sha256 de la evidencia completa
+  persist           persist_artifacts (JSON + CSV + .sha256 + imagen anotada JPEG) en un directorio temporal
+  anchor_mock       emisión + verificación del OP_RETURN contra el mock de WhatsOnChain (scripts/mock_woc_server.py)
+y, con --scene, el análisis completo (run_analysis_on_image + persist) de los frames de una escena del dataset.
+
+Cada caso se repite --repeat veces (tras un calentamiento) y se guarda la mediana, p90 y mínimo en ms por llamada;
+los casos muy rápidos se miden en bucle (como timeit) para que cada muestra dure al menos --min-sample-ms.
+El resultado es un JSON (--out) con los metadatos de la máquina y las versiones. Con --baseline se compara la mediana
+de cada caso con la de la línea base y el script sale con código 1 si alguno empeora más de --threshold (y más de
+--min-delta-ms, para no saltar por ruido en casos de microsegundos). La línea base solo vale en la máquina y con
+el modelo con los que se grabó: generarla allí con --save-baseline.
+
+Uso:
+    python scripts/bench_pipeline.py --out artifacts/bench/actual.json
+    python scripts/bench_pipeline.py --save-baseline artifacts/bench/baseline.json
+    python scripts/bench_pipeline.py --baseline artifacts/bench/baseline.json --threshold 0.15
+    python scripts/bench_pipeline.py --sizes 1280x720 --counts 0,200 --skip detect_image --scene sec2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from uav_traffic_ai.ingest.media import PNG, ImageEncoding, encode_image_bytes, read_image_bgr
+from uav_traffic_ai.metrics.traffic_metrics import compute_metrics
+from uav_traffic_ai.pipeline import build_evidence, evidence_sha256, persist_artifacts, run_analysis_on_image
+from uav_traffic_ai.schemas import Evidence, SceneMeta
+from uav_traffic_ai.settings import load_settings
+from uav_traffic_ai.vision.detections import DetectionArrays
+from uav_traffic_ai.vision.detector import Detector, detector_from_settings
+
+STAGES = ("detect_image", "compute_metrics", "hash", "persist", "anchor_mock", "scene")
+NAMES = {0: "person", 1: "bicycle", 2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+CREATED_AT = datetime(2024, 5, 17, 10, 30, tzinfo=timezone.utc)
+JPG = ImageEncoding(fmt="jpg")
+
+
+def _size(text: str) -> Tuple[int, int]:
+    w, h = (int(x) for x in text.lower().split("x"))
+    return w, h
+
+
+def synthetic_frame(w: int, h: int, seed: int) -> np.ndarray:
+    # ruido suavizado: se comprime como una imagen real, no como ruido blanco
+    rng = np.random.default_rng(seed)
+    return cv2.GaussianBlur(rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8), (0, 0), 3)
+
+
+def synthetic_detections(n: int, w: int, h: int, seed: int) -> DetectionArrays:
+    if n == 0:
+        return DetectionArrays.empty()
+    rng = np.random.default_rng(seed)
+    side = max(8.0, min(w, h) / 20)
+    xy = rng.uniform(0, [w - side, h - side], size=(n, 2))
+    wh = rng.uniform(side / 4, side, size=(n, 2))
+    return DetectionArrays.from_yolo(
+        np.hstack([xy, xy + wh]).astype(np.float32),
+        rng.uniform(0.25, 0.99, size=n).astype(np.float32),
+        rng.choice([2, 2, 2, 3, 5, 7, 1, 0], size=n),
+        NAMES,
+    )
+
+
+def measure(fn: Callable[[], Any], *, repeat: int, warmup: int, min_sample_s: float) -> Dict[str, float]:
+    """Mediana/p90/mínimo en ms por llamada; las llamadas rápidas se agrupan hasta durar min_sample_s."""
+    for _ in range(warmup):
+        fn()
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - t0 >= min_sample_s or number >= 1 << 20:
+            break
+        number *= 2
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append(1000 * (time.perf_counter() - t0) / number)
+    arr = np.array(samples)
+    return {
+        "median_ms": float(np.median(arr)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "min_ms": float(arr.min()),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def _version(dist: str) -> Optional[str]:
+    try:
+        return metadata.version(dist)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment(detector: Optional[Detector]) -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "ultralytics": _version("ultralytics"),
+        "onnxruntime": _version("onnxruntime"),
+        "torch": _version("torch"),
+        "detector": None if detector is None else {"backend": detector.backend, "model_id": detector.model_id},
+    }
+
+
+class Suite:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    def run(self, case: str, fn: Callable[[], Any], *, repeat: Optional[int] = None) -> None:
+        a = self.args
+        r = measure(fn, repeat=repeat or a.repeat, warmup=a.warmup, min_sample_s=a.min_sample_ms / 1000)
+        self.results[case] = r
+        print(f"  {case:<40} {r['median_ms']:>10.3f} {r['p90_ms']:>10.3f} {r['min_ms']:>10.3f}  x{r['number']}")
+
+
+def bench_detector(suite: Suite, detector: Detector, sizes: List[Tuple[int, int]]) -> None:
+    for w, h in sizes:
+        frame = synthetic_frame(w, h, seed=w)
+        suite.run(f"detect_image/{w}x{h}", lambda: detector.detect_image(frame, annotate=False))
+
+
+def _hash_uncached(evidence: Evidence) -> str:
+    # build_evidence deja serializadas las detecciones en la Evidence: sin vaciarlo solo se mediría el sha256 final
+    evidence._detections_json = None
+    return evidence_sha256(evidence)
+
+
+def bench_evidence(suite: Suite, args: argparse.Namespace, sizes: List[Tuple[int, int]], counts: List[int]) -> None:
+    scene = SceneMeta(scene_id="bench", scene_name="bench", lat=40.4066, lon=-3.6892)
+    tmp = Path(tempfile.mkdtemp(prefix="bench_pipeline_"))
+    try:
+        for w, h in sizes:
+            frame = synthetic_frame(w, h, seed=w)
+            image = encode_image_bytes(frame, JPG)
+            for n in counts:
+                dets = synthetic_detections(n, w, h, seed=n)
+                tag = f"{w}x{h}/n={n}"
+                if "compute_metrics" not in args.skip:
+                    suite.run(f"compute_metrics/{tag}", lambda: compute_metrics(dets, w, h))
+                if {"hash", "persist"} - set(args.skip):
+                    evidence = build_evidence(
+                        detections=dets, img_bgr=frame, scene=scene, model_weights="bench.pt", created_at=CREATED_AT
+                    )
+                if "hash" not in args.skip:
+                    suite.run(f"hash/{tag}", lambda: _hash_uncached(evidence))
+                if "persist" not in args.skip:
+                    suite.run(
+                        f"persist/{tag}",
+                        lambda: persist_artifacts(
+                            artifacts_base=tmp, evidence=evidence, annotated_image=image, prefix="bench", encoding=JPG
+                        ),
+                    )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_anchor_mock(suite: Suite) -> None:
+    # mismo camino que anchor_and_verify (pushdatas + lectura del OP_RETURN), sin testnet ni fondos
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from mock_woc_server import MockChain, mock_anchor_fn, serve
+
+    from uav_traffic_ai.blockchain.verify import verify_sha256_in_tx_opreturn
+
+    chain = MockChain()
+    server = serve(chain, 0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    anchor = mock_anchor_fn(base)
+    sha = "ab" * 32
+
+    def anchor_and_verify() -> None:
+        r = anchor(
+            chain_name="test",
+            wif="mock",
+            dust_sats=546,
+            scene_id="bench",
+            sha256_hex=sha,
+            model="bench.pt",
+            created_at_utc=CREATED_AT,
+        )
+        v = verify_sha256_in_tx_opreturn(woc_base=base, chain_name="test", txid=r.txid, expected_sha256_hex=sha)
+        if not v.ok:
+            raise RuntimeError("el mock no devolvió el OP_RETURN emitido")
+
+    try:
+        suite.run("anchor_mock", anchor_and_verify)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_scene(suite: Suite, args: argparse.Namespace, detector: Detector) -> None:
+    from uav_traffic_ai.batch import resolve_scene_frames
+
+    s = load_settings()
+    scene, paths = resolve_scene_frames(
+        scene_id=args.scene,
+        scenes_csv=s.traffic_scenes_csv,
+        dataset_dir=s.traffic_dataset_dir,
+        max_frames=args.scene_frames,
+    )
+    frames = [read_image_bgr(p) for p in paths]
+    tmp = Path(tempfile.mkdtemp(prefix="bench_pipeline_scene_"))
+    try:
+
+        def analyze_scene() -> None:
+            for i, img in enumerate(frames):
+                evidence, image = run_analysis_on_image(
+                    img_bgr=img, scene=scene, detector=detector, model_weights=detector.model_id, annotate=PNG
+                )
+                persist_artifacts(
+                    artifacts_base=tmp, evidence=evidence, annotated_image=image, prefix=f"scene_{i}", encoding=PNG
+                )
+
+        # una muestra es la escena entera: menos repeticiones
+        suite.run(f"scene/{args.scene}/frames={len(frames)}", analyze_scene, repeat=max(3, args.repeat // 3))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], *, threshold: float, min_delta_ms: float
+) -> List[str]:
+    """Casos cuya mediana empeora más de threshold (relativo) y de min_delta_ms (absoluto) respecto a la base."""
+    regressions = []
+    base_results = baseline.get("results", {})
+    print(f"\ncomparación con la línea base ({baseline.get('created_at', '?')}), umbral +{100 * threshold:.0f}%")
+    for case, r in results.items():
+        b = base_results.get(case)
+        if b is None:
+            print(f"  {case:<40} (sin línea base)")
+            continue
+        delta = r["median_ms"] - b["median_ms"]
+        ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] > 0 else float("inf")
+        bad = ratio > 1 + threshold and delta > min_delta_ms
+        mark = "❌" if bad else "✅"
+        print(f"  {mark} {case:<38} {b['median_ms']:>10.3f} -> {r['median_ms']:>10.3f} ms ({100 * (ratio - 1):+6.1f}%)")
+        if bad:
+            regressions.append(case)
+    missing = sorted(set(base_results) - set(results))
+    if missing:
+        print(f"  casos de la línea base no medidos ahora: {', '.join(missing)}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="640x360,1280x720,1920x1080,3840x2160")
+    parser.add_argument("--counts", type=str, default="0,20,200,2000", help="Detecciones por frame.")
+    parser.add_argument("--skip", nargs="*", default=[], choices=STAGES, help="Etapas que no se miden.")
+    parser.add_argument("--scene", type=str, default=None, help="Escena del dataset para el caso de extremo a extremo.")
+    parser.add_argument("--scene-frames", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--min-sample-ms", type=float, default=20.0)
+    parser.add_argument("--out", type=Path, default=None, help="JSON de resultados (por defecto artifacts/bench/).")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON de una ejecución anterior para comparar.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Empeoramiento relativo tolerado (0.15 = 15%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Empeoramiento absoluto mínimo para avisar.")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="Guardar también el resultado como base.")
+    args = parser.parse_args()
+
+    sizes = [_size(x) for x in args.sizes.split(",") if x]
+    counts = [int(x) for x in args.counts.split(",") if x]
+    needs_detector = "detect_image" not in args.skip or (args.scene and "scene" not in args.skip)
+    detector = detector_from_settings(load_settings(), warmup=True) if needs_detector else None
+
+    suite = Suite(args)
+    print(f"  {'caso':<40} {'mediana ms':>10} {'p90 ms':>10} {'mín ms':>10}")
+    if "detect_image" not in args.skip:
+        bench_detector(suite, detector, sizes)
+    bench_evidence(suite, args, sizes, counts)
+    if "anchor_mock" not in args.skip:
+        bench_anchor_mock(suite)
+    if args.scene and "scene" not in args.skip:
+        bench_scene(suite, args, detector)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(detector),
+        "config": {
+            "sizes": args.sizes,
+            "counts": args.counts,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "min_sample_ms": args.min_sample_ms,
+            "scene": args.scene,
+            "scene_frames": args.scene_frames,
+        },
+        "results": suite.results,
+    }
+    stamp = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+    out = args.out or load_settings().artifacts_dir / "bench" / f"bench_{stamp}.json"
+    for path in filter(None, [out, args.save_baseline]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nresultados: {out}" + (f" (línea base: {args.save_baseline})" if args.save_baseline else ""))
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("environment") != report["environment"]:
+            print("⚠️  la línea base es de otra máquina, versión o modelo: la comparación es orientativa")
+        regressions = compare(suite.results, baseline, threshold=args.threshold, min_delta_ms=args.min_delta_ms)
+        if regressions:
+            print(f"❌ {len(regressions)} regresiones: {', '.join(regressions)}")
+            raise SystemExit(1)
+        print("✅ sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Coste del profiler: un punto de medida (timer/count) apagado y encendido, y build_evidence + hash sobre frames
+sintéticos sin profiler, con PROFILE=1 y con PROFILE_EVIDENCE=1 (collect() por frame). Con el profiler apagado los
+puntos de medida deberían quedar en el ruido frente a un frame real (decenas de ms).
+
+Uso:
+    python scripts/bench_profiling.py
+    python scripts/bench_profiling.py --calls 1000000 --frames 500 --boxes 200
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Tuple
+
+import numpy as np
+
+from uav_traffic_ai.pipeline import build_evidence
+from uav_traffic_ai.profiling import count, default_profiler, evidence_timings_ms, timer
+from uav_traffic_ai.schemas import SceneMeta
+from uav_traffic_ai.vision.detections import DetectionArrays
+
+NAMES = {0: "person", 1: "bicycle", 2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+
+
+def _detections(n: int, w: int, h: int, seed: int) -> DetectionArrays:
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, [w - 64, h - 64], size=(n, 2))
+    wh = rng.uniform(8, 64, size=(n, 2))
+    return DetectionArrays.from_yolo(
+        np.hstack([xy, xy + wh]).astype(np.float32),
+        rng.uniform(0.25, 0.99, size=n).astype(np.float32),
+        rng.choice([2, 2, 2, 3, 5, 7, 1, 0], size=n),
+        NAMES,
+    )
+
+
+def per_call_ns(calls: int) -> Tuple[float, float]:
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        with timer("bench.timer"):
+            pass
+    t_timer = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        count("bench.count")
+    t_count = time.perf_counter() - t0
+    return 1e9 * t_timer / calls, 1e9 * t_count / calls
+
+
+def evidence_loop(dets: list, img: np.ndarray, scene: SceneMeta) -> float:
+    profiler = default_profiler()
+    t0 = time.perf_counter()
+    for d in dets:
+        with profiler.collect() as own:
+            e = build_evidence(detections=d, img_bgr=img, scene=scene, model_weights="yolov8s.pt")
+        if profiler.evidence_timings:
+            e.timings = evidence_timings_ms(own)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000, help="Llamadas para el coste por punto de medida.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--boxes", type=int, default=60, help="Detecciones por frame.")
+    args = parser.parse_args()
+
+    profiler = default_profiler()
+    w, h = 1920, 1080
+    img = np.zeros((h, w, 3), dtype=np.uint8)
+    scene = SceneMeta(scene_id="bench")
+    dets = [_detections(args.boxes, w, h, seed=i) for i in range(args.frames)]
+
+    modes = [("apagado", False, False), ("PROFILE=1", True, False), ("PROFILE_EVIDENCE=1", True, True)]
+    print(f"{'modo':<20} {'timer ns':>9} {'count ns':>9} {'evidencia ms/frame':>19}")
+    base = None
+    for label, enabled, per_evidence in modes:
+        profiler.configure(enabled=enabled, evidence_timings=per_evidence)
+        profiler.reset()
+        t_ns, c_ns = per_call_ns(args.calls)
+        evidence_loop(dets[: min(20, len(dets))], img, scene)  # warm-up
+        ms = 1000 * evidence_loop(dets, img, scene) / len(dets)
+        base = ms if base is None else base
+        print(f"{label:<20} {t_ns:>9.0f} {c_ns:>9.0f} {ms:>13.3f} ({100 * (ms / base - 1):+5.1f}%)")
+    profiler.configure(enabled=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Coste de persistir un run: ficheros por frame (persist_artifacts: JSON + CSV + .sha256 [+ imagen]) frente al
+RunStore (evidence.jsonl + detections.csv + images.pack + índice, con volcados agrupados).
+También mide el CSV por frame con pandas (la implementación anterior de save_detections_csv) y cuánto tarda
+exportar después los ficheros por frame desde el store.
+
+Las evidencias son sintéticas (cajas aleatorias, sin modelo) y se construyen antes de medir: solo se cronometra la escritura.
+
+Uso:
+    python scripts/bench_run_store.py --frames 2000 --boxes 60
+    python scripts/bench_run_store.py --frames 500 --boxes 200 --image-kb 400 --out /mnt/disco_lento/bench
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from uav_traffic_ai.pipeline import build_evidence, export_run_store, persist_artifacts, store_artifacts
+from uav_traffic_ai.reporting.exporter import DETECTION_COLUMNS, detection_rows
+from uav_traffic_ai.reporting.run_store import RunStore
+from uav_traffic_ai.schemas import SceneMeta
+from uav_traffic_ai.vision.detections import DetectionArrays
+
+
+def fake_detections(n: int, rng: np.random.Generator) -> DetectionArrays:
+    xy = rng.uniform(0, [1860, 1020], size=(n, 2))
+    wh = rng.uniform(12, 60, size=(n, 2))
+    return DetectionArrays.from_yolo(
+        np.hstack([xy, xy + wh]).astype(np.float32),
+        rng.uniform(0.25, 0.99, size=n).astype(np.float32),
+        rng.choice([2, 3, 5, 7], size=n),
+        {2: "car", 3: "motorcycle", 5: "bus", 7: "truck"},
+    )
+
+
+def count_files(root: Path) -> int:
+    return sum(len(files) for _, _, files in os.walk(root))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--boxes", type=int, default=60, help="Cajas por frame.")
+    parser.add_argument("--image-kb", type=int, default=0, help="Tamaño de la imagen anotada (0 = headless).")
+    parser.add_argument("--flush-every", type=int, default=256)
+    parser.add_argument("--out", type=str, default=None, help="Directorio de pruebas (por defecto uno temporal).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    img = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    created_at = datetime.now(timezone.utc)
+    evidences = [
+        build_evidence(
+            detections=fake_detections(args.boxes, rng),
+            img_bgr=img,
+            scene=SceneMeta(scene_id="bench"),
+            model_weights="yolov8s.pt",
+            created_at=created_at,
+        )
+        for _ in range(args.frames)
+    ]
+    image = os.urandom(args.image_kb * 1024) if args.image_kb else None
+    n = len(evidences)
+
+    base = Path(args.out) if args.out else Path(tempfile.mkdtemp(prefix="bench_run_store_"))
+    base.mkdir(parents=True, exist_ok=True)
+    print(f"{n} frames, {args.boxes} cajas/frame, imagen {args.image_kb} KB, en {base}")
+    print(f"{'modo':<34} {'s':>7} {'ms/frame':>9} {'ficheros':>9}")
+
+    def row(label: str, secs: float, root: Path) -> None:
+        print(f"{label:<34} {secs:7.2f} {1000 * secs / n:9.2f} {count_files(root):9d}")
+
+    files_dir = base / "per_frame"
+    t0 = time.perf_counter()
+    for i, e in enumerate(evidences):
+        persist_artifacts(artifacts_base=files_dir, evidence=e, annotated_image=image, prefix=f"bench_{i:06d}")
+    row("ficheros por frame", time.perf_counter() - t0, files_dir)
+
+    try:
+        import pandas as pd
+
+        pandas_dir = base / "pandas_csv"
+        pandas_dir.mkdir(parents=True, exist_ok=True)
+        t0 = time.perf_counter()
+        for i, e in enumerate(evidences):
+            rows = [dict(zip(DETECTION_COLUMNS, r)) for r in detection_rows(e.detections)]
+            pd.DataFrame(rows).to_csv(pandas_dir / f"bench_{i:06d}_detections.csv", index=False)
+        row("  solo CSV con pandas (anterior)", time.perf_counter() - t0, pandas_dir)
+    except ImportError:
+        pass
+
+    store_dir = base / "run"
+    t0 = time.perf_counter()
+    with RunStore(store_dir, flush_every=args.flush_every) as store:
+        for i, e in enumerate(evidences):
+            store_artifacts(store=store, evidence=e, annotated_image=image, prefix=f"bench_{i:06d}")
+    row(f"run store (flush cada {args.flush_every})", time.perf_counter() - t0, store_dir)
+
+    export_dir = base / "export"
+    t0 = time.perf_counter()
+    export_run_store(store=RunStore(store_dir, readonly=True), artifacts_base=export_dir)
+    row("export del store a ficheros", time.perf_counter() - t0, export_dir)
+
+    if not args.out:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
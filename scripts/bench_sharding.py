@@ -0,0 +1,84 @@
+"""
+Escalado del modo sharded (N procesos) frente al path serial, sobre una o varias escenas.
+Comprueba además que el sha256 de cada frame coincide con el del path serial.
+
+Uso:
+    python scripts/bench_sharding.py --scene sec1 sec2 --workers 1,2,4,8 --max-frames 128
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+from uav_traffic_ai.batch import resolve_scene_frames
+from uav_traffic_ai.pipeline import run_analysis_on_scene
+from uav_traffic_ai.settings import load_settings
+from uav_traffic_ai.sharding import run_sharded, scaling_report
+from uav_traffic_ai.vision.detector import YoloDetector
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scene", type=str, nargs="+", required=True)
+    parser.add_argument("--stride", type=int, default=1)
+    parser.add_argument("--max-frames", type=int, default=128)
+    parser.add_argument("--workers", type=str, default="1,2,4,8")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    s = load_settings()
+    batch_size = args.batch_size or s.yolo_batch_size
+    scenes = [
+        resolve_scene_frames(
+            scene_id=sid,
+            scenes_csv=s.traffic_scenes_csv,
+            dataset_dir=s.traffic_dataset_dir,
+            stride=args.stride,
+            max_frames=args.max_frames,
+        )
+        for sid in args.scene
+    ]
+    created_at = datetime.now(timezone.utc)
+
+    # Referencia serial: un proceso, un detector.
+    detector = YoloDetector(weights=s.yolo_weights, conf=s.yolo_conf, iou=s.yolo_iou)
+    t0 = time.perf_counter()
+    serial = []
+    for scene, frames in scenes:
+        serial.extend(
+            e.sha256
+            for e, _ in run_analysis_on_scene(
+                frame_paths=frames,
+                scene=scene,
+                detector=detector,
+                model_weights=s.yolo_weights,
+                batch_size=batch_size,
+                created_at=created_at,
+            )
+        )
+    serial_s = time.perf_counter() - t0
+    print(f"serial: frames={len(serial)} fps={len(serial) / serial_s:.2f}")
+
+    runs = []
+    for n in [int(x) for x in args.workers.split(",") if x.strip()]:
+        results, stats = run_sharded(
+            scenes=scenes,
+            workers=n,
+            weights=s.yolo_weights,
+            conf=s.yolo_conf,
+            iou=s.yolo_iou,
+            batch_size=batch_size,
+            created_at=created_at,
+        )
+        mismatches = sum(1 for r, h in zip(results, serial) if r.evidence.sha256 != h)
+        print(f"workers={n}: fps={stats.fps:.2f} sha256 distintos del serial={mismatches}")
+        runs.append(stats)
+
+    print()
+    print(scaling_report(runs))
+    print(f"(referencia serial en proceso: {len(serial) / serial_s:.2f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
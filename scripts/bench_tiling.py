@@ -0,0 +1,113 @@
+"""
+Recall vs tiempo de la inferencia por teselas en frames grandes.
+
+Compara la pasada normal (frame completo reescalado a 640) con varias configuraciones de teselas.
+La referencia es, por orden: etiquetas YOLO (--labels, un .txt "cls cx cy w h" normalizado por imagen)
+o, si no hay, la configuración más densa del barrido (pseudo ground truth: mide cuánto se pierde al abaratar).
+Recall = cajas de referencia con IoU >= 0.5 con alguna detección (sin tener en cuenta la clase).
+
+Uso:
+    python scripts/bench_tiling.py --input "data/raw/traffic/sec2/*.jpg" --frames 8
+    python scripts/bench_tiling.py --input "frames/*.jpg" --upscale 2 --min-std 8     # simula 4K desde 1080p
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from uav_traffic_ai.batch import resolve_path_frames
+from uav_traffic_ai.ingest.media import read_image_bgr
+from uav_traffic_ai.settings import load_settings
+from uav_traffic_ai.vision.detector import YoloDetector
+from uav_traffic_ai.vision.tiling import TileConfig, box_overlap
+
+
+def load_labels(labels_dir: Path, frame: Path, w: int, h: int) -> Optional[np.ndarray]:
+    p = labels_dir / f"{frame.stem}.txt"
+    if not p.exists():
+        return None
+    rows = np.loadtxt(p, ndmin=2)
+    if rows.size == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1).astype(np.float32)
+
+
+def recall(reference: np.ndarray, found: np.ndarray, iou: float = 0.5) -> Tuple[int, int]:
+    if len(reference) == 0:
+        return 0, 0
+    if len(found) == 0:
+        return 0, len(reference)
+    return int((box_overlap(reference, found, "iou").max(axis=1) >= iou).sum()), len(reference)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, required=True, help="Directorio o glob de imágenes.")
+    parser.add_argument("--frames", type=int, default=8)
+    parser.add_argument("--upscale", type=float, default=1.0, help="Reescalar los frames (p.ej. 2 = 1080p -> 4K).")
+    parser.add_argument("--labels", type=str, default=None, help="Directorio con etiquetas YOLO .txt.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 640])
+    parser.add_argument("--overlaps", type=float, nargs="+", default=[0.1, 0.25])
+    parser.add_argument("--min-std", type=float, default=0.0, help="Además, cada config saltando teselas lisas.")
+    args = parser.parse_args()
+
+    s = load_settings()
+    paths = resolve_path_frames(args.input)[: args.frames]
+    frames: List[np.ndarray] = []
+    for p in paths:
+        img = read_image_bgr(p)
+        if args.upscale != 1.0:
+            img = cv2.resize(img, None, fx=args.upscale, fy=args.upscale, interpolation=cv2.INTER_CUBIC)
+        frames.append(img)
+    h, w = frames[0].shape[:2]
+    print(f"{len(frames)} frames {w}x{h} weights={s.yolo_weights}")
+
+    configs: List[Tuple[str, TileConfig]] = [("frame completo", TileConfig())]
+    for size in args.sizes:
+        for ov in args.overlaps:
+            configs.append((f"teselas {size} ov={ov}", TileConfig(size=size, overlap=ov)))
+            if args.min_std > 0:
+                cfg = TileConfig(size=size, overlap=ov, min_std=args.min_std)
+                configs.append((f"teselas {size} ov={ov} std>={args.min_std}", cfg))
+
+    base = YoloDetector(weights=s.yolo_weights, conf=s.yolo_conf, iou=s.yolo_iou)
+    base.detect_image(frames[0])  # warm-up
+    found: Dict[str, List[np.ndarray]] = {}
+    timing: Dict[str, float] = {}
+    for label, cfg in configs:
+        base.tiling = cfg  # mismo modelo cargado, solo cambia la estrategia
+        t0 = time.perf_counter()
+        res = [base.detect_image(f) for f in frames]
+        timing[label] = (time.perf_counter() - t0) / len(frames)
+        found[label] = [r.arrays.xyxy.astype(np.float32) for r in res]
+
+    labels_dir = Path(args.labels) if args.labels else None
+    ref_name = "etiquetas"
+    refs: List[np.ndarray] = []
+    if labels_dir is not None:
+        for p, f in zip(paths, frames):
+            lab = load_labels(labels_dir, p, f.shape[1], f.shape[0])
+            refs.append(lab if lab is not None else np.zeros((0, 4), dtype=np.float32))
+    else:
+        ref_name = max(found, key=lambda k: sum(len(x) for x in found[k]))
+        refs = found[ref_name]
+
+    print(f"referencia: {ref_name}")
+    print(f"{'config':<32} {'ms/frame':>9} {'cajas/frame':>11} {'recall':>7}")
+    for label, _ in configs:
+        hit = total = 0
+        for ref, det in zip(refs, found[label]):
+            a, b = recall(ref, det)
+            hit, total = hit + a, total + b
+        n = sum(len(x) for x in found[label]) / len(frames)
+        print(f"{label:<32} {1000 * timing[label]:9.1f} {n:11.1f} {hit / max(1, total):7.1%}")
+
+
+if __name__ == "__main__":
+    main()
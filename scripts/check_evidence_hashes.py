@@ -0,0 +1,177 @@
+"""
+Regresión del sha256 de la evidencia: el hash anclado on-chain tiene que poder recalcularse siempre igual,
+así que cualquier cambio en la serialización (orjson, serializador por campos...) debe dar los mismos bytes.
+
+Comprueba, para un conjunto fijo de evidencias sintéticas (vacía, unicode, 2000 cajas, floats en notación
+exponencial, NaN, source de vídeo...):
+  1) build_evidence da el sha256 guardado en scripts/golden_evidence_hashes.json (generado con la
+     implementación de referencia, stable_json_dumps sobre el dict completo);
+  2) evidence_sha256 == sha256(stable_json_dumps(payload de referencia)) por ambos caminos (lista y columnas);
+  3) los bytes que se escriben a disco == stable_json_dumps(model_dump) (también tras anclar);
+  4) tras anclar en test y en main, el JSON escrito se relee y recompute_evidence_sha256 vuelve a dar su sha256.
+Con --dir, además re-calcula el hash de las evidencias ya guardadas (p.ej. las ancladas) y lo compara con su sha256.
+
+Uso:
+    python scripts/check_evidence_hashes.py
+    python scripts/check_evidence_hashes.py --dir artifacts/outputs
+    python scripts/check_evidence_hashes.py --record     # solo al añadir casos nuevos
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from uav_traffic_ai.pipeline import (
+    _evidence_payload_for_hash,
+    build_evidence,
+    evidence_json_bytes,
+    recompute_evidence_sha256,
+)
+from uav_traffic_ai.reporting.hashing import sha256_hex, stable_json_dumps
+from uav_traffic_ai.schemas import Evidence, FrameSource, SceneMeta
+from uav_traffic_ai.vision.detections import DetectionArrays
+
+GOLDEN = Path(__file__).with_name("golden_evidence_hashes.json")
+CREATED_AT = datetime(2024, 5, 17, 10, 30, 0, 123456, tzinfo=timezone.utc)
+NAMES = {0: "person", 1: "bicycle", 2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+
+
+def _arrays(xyxy: List[List[float]], conf: List[float], cls: List[int]) -> DetectionArrays:
+    return DetectionArrays.from_yolo(
+        np.array(xyxy, dtype=np.float32).reshape(-1, 4),
+        np.array(conf, dtype=np.float32),
+        np.array(cls, dtype=np.int64),
+        NAMES,
+    )
+
+
+def _random(n: int, w: int, h: int, seed: int) -> DetectionArrays:
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, [w - 64, h - 64], size=(n, 2))
+    wh = rng.uniform(8, 64, size=(n, 2))
+    return DetectionArrays.from_yolo(
+        np.hstack([xy, xy + wh]).astype(np.float32),
+        rng.uniform(0.25, 0.99, size=n).astype(np.float32),
+        rng.choice([2, 2, 2, 3, 5, 7, 1, 0], size=n),
+        NAMES,
+    )
+
+
+def build_cases() -> Dict[str, Tuple[DetectionArrays, Tuple[int, int], SceneMeta, str, object]]:
+    """nombre -> (detecciones, (w, h), escena, weights, source)."""
+    madrid = SceneMeta(scene_id="sec2", scene_name="Glorieta de Atocha — Madrid (ñ, ü, 🚗)", lat=40.4066, lon=-3.6892)
+    return {
+        "empty": (DetectionArrays.empty(), (1280, 720), SceneMeta(), "yolov8s.pt", None),
+        "small_unicode": (
+            _arrays([[10.5, 20.25, 110.75, 80.0], [300, 300, 340, 330], [5, 5, 9, 9]], [0.91, 0.42, 0.3], [2, 7, 3]),
+            (1920, 1080),
+            madrid,
+            "yolov8s.pt",
+            None,
+        ),
+        "dense_4k": (_random(2000, 3840, 2160, seed=7), (3840, 2160), madrid, "yolov8s.onnx", None),
+        # un vehículo de 2x2 px en 4K: occupancy_ratio ~ 5e-07 -> json lo escribe en notación exponencial
+        "exponent_floats": (_arrays([[1e-05, 0.0, 2.0, 2.0]], [0.25], [2]), (3840, 2160), SceneMeta(), "m.pt", None),
+        "huge_coords": (_arrays([[0, 0, 1e17, 3e16]], [0.5], [5]), (3840, 2160), SceneMeta(scene_id="x"), "m.pt", None),
+        "nan_conf": (_arrays([[1, 1, 50, 50]], [float("nan")], [2]), (640, 480), SceneMeta(scene_id="nan"), "m.pt", None),
+        "stream_source": (
+            _random(40, 1280, 720, seed=3),
+            (1280, 720),
+            SceneMeta(scene_id="vuelo01"),
+            "yolov8s.pt",
+            FrameSource(uri="rtsp://10.0.0.5/live", frame_index=1234, timestamp_s=41.133333),
+        ),
+    }
+
+
+def make_evidence(case, *, columnar: bool) -> Evidence:
+    arrays, (w, h), scene, weights, source = case
+    return build_evidence(
+        detections=arrays if columnar else arrays.to_detections(),
+        img_bgr=np.zeros((h, w, 3), dtype=np.uint8),
+        scene=scene,
+        model_weights=weights,
+        created_at=CREATED_AT,
+        source=source,
+    )
+
+
+def reference_sha256(e: Evidence) -> str:
+    # implementación original: dict completo -> stable_json_dumps -> sha256
+    return sha256_hex(stable_json_dumps(_evidence_payload_for_hash(e.model_copy(update={"sha256": ""}))))
+
+
+def check_cases(golden: Dict[str, str]) -> List[str]:
+    errors: List[str] = []
+    for name, case in build_cases().items():
+        for columnar in (True, False):
+            e = make_evidence(case, columnar=columnar)
+            tag = f"{name}[{'columnas' if columnar else 'lista'}]"
+            if e.sha256 != golden.get(name):
+                errors.append(f"{tag}: sha256 {e.sha256} != golden {golden.get(name)}")
+            if reference_sha256(e) != e.sha256:
+                errors.append(f"{tag}: sha256 distinto de la implementación de referencia")
+            for txid, verified in ((None, None), ("ab" * 32, True)):
+                e.txid, e.verified = txid, verified
+                if evidence_json_bytes(e) != stable_json_dumps(e.model_dump(mode="json")).encode("utf-8"):
+                    errors.append(f"{tag}: JSON escrito distinto de stable_json_dumps (txid={txid})")
+            for chain in ("test", "main"):
+                # lo que hacen anchor_and_verify / el anclaje por lote / la cola: txid y red tras el hash
+                e.txid, e.verified, e.bsv_chain = "cd" * 32, True, chain
+                reread = Evidence.model_validate_json(evidence_json_bytes(e))
+                if recompute_evidence_sha256(reread) != e.sha256:
+                    errors.append(f"{tag}: anclada en {chain}, el hash recalculado no coincide con su sha256")
+    return errors
+
+
+def check_dir(root: Path) -> Tuple[int, List[str]]:
+    errors: List[str] = []
+    n = 0
+    for p in sorted(root.rglob("*.json")):
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except ValueError:
+            continue
+        if not isinstance(data, dict) or data.get("schema_version") != "uav_traffic_ai_evidence_v1":
+            continue  # flow.json, pruebas Merkle...
+        e = Evidence.model_validate(data)
+        n += 1
+        if recompute_evidence_sha256(e) != e.sha256:
+            errors.append(f"{p}: el hash recalculado no coincide con el guardado")
+    return n, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", type=str, default=None, help="Re-hashear también las evidencias de este directorio.")
+    parser.add_argument("--record", action="store_true", help="Regenerar el fichero golden con la referencia.")
+    args = parser.parse_args()
+
+    if args.record:
+        cases = build_cases()
+        golden = {name: reference_sha256(make_evidence(c, columnar=False)) for name, c in cases.items()}
+        GOLDEN.write_text(json.dumps(golden, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"golden: {GOLDEN} ({len(golden)} casos)")
+        return
+
+    errors = check_cases(json.loads(GOLDEN.read_text(encoding="utf-8")))
+    print(f"casos sintéticos: {len(build_cases())} x 2 caminos")
+    if args.dir:
+        n, dir_errors = check_dir(Path(args.dir))
+        print(f"evidencias en {args.dir}: {n}")
+        errors += dir_errors
+    for err in errors:
+        print(f"❌ {err}")
+    if errors:
+        sys.exit(1)
+    print("✅ hashes y bytes idénticos a la referencia")
+
+
+if __name__ == "__main__":
+    main()
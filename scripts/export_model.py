@@ -0,0 +1,35 @@
+"""
+Exporta los pesos de YOLO_WEIGHTS para los backends de CPU sin PyTorch (DETECTOR_BACKEND=onnx|openvino).
+El fichero queda junto a los pesos (yolov8s.onnx, yolov8s_openvino_model/), que es donde lo busca
+make_detector si DETECTOR_MODEL_PATH está vacío.
+
+Uso:
+    python scripts/export_model.py --format onnx
+    python scripts/export_model.py --format openvino --imgsz 640
+"""
+from __future__ import annotations
+
+import argparse
+
+from uav_traffic_ai.settings import load_settings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", type=str, default=None, help="Por defecto YOLO_WEIGHTS.")
+    parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--imgsz", type=int, default=640, help="Tamaño de entrada fijo del modelo exportado.")
+    parser.add_argument("--dynamic", action="store_true", help="Batch/tamaño dinámicos (solo onnx).")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    weights = args.weights or load_settings().yolo_weights
+    kwargs = {"dynamic": True} if args.dynamic and args.format == "onnx" else {}
+    out = YOLO(weights).export(format=args.format, imgsz=args.imgsz, **kwargs)
+    print(f"✅ Exportado: {out}")
+    print(f"DETECTOR_BACKEND={args.format}  DETECTOR_MODEL_PATH={out}")
+
+
+if __name__ == "__main__":
+    main()
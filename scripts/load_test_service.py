@@ -0,0 +1,158 @@
+"""
+Prueba de carga del servicio HTTP (main.py serve): N clientes concurrentes enviando frames a POST /analyze,
+con latencia p50/p99 por petición y throughput para cada nivel de concurrencia. Del /health del servidor saca
+cuántos frames metió el DynamicBatcher en cada inferencia.
+
+Sin --url arranca el servicio en el proceso (detector de DETECTOR_BACKEND, artefactos en un directorio temporal,
+sin caché de resultados) y con --compare repite cada nivel sin agrupar (SERVICE_MAX_BATCH=1).
+Contra un servidor ya arrancado, usa `main.py serve --no-cache`: los frames se repiten y la caché los serviría.
+
+Uso:
+    python scripts/load_test_service.py --concurrency 1 4 8 16 --requests 200 --compare
+    python scripts/load_test_service.py --max-batch 16 --max-wait-ms 5 --size 640
+    python scripts/load_test_service.py --url http://127.0.0.1:8080 --concurrency 1 8
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+import requests
+
+from uav_traffic_ai.service import make_server, service_from_settings
+from uav_traffic_ai.settings import load_settings
+from uav_traffic_ai.vision.detector import detector_from_settings
+
+
+def synthetic_frames(n: int, size: int) -> List[bytes]:
+    # ruido suavizado desplazado: frames distintos con un JPEG de tamaño realista
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur(rng.integers(0, 256, size=(size, size * 16 // 9, 3), dtype=np.uint8), (0, 0), 3)
+    out = []
+    for i in range(n):
+        ok, buf = cv2.imencode(".jpg", np.roll(base, 13 * i, axis=1), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        out.append(bytes(buf))
+    return out
+
+
+def run_level(
+    url: str, frames: List[bytes], *, concurrency: int, requests_total: int
+) -> Tuple[List[float], float, int]:
+    """(latencias en s de las peticiones correctas, segundos de pared, errores)."""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests_total))
+
+    def client() -> None:
+        session = requests.Session()  # keep-alive, como una estación que sube frames seguidos
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                r = session.post(
+                    f"{url}/analyze",
+                    params={"scene_id": "loadtest", "annotate": "0"},
+                    data=frames[i % len(frames)],
+                    timeout=120,
+                )
+                ok = r.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - t0, errors[0]
+
+
+def batcher_stats(url: str) -> Dict[str, float]:
+    return requests.get(f"{url}/health", timeout=10).json()["batcher"]
+
+
+def sweep(url: str, frames: List[bytes], args: argparse.Namespace, label: str) -> None:
+    print(label)
+    print(
+        f"  {'clientes':>8} {'peticiones':>10} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'frames/lote':>11} "
+        f"{'errores':>7}"
+    )
+    for c in args.concurrency:
+        run_level(url, frames, concurrency=c, requests_total=min(args.warmup, args.requests))  # conexiones + modelo
+        before = batcher_stats(url)
+        lat, wall, errors = run_level(url, frames, concurrency=c, requests_total=args.requests)
+        after = batcher_stats(url)
+        batches = after["batches"] - before["batches"]
+        per_batch = (after["frames"] - before["frames"]) / batches if batches else 0.0
+        if lat:
+            p50, p99 = np.percentile(np.array(lat) * 1000, [50, 99])
+        else:
+            p50 = p99 = float("nan")
+        print(f"  {c:>8} {len(lat):>10} {p50:>9.1f} {p99:>9.1f} {len(lat) / wall:>8.1f} {per_batch:>11.2f} {errors:>7}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", type=str, default=None, help="Servidor ya arrancado (si no, se arranca aquí).")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por nivel de concurrencia.")
+    parser.add_argument("--warmup", type=int, default=16, help="Peticiones descartadas antes de cada nivel.")
+    parser.add_argument("--frames", type=int, default=32, help="Frames distintos que se van rotando.")
+    parser.add_argument("--size", type=int, default=720, help="Alto de los frames sintéticos (16:9).")
+    parser.add_argument("--max-batch", type=int, default=None, help="Por defecto SERVICE_MAX_BATCH.")
+    parser.add_argument("--max-wait-ms", type=float, default=None, help="Por defecto SERVICE_MAX_WAIT_MS.")
+    parser.add_argument("--compare", action="store_true", help="Repetir sin agrupar (lotes de 1 frame).")
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.frames, args.size)
+    print(f"{len(frames)} frames JPEG de {args.size}p ({sum(map(len, frames)) / len(frames) / 1024:.0f} KiB de media)")
+    if args.url:
+        sweep(args.url.rstrip("/"), frames, args, f"servidor {args.url}")
+        return
+
+    s = load_settings()
+    detector = detector_from_settings(s)
+    max_batch = args.max_batch or s.service_max_batch
+    max_wait_ms = s.service_max_wait_ms if args.max_wait_ms is None else args.max_wait_ms
+    configs = [(max_batch, max_wait_ms)] + ([(1, 0.0)] if args.compare else [])
+    tmp = Path(tempfile.mkdtemp(prefix="load_test_service_"))
+    try:
+        for mb, wait in configs:
+            service = service_from_settings(
+                s, detector=detector, max_batch=mb, max_wait_ms=wait, annotate=None, artifacts_dir=tmp
+            )
+            server = make_server(service, "127.0.0.1", 0)
+            service.start()
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                url = f"http://127.0.0.1:{server.server_address[1]}"
+                label = f"{detector.model_id} ({detector.backend}): lotes de hasta {mb}, espera {wait:g} ms"
+                sweep(url, frames, args, label)
+            finally:
+                server.shutdown()
+                server.server_close()
+                service.stop()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
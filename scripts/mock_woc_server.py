@@ -0,0 +1,262 @@
+"""
+Mock local de WhatsOnChain (lectura de OP_RETURN) + un endpoint de broadcast simplificado,
+para probar la cola de anclaje y la verificación sin testnet ni fondos.
+
+    GET  /v1/bsv/<net>/tx/<txid>/opreturn   -> [{"n": 0, "hex": "006a..."}]  (404 hasta que "propaga")
+    GET  /v1/bsv/<net>/tx/hash/<txid>       -> {"txid": "...", "confirmations": 0|1, "blockhash": ...}
+    POST /v1/bsv/<net>/tx/pushdatas         -> {"txid": "..."}  body: {"pushdatas": ["...", ...]}
+
+Uso:
+    python scripts/mock_woc_server.py --port 8089 --propagation-delay 2
+    python scripts/mock_woc_server.py --selftest 20      # AnchorQueue contra el mock, en proceso
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import requests
+
+from uav_traffic_ai.blockchain.bsv_anchor import AnchorResult
+
+_OPRETURN_RE = re.compile(r"^/v1/bsv/(\w+)/tx/([0-9a-f]+)/opreturn$")
+_BROADCAST_RE = re.compile(r"^/v1/bsv/(\w+)/tx/pushdatas$")
+_TX_INFO_RE = re.compile(r"^/v1/bsv/(\w+)/tx/hash/([0-9a-f]+)$")
+
+
+def opreturn_script_hex(pushdatas: List[str]) -> str:
+    # OP_FALSE OP_RETURN + pushes (<=75 bytes directo, si no OP_PUSHDATA1)
+    out = bytearray(b"\x00\x6a")
+    for p in pushdatas:
+        b = p.encode("utf-8")
+        if len(b) <= 75:
+            out.append(len(b))
+        else:
+            out += bytes([0x4C, len(b)])
+        out += b
+    return out.hex()
+
+
+class MockChain:
+    def __init__(
+        self,
+        *,
+        latency_s: float = 0.0,
+        propagation_delay_s: float = 0.0,
+        fail_rate: float = 0.0,
+        max_rps: float = 0.0,
+        confirmation_delay_s: float = 0.0,
+    ) -> None:
+        self.latency_s = latency_s
+        self.propagation_delay_s = propagation_delay_s
+        self.confirmation_delay_s = confirmation_delay_s  # desde que es visible hasta que "entra en un bloque"
+        self.fail_rate = fail_rate
+        self.max_rps = max_rps  # 0 = sin límite; por encima responde 429 como WhatsOnChain
+        self.txs: Dict[str, Tuple[float, str]] = {}  # txid -> (visible_desde, script_hex)
+        self.requests = 0
+        self.rejected_429 = 0
+        self.lock = threading.Lock()
+        self._recent: deque = deque()
+
+    def over_limit(self) -> bool:
+        if not self.max_rps:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_rps:
+                self.rejected_429 += 1
+                return True
+            self._recent.append(now)
+        return False
+
+    def broadcast(self, pushdatas: List[str]) -> str:
+        script = opreturn_script_hex(pushdatas)
+        txid = hashlib.sha256(f"{script}{time.time_ns()}".encode()).hexdigest()
+        with self.lock:
+            self.txs[txid] = (time.time() + self.propagation_delay_s, script)
+        return txid
+
+    def opreturn(self, txid: str) -> List[Dict[str, object]] | None:
+        with self.lock:
+            item = self.txs.get(txid)
+        if item is None or time.time() < item[0]:
+            return None
+        return [{"n": 0, "hex": item[1]}]
+
+    def tx_info(self, txid: str) -> Dict[str, object] | None:
+        with self.lock:
+            item = self.txs.get(txid)
+        if item is None or time.time() < item[0]:
+            return None
+        mined = time.time() >= item[0] + self.confirmation_delay_s
+        blockhash = hashlib.sha256(txid.encode()).hexdigest() if mined else ""
+        return {"txid": txid, "confirmations": int(mined), "blockhash": blockhash}
+
+
+def make_handler(chain: MockChain):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args) -> None:  # silencio
+            pass
+
+        def _send(self, code: int, payload: object, headers: Dict[str, str] | None = None) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _maybe_fail(self) -> bool:
+            with chain.lock:
+                chain.requests += 1
+            if chain.over_limit():
+                self._send(429, {"error": "mock: rate limit"}, {"Retry-After": "1"})
+                return True
+            if chain.latency_s:
+                time.sleep(chain.latency_s)
+            if chain.fail_rate and random.random() < chain.fail_rate:
+                self._send(503, {"error": "mock: fallo simulado"})
+                return True
+            return False
+
+        def do_GET(self) -> None:
+            m = _OPRETURN_RE.match(self.path)
+            info = _TX_INFO_RE.match(self.path)
+            if not (m or info):
+                return self._send(404, {"error": "not found"})
+            if self._maybe_fail():
+                return
+            data = chain.opreturn(m.group(2)) if m else chain.tx_info(info.group(2))
+            if data is None:
+                return self._send(404, {"error": "unknown tx"})
+            self._send(200, data)
+
+        def do_POST(self) -> None:
+            if not _BROADCAST_RE.match(self.path):
+                return self._send(404, {"error": "not found"})
+            if self._maybe_fail():
+                return
+            n = int(self.headers.get("Content-Length", "0"))
+            body = json.loads(self.rfile.read(n) or b"{}")
+            self._send(200, {"txid": chain.broadcast([str(x) for x in body.get("pushdatas", [])])})
+
+    return Handler
+
+
+def serve(chain: MockChain, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(chain))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def mock_anchor_fn(base_url: str):
+    """Sustituto de anchor_sha256_opreturn que emite contra el mock (mismos pushdatas)."""
+
+    def anchor(*, chain_name, wif, dust_sats, scene_id, sha256_hex, model, created_at_utc, prefix="UAVTAIVD_V1"):
+        ts = created_at_utc.replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
+        r = requests.post(
+            f"{base_url}/v1/bsv/{chain_name}/tx/pushdatas",
+            json={"pushdatas": [prefix, scene_id, sha256_hex, ts, model]},
+            timeout=10,
+        )
+        r.raise_for_status()
+        return AnchorResult(txid=r.json()["txid"], raw_response=r.text)
+
+    return anchor
+
+
+def selftest(chain: MockChain, port: int, n: int, concurrency: int) -> None:
+    from uav_traffic_ai.blockchain.anchor_queue import AnchorQueue
+    from uav_traffic_ai.reporting.exporter import save_json
+    from uav_traffic_ai.schemas import Evidence, Metrics, SceneMeta
+
+    base = f"http://127.0.0.1:{port}"
+    tmp = Path(tempfile.mkdtemp(prefix="anchorq_"))
+    q = AnchorQueue(
+        tmp / "queue",
+        chain_name="test",
+        wif="mock",
+        dust_sats=546,
+        woc_base=base,
+        concurrency=concurrency,
+        base_backoff_s=0.2,
+        anchor_fn=mock_anchor_fn(base),
+    ).start()
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        e = Evidence(
+            created_at_utc=datetime.now(timezone.utc),
+            model_weights="mock.pt",
+            scene=SceneMeta(scene_id="mock"),
+            image_width=1,
+            image_height=1,
+            detections=[],
+            metrics=Metrics(),
+            sha256=hashlib.sha256(str(i).encode()).hexdigest(),
+        )
+        json_path = tmp / f"mock_{i:04d}.json"
+        save_json(json_path, e.model_dump(mode="json"))
+        q.submit(e, json_path)
+    submit_s = time.perf_counter() - t0
+
+    q.drain(timeout=120)
+    q.stop()
+    done_s = time.perf_counter() - t0
+    verified = sum(1 for p in tmp.glob("mock_*.json") if json.loads(p.read_text())["verified"])
+    print(f"encolado {n} evidencias en {1000 * submit_s:.1f} ms (no bloqueante)")
+    print(f"cola vaciada en {done_s:.2f}s estado={q.counts()} JSON verificados={verified}/{n}")
+    print(f"peticiones al mock={chain.requests} directorio={tmp}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia por petición (s).")
+    parser.add_argument("--propagation-delay", type=float, default=1.0, help="Segundos hasta que el OP_RETURN es visible.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fracción de peticiones que devuelven 503.")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="Peticiones/s antes de responder 429 (0 = sin límite).")
+    parser.add_argument("--confirmation-delay", type=float, default=0.0, help="Segundos en mempool antes del bloque.")
+    parser.add_argument("--selftest", type=int, default=0, help="N evidencias a anclar con AnchorQueue contra el mock.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    chain = MockChain(
+        latency_s=args.latency,
+        propagation_delay_s=args.propagation_delay,
+        fail_rate=args.fail_rate,
+        max_rps=args.max_rps,
+        confirmation_delay_s=args.confirmation_delay,
+    )
+    server = serve(chain, args.port)
+    print(f"mock WoC en http://127.0.0.1:{args.port}")
+
+    if args.selftest:
+        selftest(chain, args.port, args.selftest, args.concurrency)
+        server.shutdown()
+        return
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
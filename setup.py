@@ -5,4 +5,9 @@ setup(
     version="0.1.0",
     packages=find_packages(where="src"),
     package_dir={"": "src"},
+    # backends de inferencia sin PyTorch (DETECTOR_BACKEND=onnx / openvino): pip install -e .[onnx]
+    extras_require={
+        "onnx": ["onnxruntime>=1.16.0"],
+        "openvino": ["openvino>=2023.1.0", "pyyaml>=6.0"],
+    },
 )
\ No newline at end of file
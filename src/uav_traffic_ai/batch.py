@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import glob
+import queue
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from uav_traffic_ai.cache import CachedResult, ResultCache
+from uav_traffic_ai.ingest.dedup import FrameDeduper
+from uav_traffic_ai.ingest.frame_cache import DecodedFrames
+from uav_traffic_ai.ingest.media import PNG, ImageEncoding, read_image_bgr
+from uav_traffic_ai.ingest.sampling import AdaptiveSampler, SamplingConfig, adaptive_sample
+from uav_traffic_ai.ingest.traffic_dataset import DatasetManifest, list_scene_frames, load_scenes, sample_frames
+from uav_traffic_ai.profiling import count, default_profiler, evidence_timings_ms, timer
+from uav_traffic_ai.pipeline import (
+    build_evidence,
+    cacheable_png,
+    detector_cache_key,
+    encode_annotated,
+    frame_prefixes,
+    persist_artifacts,
+    store_artifacts,
+)
+from uav_traffic_ai.reporting.catalog import EvidenceCatalog
+from uav_traffic_ai.reporting.run_store import RunStore
+from uav_traffic_ai.schemas import Evidence, SceneMeta
+from uav_traffic_ai.tracking.tracker import IouTracker
+from uav_traffic_ai.vision.detector import Detector
+
+_END = object()  # centinela de fin de cola
+
+
+@dataclass
+class BatchStats:
+    frames: int = 0
+    wall_s: float = 0.0
+    # Tiempo ocupado (no de espera) acumulado por etapa: decode, cache, inference, metrics, encode, tracking, persist
+    stage_s: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.wall_s if self.wall_s > 0 else 0.0
+
+    def summary(self) -> str:
+        lines = [f"frames={self.frames} wall={self.wall_s:.2f}s fps={self.fps:.2f}"]
+        for name, secs in self.stage_s.items():
+            per_frame = 1000.0 * secs / self.frames if self.frames else 0.0
+            lines.append(f"  {name:<10} {secs:8.2f}s  {per_frame:8.1f} ms/frame")
+        return "\n".join(lines)
+
+
+def resolve_scene_frames(
+    *,
+    scene_id: str,
+    scenes_csv: Path,
+    dataset_dir: Path,
+    stride: int = 1,
+    max_frames: Optional[int] = None,
+    manifest: Optional[DatasetManifest] = None,
+) -> Tuple[SceneMeta, List[Path]]:
+    if manifest is not None:
+        scenes = {x.scene_id: x for x in manifest.scenes(scenes_csv, dataset_dir)}
+    else:
+        scenes = {x.scene_id: x for x in load_scenes(scenes_csv, dataset_dir)}
+    if scene_id not in scenes:
+        raise ValueError(f"Escena '{scene_id}' no encontrada en {scenes_csv}")
+    scene = scenes[scene_id]
+    frames = manifest.frames(scene.folder) if manifest is not None else list_scene_frames(scene.folder)
+    sampled = sample_frames(frames, stride=stride, max_frames=max_frames or len(frames))
+    meta = SceneMeta(scene_id=scene.scene_id, scene_name=scene.scene_name, lat=scene.lat, lon=scene.lon)
+    return meta, sampled
+
+
+def resolve_path_frames(pattern: str) -> List[Path]:
+    """Acepta un directorio (se recorre como una escena) o un patrón glob."""
+    p = Path(pattern)
+    if p.is_dir():
+        return list_scene_frames(p)
+    frames = sorted(Path(x).resolve() for x in glob.glob(pattern, recursive=True) if Path(x).is_file())
+    if not frames:
+        raise FileNotFoundError(f"No encuentro frames para {pattern}")
+    return frames
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> bool:
+    # put con timeout para no quedarnos bloqueados si otra etapa ha fallado
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: "queue.Queue[Any]", stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def run_batch_pipeline(
+    *,
+    frame_paths: Sequence[Path],
+    scene: SceneMeta,
+    detector: Detector,
+    model_weights: str,
+    artifacts_base: Path,
+    batch_size: int = 8,
+    queue_size: int = 32,
+    prefix_fn: Optional[Callable[[Path], str]] = None,
+    cache: Optional[ResultCache] = None,
+    tracker: Optional[IouTracker] = None,
+    annotate: Optional[ImageEncoding] = PNG,
+    store: Optional[RunStore] = None,
+    catalog: Optional[EvidenceCatalog] = None,
+    decoded: Optional[DecodedFrames] = None,
+    deduper: Optional[FrameDeduper] = None,
+) -> Tuple[List[Tuple[Evidence, Dict[str, Path]]], BatchStats]:
+    """
+    Procesa frames en tres etapas solapadas unidas por colas acotadas:
+    decode (hilo) -> inferencia por lotes (hilo llamante) -> métricas/hash/imagen/persist (hilo).
+    cv2.imread/imencode y la escritura a disco liberan el GIL, así que decodificar y codificar
+    ocurre mientras el modelo está ocupado. Las colas acotadas limitan la memoria a ~queue_size frames.
+    annotate=None (headless) no dibuja ni codifica la imagen anotada: solo JSON/CSV/sha256.
+    Con store, todo el lote va al RunStore (volcados agrupados) en vez de 3-4 ficheros por frame en artifacts_base.
+    Con decoded (FrameCache de estos frame_paths) la etapa decode solo lee del mmap.
+    Con deduper, los frames casi iguales al último inferido se marcan antes de la caché y no pasan por el modelo;
+    el hilo de persistencia (que los recibe en orden) les pone las detecciones del keyframe y Evidence.reused_from.
+    Con PROFILE_EVIDENCE=1 los tiempos de cada frame viajan con él por las colas hasta Evidence.timings.
+    """
+    if prefix_fn is None:
+        prefix_fn = frame_prefixes(scene.scene_id, frame_paths).__getitem__
+
+    profiler = default_profiler()
+    stats = BatchStats()
+    stats_lock = threading.Lock()
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    decoded_q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+    detected_q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+    written: List[Tuple[Evidence, Dict[str, Path]]] = []
+
+    def add_time(stage: str, t0: float) -> None:
+        with stats_lock:
+            stats.stage_s[stage] += time.perf_counter() - t0
+
+    def decode_worker() -> None:
+        try:
+            for i, p in enumerate(frame_paths):
+                t0 = time.perf_counter()
+                with profiler.collect() as spent:
+                    img = decoded[i] if decoded is not None else read_image_bgr(p)
+                add_time("decode", t0)
+                if not _put(decoded_q, (p, img, spent), stop):
+                    return
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(decoded_q, _END, stop)
+
+    def persist_worker() -> None:
+        try:
+            while True:
+                item = detected_q.get()
+                if item is _END:
+                    if store is not None:
+                        t0 = time.perf_counter()
+                        store.flush()  # el resto del run queda en disco aunque el llamante no cierre todavía
+                        add_time("persist", t0)
+                    return
+                p, img, key, det_res, hit, spent = item
+                reused_from = None
+                if det_res is None and hit is None:  # duplicado marcado por el deduper
+                    detections, reused_from = deduper.reuse()
+                else:
+                    detections = hit.detections if hit is not None else det_res.arrays
+
+                with profiler.collect() as own:
+                    t0 = time.perf_counter()
+                    evidence = build_evidence(
+                        detections=detections,
+                        img_bgr=img,
+                        scene=scene,
+                        model_weights=model_weights,
+                        reused_from=reused_from,
+                    )
+                    add_time("metrics", t0)
+                    if deduper is not None and reused_from is None:
+                        deduper.remember(detections, evidence.sha256)
+
+                    t0 = time.perf_counter()
+                    annotated = encode_annotated(
+                        img_bgr=img,
+                        detections=detections,
+                        annotated_bgr=det_res.annotated_bgr if det_res is not None else None,
+                        cached_png=hit.annotated_png if hit is not None else None,
+                        annotate=annotate,
+                    )
+                    if annotate is not None:
+                        add_time("encode", t0)
+                if profiler.evidence_timings:
+                    evidence.timings = evidence_timings_ms(*spent, own)
+                if hit is None and reused_from is None and cache is not None:
+                    cache.put(key, detections, cacheable_png(annotated, annotate))
+
+                if tracker is not None:
+                    # el hilo de persistencia recibe los frames en orden: es donde tiene sentido trackear
+                    t0 = time.perf_counter()
+                    tracker.update_from_detections(detections, frame_index=len(written))
+                    add_time("tracking", t0)
+
+                t0 = time.perf_counter()
+                if store is not None:
+                    paths = store_artifacts(
+                        store=store,
+                        evidence=evidence,
+                        annotated_image=annotated,
+                        prefix=prefix_fn(p),
+                        encoding=annotate or PNG,
+                        catalog=catalog,
+                    )
+                else:
+                    paths = persist_artifacts(
+                        artifacts_base=artifacts_base,
+                        evidence=evidence,
+                        annotated_image=annotated,
+                        prefix=prefix_fn(p),
+                        encoding=annotate or PNG,
+                        catalog=catalog,
+                    )
+                written.append((evidence, paths))
+                add_time("persist", t0)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+            # drenamos para que la inferencia no se quede bloqueada en put
+            while detected_q.get() is not _END:
+                pass
+
+    t_start = time.perf_counter()
+    decoder = threading.Thread(target=decode_worker, name="batch-decode", daemon=True)
+    writer = threading.Thread(target=persist_worker, name="batch-persist", daemon=True)
+    decoder.start()
+    writer.start()
+
+    try:
+        done = False
+        while not done and not stop.is_set():
+            batch: List[Tuple[Path, Any, Dict[str, float]]] = []
+            while len(batch) < max(1, batch_size):
+                item = _get(decoded_q, stop)
+                if item is _END:
+                    done = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+
+            keys: List[Optional[str]] = [None] * len(batch)
+            hits: List[Optional[CachedResult]] = [None] * len(batch)
+            with profiler.collect() as shared:
+                todo = list(range(len(batch)))
+                if deduper is not None:
+                    t0 = time.perf_counter()
+                    todo = [i for i, (_, img, _) in enumerate(batch) if not deduper.check(img)]
+                    add_time("dedup", t0)
+                if cache is not None:
+                    t0 = time.perf_counter()
+                    with timer("cache.lookup"):
+                        for i in todo:
+                            keys[i] = detector_cache_key(cache, batch[i][1], detector)
+                            hits[i] = cache.get(keys[i])
+                    add_time("cache", t0)
+
+                miss_idx = [i for i in todo if hits[i] is None]
+                count("cache.miss" if cache is not None else "cache.off", len(miss_idx))
+                count("cache.hit", len(todo) - len(miss_idx))
+                det_by_idx: Dict[int, Any] = {}
+                if miss_idx:
+                    t0 = time.perf_counter()
+                    det_results = detector.detect_batch(
+                        [batch[i][1] for i in miss_idx], annotate=annotate is not None
+                    )
+                    add_time("inference", t0)
+                    det_by_idx = dict(zip(miss_idx, det_results))
+            # la parte común del lote (caché, inferencia) se reparte a partes iguales entre sus frames
+            share = {k: v / len(batch) for k, v in shared.items()}
+
+            for i, (p, img, spent) in enumerate(batch):
+                item = (p, img, keys[i], det_by_idx.get(i), hits[i], (spent, share))
+                if not _put(detected_q, item, stop):
+                    break
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        detected_q.put(_END)
+        writer.join()
+        stop.set()
+        decoder.join()
+
+    if errors:
+        raise errors[0]
+
+    stats.frames = len(written)
+    stats.wall_s = time.perf_counter() - t_start
+    return written, stats
+
+
+def run_adaptive_batch(
+    *,
+    frame_paths: Sequence[Path],
+    scene: SceneMeta,
+    detector: Detector,
+    model_weights: str,
+    artifacts_base: Path,
+    sampling: SamplingConfig,
+    batch_size: int = 8,
+    queue_size: int = 32,
+    prefix_fn: Optional[Callable[[Path], str]] = None,
+    cache: Optional[ResultCache] = None,
+    annotate: Optional[ImageEncoding] = PNG,
+    store: Optional[RunStore] = None,
+    catalog: Optional[EvidenceCatalog] = None,
+) -> Tuple[List[Tuple[int, Evidence, Dict[str, Path]]], BatchStats, AdaptiveSampler]:
+    """
+    Como run_batch_pipeline pero sin stride: frame_paths es la escena completa y AdaptiveSampler decide qué frames
+    se analizan (hasta sampling.budget), una ronda de run_batch_pipeline cada vez con las Metrics de la anterior.
+    Devuelve (índice en frame_paths, evidencia, rutas) en orden de escena, las estadísticas sumadas de todas las
+    rondas y el sampler (sampler.estimate() da las medias de la escena completa).
+    """
+    stats = BatchStats()
+    written: Dict[int, Tuple[Evidence, Dict[str, Path]]] = {}
+    if prefix_fn is None:
+        # prefijos de la escena completa: cada ronda solo ve unos pocos frames y su carpeta común sería otra
+        prefix_fn = frame_prefixes(scene.scene_id, frame_paths).__getitem__
+
+    def evaluate(indices: List[int]) -> List[Any]:
+        out, round_stats = run_batch_pipeline(
+            frame_paths=[frame_paths[i] for i in indices],
+            scene=scene,
+            detector=detector,
+            model_weights=model_weights,
+            artifacts_base=artifacts_base,
+            batch_size=batch_size,
+            queue_size=queue_size,
+            prefix_fn=prefix_fn,
+            cache=cache,
+            annotate=annotate,
+            store=store,
+            catalog=catalog,
+        )
+        stats.frames += round_stats.frames
+        stats.wall_s += round_stats.wall_s
+        for stage, secs in round_stats.stage_s.items():
+            stats.stage_s[stage] += secs
+        written.update(zip(indices, out))
+        return [evidence.metrics for evidence, _ in out]
+
+    sampler = adaptive_sample(len(frame_paths), evaluate, sampling)
+    return [(i, *written[i]) for i in sorted(written)], stats, sampler
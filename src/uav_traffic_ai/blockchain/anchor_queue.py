@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from uav_traffic_ai.blockchain.bsv_anchor import AnchorResult, anchor_sha256_opreturn
+from uav_traffic_ai.blockchain.verify import VerifyResult, verify_sha256_in_tx_opreturn
+from uav_traffic_ai.pipeline import evidence_json_bytes
+from uav_traffic_ai.reporting.catalog import EvidenceCatalog, catalog_from_settings
+from uav_traffic_ai.reporting.exporter import save_json_bytes
+from uav_traffic_ai.schemas import Evidence
+from uav_traffic_ai.settings import AppSettings
+
+AnchorFn = Callable[..., AnchorResult]
+VerifyFn = Callable[..., VerifyResult]
+
+PENDING = "pending"  # falta emitir la tx
+BROADCAST = "broadcast"  # tx emitida, falta verla en WhatsOnChain
+VERIFIED = "verified"
+FAILED = "failed"
+
+
+@dataclass
+class AnchorJob:
+    job_id: str
+    json_path: str
+    sha256: str
+    scene_id: str
+    model: str
+    created_at_utc: str  # ISO
+    status: str = PENDING
+    txid: Optional[str] = None
+    attempts: int = 0
+    next_attempt_at: float = 0.0  # epoch
+    last_error: Optional[str] = None
+
+
+class AnchorQueue:
+    """
+    Cola de anclaje persistente: cada trabajo es un JSON en queue_dir (escritura atómica), así que
+    sobrevive a reinicios. Un hilo despachador reparte los trabajos vencidos a un pool de
+    `concurrency` hilos que emiten la tx y verifican con backoff exponencial.
+    Al terminar se actualiza el JSON de la evidencia con txid/verified (y el catálogo, si se pasa).
+
+    Varios procesos pueden compartir queue_dir (la app, serve, anchor-worker): el despachador vuelve a leer
+    queue_dir cada rescan_s (ve los trabajos que encolan los demás) y, antes de emitir, cada trabajo se reclama
+    creando <job_id>.lock con O_EXCL y se relee del disco, así que solo un proceso lo trabaja y parte del último
+    estado guardado. Un .lock de más de claim_ttl_s (proceso muerto) se puede romper.
+    El txid se persiste antes de empezar a verificar y volver a encolar un trabajo FAILED conserva su txid
+    (solo se re-verifica). Queda una ventana: si el proceso muere entre emitir y guardar el txid, el
+    reintento emite otra tx.
+    anchor_fn / verify_fn se pueden sustituir (p.ej. por el mock de scripts/mock_woc_server.py).
+    """
+
+    def __init__(
+        self,
+        queue_dir: Path,
+        *,
+        chain_name: str,
+        wif: str,
+        dust_sats: int,
+        woc_base: str,
+        concurrency: int = 2,
+        max_attempts: int = 8,
+        base_backoff_s: float = 1.0,
+        max_backoff_s: float = 300.0,
+        rescan_s: float = 1.0,
+        claim_ttl_s: float = 600.0,
+        anchor_fn: AnchorFn = anchor_sha256_opreturn,
+        verify_fn: VerifyFn = verify_sha256_in_tx_opreturn,
+        on_done: Optional[Callable[[AnchorJob], None]] = None,
+        catalog: Optional[EvidenceCatalog] = None,
+    ) -> None:
+        self.queue_dir = queue_dir
+        self.chain_name = chain_name
+        self.wif = wif
+        self.dust_sats = dust_sats
+        self.woc_base = woc_base
+        self.concurrency = max(1, int(concurrency))
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.rescan_s = rescan_s
+        self.claim_ttl_s = claim_ttl_s
+        self.anchor_fn = anchor_fn
+        self.verify_fn = verify_fn
+        self.on_done = on_done
+        self.catalog = catalog
+
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._jobs: Dict[str, AnchorJob] = {}
+        self._in_flight: set = set()
+        self._mtimes: Dict[str, int] = {}  # job_id -> st_mtime_ns de su fichero la última vez que se leyó
+        self._last_scan = 0.0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._load()
+
+    # --- persistencia ---
+
+    def _job_path(self, job_id: str) -> Path:
+        return self.queue_dir / f"{job_id}.json"
+
+    def _save(self, job: AnchorJob) -> None:
+        p = self._job_path(job.job_id)
+        tmp = p.with_suffix(f".json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(asdict(job), sort_keys=True), encoding="utf-8")
+        os.replace(tmp, p)
+        self._mtimes[job.job_id] = p.stat().st_mtime_ns
+
+    @staticmethod
+    def _read(p: Path) -> Optional[AnchorJob]:
+        try:
+            return AnchorJob(**json.loads(p.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _load(self) -> None:
+        """Lee los trabajos de queue_dir; en cada rescan solo los ficheros que cambiaron desde la última lectura."""
+        self._last_scan = time.monotonic()
+        for p in self.queue_dir.glob("*.json"):
+            try:
+                mtime = p.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if self._mtimes.get(p.stem) == mtime:
+                continue
+            job = self._read(p)
+            if job is None:
+                continue
+            with self._lock:
+                self._mtimes[job.job_id] = mtime
+                if job.job_id not in self._in_flight:  # los nuestros en curso ya están al día en memoria
+                    self._jobs[job.job_id] = job
+
+    def _claim_path(self, job_id: str) -> Path:
+        return self.queue_dir / f"{job_id}.lock"
+
+    def _claim(self, job_id: str) -> bool:
+        """Reclama el trabajo para este proceso. False si otro proceso lo tiene (con un .lock reciente)."""
+        p = self._claim_path(job_id)
+        for _ in range(2):
+            try:
+                fd = os.open(p, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._break_stale_claim(p):
+                    return False
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(f"{os.getpid()} {time.time():.0f}")
+            return True
+        return False
+
+    def _break_stale_claim(self, p: Path) -> bool:
+        try:
+            if time.time() - p.stat().st_mtime < self.claim_ttl_s:
+                return False
+            # renombrar es atómico: de varios procesos que lo ven caducado, solo uno se lo lleva
+            stale = p.with_suffix(f".lock.{os.getpid()}.stale")
+            os.replace(p, stale)
+        except FileNotFoundError:
+            return True  # lo acaba de soltar su dueño
+        if time.time() - stale.stat().st_mtime < self.claim_ttl_s:
+            os.replace(stale, p)  # entre el stat y el rename otro proceso lo reclamó de nuevo: se lo devolvemos
+            return False
+        stale.unlink(missing_ok=True)
+        return True
+
+    def _release(self, job_id: str) -> None:
+        self._claim_path(job_id).unlink(missing_ok=True)
+
+    # --- API ---
+
+    def submit(self, evidence: Evidence, json_path: Path) -> str:
+        """No bloquea: registra el trabajo en disco y despierta al despachador."""
+        job_id = f"{evidence.sha256[:16]}_{Path(json_path).stem}"
+        job = AnchorJob(
+            job_id=job_id,
+            json_path=str(Path(json_path).resolve()),
+            sha256=evidence.sha256,
+            scene_id=evidence.scene.scene_id or "unknown_scene",
+            model=evidence.model_weights,
+            created_at_utc=evidence.created_at_utc.isoformat(),
+        )
+        on_disk = self._read(self._job_path(job_id))  # puede haberlo encolado otro proceso
+        with self._lock:
+            existing = on_disk or self._jobs.get(job_id)
+            if existing is not None and existing.status != FAILED:
+                self._jobs.setdefault(job_id, existing)
+                return job_id  # ya encolado (idempotente)
+            if existing is not None and existing.txid:
+                # la tx ya se emitió: solo falta verla en WhatsOnChain, no se emite otra
+                job.txid, job.status = existing.txid, BROADCAST
+            self._jobs[job_id] = job
+            self._save(job)
+        self._wake.set()
+        return job_id
+
+    def job(self, job_id: str) -> Optional[AnchorJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def counts(self) -> Dict[str, int]:
+        out = {PENDING: 0, BROADCAST: 0, VERIFIED: 0, FAILED: 0}
+        with self._lock:
+            for j in self._jobs.values():
+                out[j.status] = out.get(j.status, 0) + 1
+        return out
+
+    def pending(self) -> List[AnchorJob]:
+        with self._lock:
+            return [j for j in self._jobs.values() if j.status in (PENDING, BROADCAST)]
+
+    def start(self) -> "AnchorQueue":
+        if self._dispatcher is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="anchor")
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="anchor-dispatch", daemon=True)
+            self._dispatcher.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        self._dispatcher = None
+        self._pool = None
+        self._stop.clear()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que no queden trabajos pendientes. True si se vació a tiempo."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    # --- workers ---
+
+    def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            if time.monotonic() - self._last_scan >= self.rescan_s:
+                self._load()  # trabajos nuevos o actualizados por otros procesos
+            now = time.time()
+            next_due = None
+            with self._lock:
+                for j in list(self._jobs.values()):
+                    if j.status not in (PENDING, BROADCAST) or j.job_id in self._in_flight:
+                        continue
+                    if len(self._in_flight) >= self.concurrency:
+                        break
+                    if j.next_attempt_at <= now:
+                        if not self._claim(j.job_id):
+                            continue  # lo está trabajando otro proceso: su resultado llega en un rescan
+                        self._in_flight.add(j.job_id)
+                        assert self._pool is not None
+                        self._pool.submit(self._run_job, j.job_id)
+                    else:
+                        next_due = j.next_attempt_at if next_due is None else min(next_due, j.next_attempt_at)
+            wait = self.rescan_s if next_due is None else max(0.01, min(self.rescan_s, next_due - now))
+            self._wake.wait(timeout=wait)
+            self._wake.clear()
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.max_backoff_s, self.base_backoff_s * (2 ** max(0, attempts - 1)))
+
+    def _run_job(self, job_id: str) -> None:
+        try:
+            # con el trabajo reclamado, lo que vale es el disco: otro proceso puede haberlo emitido o terminado
+            job = self._read(self._job_path(job_id))
+            with self._lock:
+                if job is None:
+                    job = AnchorJob(**asdict(self._jobs[job_id]))  # copia: trabajamos fuera del lock
+                else:
+                    self._jobs[job_id] = AnchorJob(**asdict(job))
+            if job.status not in (PENDING, BROADCAST) or job.next_attempt_at > time.time():
+                return
+
+            job.attempts += 1
+            try:
+                if job.txid is None:
+                    r = self.anchor_fn(
+                        chain_name=self.chain_name,
+                        wif=self.wif,
+                        dust_sats=self.dust_sats,
+                        scene_id=job.scene_id,
+                        sha256_hex=job.sha256,
+                        model=job.model,
+                        created_at_utc=datetime.fromisoformat(job.created_at_utc),
+                    )
+                    job.txid = r.txid
+                    job.status = BROADCAST
+                    self._commit(job)  # persistimos el txid antes de verificar
+
+                v = self.verify_fn(
+                    woc_base=self.woc_base,
+                    chain_name=self.chain_name,
+                    txid=job.txid,
+                    expected_sha256_hex=job.sha256,
+                )
+                if v.ok:
+                    job.status = VERIFIED
+                    job.last_error = None
+                else:
+                    job.last_error = "OP_RETURN aún no visible en WhatsOnChain"
+            except Exception as e:  # red, fondos, WoC caído...: se reintenta con backoff
+                job.last_error = f"{type(e).__name__}: {e}"
+
+            if job.status != VERIFIED:
+                if job.attempts >= self.max_attempts:
+                    job.status = FAILED
+                else:
+                    job.next_attempt_at = time.time() + self._backoff(job.attempts)
+
+            self._commit(job)
+            if job.status in (VERIFIED, FAILED):
+                self._finish(job)
+        finally:
+            self._release(job_id)
+            with self._lock:
+                self._in_flight.discard(job_id)
+            self._wake.set()
+
+    def _commit(self, job: AnchorJob) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._save(job)
+
+    def _finish(self, job: AnchorJob) -> None:
+        json_path = Path(job.json_path)
+        if json_path.exists():
+            evidence = Evidence.model_validate_json(json_path.read_text(encoding="utf-8"))
+            evidence.txid = job.txid
+            evidence.bsv_chain = self.chain_name
+            evidence.verified = job.status == VERIFIED
+            save_json_bytes(json_path, evidence_json_bytes(evidence))
+        if self.catalog is not None:
+            self.catalog.set_anchor_values([(job.txid, int(job.status == VERIFIED), self.chain_name, job.sha256)])
+        if self.on_done is not None:
+            self.on_done(job)
+
+
+def anchor_queue_from_settings(s: AppSettings, **kwargs) -> AnchorQueue:
+    kwargs.setdefault("catalog", catalog_from_settings(s))
+    return AnchorQueue(
+        s.anchor_queue_dir,
+        chain_name=s.bsv_chain,
+        wif=s.bsv_wif_testnet,
+        dust_sats=s.bsv_dust_sats,
+        woc_base=s.woc_base,
+        concurrency=s.anchor_concurrency,
+        **kwargs,
+    )
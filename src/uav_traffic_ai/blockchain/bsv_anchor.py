@@ -8,6 +8,8 @@ from bsvlib import Wallet
 from bsvlib.constants import Chain
 from bsvlib.keys import Key
 
+from uav_traffic_ai.profiling import timer
+
 
 @dataclass(frozen=True)
 class AnchorResult:
@@ -28,6 +30,7 @@ def anchor_sha256_opreturn(
     sha256_hex: str,
     model: str,
     created_at_utc: datetime,
+    prefix: str = "UAVTAIVD_V1",
 ) -> AnchorResult:
     """
     Crea y emite una tx con OP_RETURN usando bsvlib (pushdatas).
@@ -51,18 +54,18 @@ def anchor_sha256_opreturn(
 
     # Todo debe ser corto (pushdata < 75 bytes ideal).
     # Guardamos campos auditables:
-    # - prefix + version
+    # - prefix + version (UAVTAIVD_V1 = sha256 de una evidencia, UAVTAIMR_V1 = raíz Merkle de un lote)
     # - scene_id
     # - sha256
     # - timestamp
     # - model
-    prefix = "UAVTAIVD_V1"
     ts = created_at_utc.replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
     pushdatas: List[object] = [prefix, scene_id, sha256_hex, ts, model]
 
-    wallet = Wallet([wif], chain=chain)
-    tx = wallet.create_transaction(outputs=outputs, pushdatas=pushdatas)
-    resp = tx.broadcast()
+    with timer("blockchain.anchor"):  # UTXOs + firma + broadcast
+        wallet = Wallet([wif], chain=chain)
+        tx = wallet.create_transaction(outputs=outputs, pushdatas=pushdatas)
+        resp = tx.broadcast()
 
     # Resp puede ser un objeto; intentamos extraer txid de forma robusta.
     txid = getattr(resp, "data", None) or getattr(resp, "txid", None) or getattr(resp, "tx_id", None) or str(resp)
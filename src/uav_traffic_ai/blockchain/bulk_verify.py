@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from uav_traffic_ai.blockchain.verify import VerifyResult, check_opreturn_hexes, opreturn_url, tx_info_url
+from uav_traffic_ai.profiling import timer
+from uav_traffic_ai.settings import AppSettings
+
+
+class OpReturnCache:
+    """
+    txid -> scripts OP_RETURN de txs ya verificadas y confirmadas (en un bloque). Un OP_RETURN en cadena no
+    cambia, así que una tx confirmada no se vuelve a pedir a WhatsOnChain; una que sigue en mempool sí (podría no
+    minarse nunca). JSONL append-only: escribir es O(1) y un corte a mitad de línea solo pierde esa entrada.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Dict[str, List[str]] = {}
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    row = json.loads(line)
+                    self._data[str(row["txid"])] = [str(h) for h in row["hexes"]]
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, txid: str) -> Optional[List[str]]:
+        with self._lock:
+            return self._data.get(txid)
+
+    def put(self, txid: str, hexes: List[str]) -> None:
+        with self._lock:
+            if txid in self._data:
+                return
+            self._data[txid] = list(hexes)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps({"txid": txid, "hexes": hexes}) + "\n")
+
+
+class _RateLimiter:
+    """Espaciado mínimo entre peticiones (compartido por todos los hilos) + pausa global tras un 429."""
+
+    def __init__(self, max_rps: Optional[float]) -> None:
+        self.interval = 1.0 / max_rps if max_rps else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+@dataclass
+class BulkVerifyStats:
+    requested: int = 0
+    unique_txids: int = 0
+    cache_hits: int = 0
+    fetched: int = 0
+    not_found: int = 0
+    unconfirmed: int = 0  # verificadas pero aún en mempool: no entran en la caché
+    rate_limited: int = 0
+    errors: int = 0
+    wall_s: float = 0.0
+
+
+class BulkVerifier:
+    """
+    Verificación masiva contra WhatsOnChain: una Session con pool de `concurrency` conexiones keep-alive,
+    `concurrency` hilos, límite de peticiones/s y reintentos con backoff ante 429/5xx (respeta Retry-After).
+    Cada txid se consulta una sola vez por llamada (las evidencias de un lote Merkle comparten tx) y las
+    txs verificadas se guardan en OpReturnCache si ya están en un bloque (una consulta más por tx, solo hasta que
+    entra en la caché).
+    """
+
+    def __init__(
+        self,
+        *,
+        woc_base: str,
+        chain_name: str,
+        concurrency: int = 8,
+        max_rps: Optional[float] = None,
+        cache: Optional[OpReturnCache] = None,
+        timeout: float = 20.0,
+        max_retries: int = 4,
+    ) -> None:
+        self.woc_base = woc_base
+        self.chain_name = chain_name
+        self.concurrency = max(1, int(concurrency))
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.stats = BulkVerifyStats()
+        self.errors: Dict[str, str] = {}
+
+        self._limiter = _RateLimiter(max_rps)
+        self._stats_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _count(self, field: str) -> None:
+        with self._stats_lock:
+            setattr(self.stats, field, getattr(self.stats, field) + 1)
+
+    def fetch(self, txid: str) -> Optional[List[str]]:
+        """Scripts OP_RETURN de la tx; None si WhatsOnChain no la conoce (o tras agotar reintentos)."""
+        if self.cache is not None:
+            cached = self.cache.get(txid)
+            if cached is not None:
+                self._count("cache_hits")
+                return cached
+
+        url = opreturn_url(self.woc_base, self.chain_name, txid)
+        for attempt in range(self.max_retries + 1):
+            self._limiter.wait()
+            try:
+                with timer("blockchain.verify"):
+                    r = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                err = f"{type(e).__name__}: {e}"
+            else:
+                if r.status_code == 404:
+                    self._count("not_found")
+                    return None
+                if r.status_code == 429 or r.status_code >= 500:
+                    if r.status_code == 429:
+                        self._count("rate_limited")
+                        retry_after = r.headers.get("Retry-After", "")
+                        self._limiter.pause(float(retry_after) if retry_after.isdigit() else 2.0**attempt)
+                    err = f"HTTP {r.status_code}"
+                else:
+                    try:
+                        r.raise_for_status()
+                        data = r.json()  # [{ "n": int, "hex": "..." }, ...]
+                    except (requests.RequestException, ValueError) as e:
+                        err = f"{type(e).__name__}: {e}"
+                    else:
+                        self._count("fetched")
+                        return [str(x.get("hex", "")) for x in data if "hex" in x]
+            if attempt < self.max_retries:
+                time.sleep(min(8.0, 0.25 * 2**attempt))
+
+        self._count("errors")
+        self.errors[txid] = err
+        return None
+
+    def confirmed(self, txid: str) -> bool:
+        """True si WhatsOnChain da la tx en un bloque; ante cualquier error, False (no se cachea y se repite)."""
+        self._limiter.wait()
+        try:
+            with timer("blockchain.verify"):
+                r = self.session.get(tx_info_url(self.woc_base, self.chain_name, txid), timeout=self.timeout)
+            r.raise_for_status()
+            info = r.json()
+        except (requests.RequestException, ValueError):
+            return False
+        ok = isinstance(info, dict) and int(info.get("confirmations") or 0) > 0 and bool(info.get("blockhash"))
+        if not ok:
+            self._count("unconfirmed")
+        return ok
+
+    def fetch_many(self, txids: Sequence[str]) -> Dict[str, Optional[List[str]]]:
+        unique = list(dict.fromkeys(txids))
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="woc") as pool:
+            return dict(zip(unique, pool.map(self.fetch, unique)))
+
+    def verify_many(self, items: Sequence[Tuple[str, ...]]) -> List[VerifyResult]:
+        """
+        items: (txid, sha256 esperado) o (txid, sha256 esperado, prefijo del OP_RETURN, p.ej. UAVTAIMR_V1).
+        Devuelve un VerifyResult por item, en el mismo orden.
+        """
+        t0 = time.perf_counter()
+        fetched = self.fetch_many([item[0] for item in items])
+        self.stats.requested += len(items)
+        self.stats.unique_txids += len(fetched)
+
+        out: List[VerifyResult] = []
+        to_cache: Dict[str, List[str]] = {}
+        for txid, expected, *prefix in items:
+            hexes = fetched[txid]
+            if hexes is None:
+                out.append(VerifyResult(ok=False, found_payloads=[], opreturn_hexes=[]))
+                continue
+            res = check_opreturn_hexes(hexes, expected, prefix[0] if prefix else None)
+            if res.ok and self.cache is not None and self.cache.get(txid) is None:
+                to_cache[txid] = hexes
+            out.append(res)
+        if to_cache:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="woc") as pool:
+                for txid, ok in zip(to_cache, pool.map(self.confirmed, list(to_cache))):
+                    if ok:
+                        self.cache.put(txid, to_cache[txid])
+        self.stats.wall_s += time.perf_counter() - t0
+        return out
+
+
+def bulk_verifier_from_settings(
+    s: AppSettings,
+    *,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    max_rps: Optional[float] = None,
+) -> BulkVerifier:
+    rps = s.woc_max_rps if max_rps is None else max_rps
+    return BulkVerifier(
+        woc_base=s.woc_base,
+        chain_name=s.bsv_chain,
+        concurrency=concurrency or s.woc_concurrency,
+        max_rps=rps if rps > 0 else None,
+        cache=OpReturnCache(s.opreturn_cache_path) if use_cache else None,
+    )
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from uav_traffic_ai.blockchain.verify import verify_sha256_in_tx_opreturn
+
+BATCH_PREFIX = "UAVTAIMR_V1"  # OP_RETURN de un lote: se ancla la raíz Merkle, no un sha256 de evidencia
+
+
+def _leaf(sha256_hex: str) -> bytes:
+    # Prefijos 0x00 (hoja) / 0x01 (nodo) como en RFC 6962: una hoja no puede hacerse pasar por un nodo interno.
+    return hashlib.sha256(b"\x00" + bytes.fromhex(sha256_hex)).digest()
+
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+@dataclass(frozen=True)
+class MerkleStep:
+    hash: str  # hex del hermano
+    side: str  # "L" si el hermano va a la izquierda, "R" si a la derecha
+
+
+@dataclass(frozen=True)
+class MerkleProof:
+    leaf_sha256: str  # Evidence.sha256
+    index: int
+    leaf_count: int
+    root: str
+    path: Tuple[MerkleStep, ...]
+    txid: Optional[str] = None
+    bsv_chain: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        d = asdict(self)
+        d["path"] = [asdict(s) for s in self.path]
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, object]) -> "MerkleProof":
+        return cls(
+            leaf_sha256=str(d["leaf_sha256"]),
+            index=int(d["index"]),  # type: ignore[arg-type]
+            leaf_count=int(d["leaf_count"]),  # type: ignore[arg-type]
+            root=str(d["root"]),
+            path=tuple(MerkleStep(hash=str(s["hash"]), side=str(s["side"])) for s in d["path"]),  # type: ignore[union-attr]
+            txid=d.get("txid"),  # type: ignore[arg-type]
+            bsv_chain=d.get("bsv_chain"),  # type: ignore[arg-type]
+        )
+
+
+def build_merkle(leaves_sha256: Sequence[str]) -> Tuple[str, List[MerkleProof]]:
+    """
+    Árbol Merkle sobre los sha256 de las evidencias de un run. Un nodo sin pareja sube tal cual
+    al nivel siguiente (no se duplica, para evitar el problema de hojas duplicadas de Bitcoin).
+    Devuelve (raíz hex, una prueba de inclusión por hoja en el mismo orden).
+    """
+    if not leaves_sha256:
+        raise ValueError("No hay evidencias para construir el árbol Merkle")
+
+    level = [_leaf(h) for h in leaves_sha256]
+    paths: List[List[MerkleStep]] = [[] for _ in leaves_sha256]
+    positions = list(range(len(leaves_sha256)))  # posición de cada hoja en el nivel actual
+
+    while len(level) > 1:
+        nxt: List[bytes] = []
+        for i in range(0, len(level), 2):
+            if i + 1 < len(level):
+                nxt.append(_node(level[i], level[i + 1]))
+            else:
+                nxt.append(level[i])
+        for leaf_idx, pos in enumerate(positions):
+            sibling = pos ^ 1
+            if sibling < len(level):
+                side = "L" if sibling < pos else "R"
+                paths[leaf_idx].append(MerkleStep(hash=level[sibling].hex(), side=side))
+            positions[leaf_idx] = pos // 2
+        level = nxt
+
+    root = level[0].hex()
+    proofs = [
+        MerkleProof(leaf_sha256=h, index=i, leaf_count=len(leaves_sha256), root=root, path=tuple(paths[i]))
+        for i, h in enumerate(leaves_sha256)
+    ]
+    return root, proofs
+
+
+def root_from_proof(proof: MerkleProof) -> str:
+    acc = _leaf(proof.leaf_sha256)
+    for step in proof.path:
+        sib = bytes.fromhex(step.hash)
+        acc = _node(sib, acc) if step.side == "L" else _node(acc, sib)
+    return acc.hex()
+
+
+def verify_proof_offline(leaf_sha256: str, proof: MerkleProof) -> bool:
+    """Sin red: la hoja es la de la evidencia y la prueba reconstruye la raíz anotada."""
+    return proof.leaf_sha256 == leaf_sha256 and root_from_proof(proof) == proof.root
+
+
+def proof_path_for(json_path: Path) -> Path:
+    return json_path.with_name(f"{json_path.stem}.merkle.json")
+
+
+def save_proof(json_path: Path, proof: MerkleProof) -> Path:
+    p = proof_path_for(json_path)
+    p.write_text(json.dumps(proof.to_dict(), ensure_ascii=False, sort_keys=True, indent=2), encoding="utf-8")
+    return p
+
+
+def load_proof(json_path: Path) -> MerkleProof:
+    return MerkleProof.from_dict(json.loads(proof_path_for(json_path).read_text(encoding="utf-8")))
+
+
+class BatchRootVerifier:
+    """
+    Verifica evidencias sueltas contra la raíz anclada de su lote. La consulta a WhatsOnChain se hace
+    una vez por (txid, raíz) y se reutiliza para todas las evidencias del mismo lote.
+    """
+
+    def __init__(self, *, woc_base: str, chain_name: str) -> None:
+        self.woc_base = woc_base
+        self.chain_name = chain_name
+        self._onchain: Dict[Tuple[str, str], bool] = {}
+        self.lookups = 0
+
+    def root_anchored(self, txid: str, root: str) -> bool:
+        key = (txid, root)
+        if key not in self._onchain:
+            self.lookups += 1
+            self._onchain[key] = verify_sha256_in_tx_opreturn(
+                woc_base=self.woc_base,
+                chain_name=self.chain_name,
+                txid=txid,
+                expected_sha256_hex=root,
+                expected_prefix=BATCH_PREFIX,
+            ).ok
+        return self._onchain[key]
+
+    def verify(self, leaf_sha256: str, proof: MerkleProof) -> bool:
+        if not verify_proof_offline(leaf_sha256, proof):
+            return False
+        if not proof.txid:
+            return False
+        return self.root_anchored(proof.txid, proof.root)
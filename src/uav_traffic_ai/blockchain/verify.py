@@ -5,6 +5,8 @@ from typing import List, Optional
 
 import requests
 
+from uav_traffic_ai.profiling import timer
+
 
 @dataclass(frozen=True)
 class VerifyResult:
@@ -52,29 +54,56 @@ def _parse_pushdatas_from_opreturn_script_hex(script_hex: str) -> List[bytes]:
     return out
 
 
+def opreturn_url(woc_base: str, chain_name: str, txid: str) -> str:
+    network = "test" if chain_name == "test" else "main"
+    return f"{woc_base}/v1/bsv/{network}/tx/{txid}/opreturn"
+
+
+def tx_info_url(woc_base: str, chain_name: str, txid: str) -> str:
+    network = "test" if chain_name == "test" else "main"
+    return f"{woc_base}/v1/bsv/{network}/tx/hash/{txid}"
+
+
+def check_opreturn_hexes(
+    op_hexes: List[str], expected_sha256_hex: str, expected_prefix: Optional[str] = None
+) -> VerifyResult:
+    """
+    Con expected_prefix solo cuentan los OP_RETURN cuyo primer pushdata es ese prefijo (UAVTAIMR_V1 = raíz Merkle):
+    una raíz de lote no se da por anclada porque el mismo hex aparezca en otro tipo de OP_RETURN.
+    """
+    payloads: List[bytes] = []
+    ok = False
+    for h in op_hexes:
+        pushes = _parse_pushdatas_from_opreturn_script_hex(h)
+        payloads.extend(pushes)
+        if expected_prefix is not None and (not pushes or pushes[0] != expected_prefix.encode("utf-8")):
+            continue
+        # Buscamos el hash como ASCII dentro de pushdatas
+        ok = ok or any(expected_sha256_hex.encode("utf-8") in p for p in pushes)
+    return VerifyResult(ok=ok, found_payloads=payloads, opreturn_hexes=op_hexes)
+
+
 def verify_sha256_in_tx_opreturn(
     *,
     woc_base: str,
     chain_name: str,
     txid: str,
     expected_sha256_hex: str,
+    expected_prefix: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    timeout: float = 20.0,
 ) -> VerifyResult:
     """
     WhatsOnChain endpoint:
     GET https://api.whatsonchain.com/v1/bsv/<network>/tx/<txid>/opreturn :contentReference[oaicite:3]{index=3}
     """
-    network = "test" if chain_name == "test" else "main"
-    url = f"{woc_base}/v1/bsv/{network}/tx/{txid}/opreturn"
+    url = opreturn_url(woc_base, chain_name, txid)
 
-    r = requests.get(url, timeout=20)
+    # con session se reutiliza la conexión keep-alive (ver blockchain/bulk_verify.py)
+    with timer("blockchain.verify"):
+        r = (session or requests).get(url, timeout=timeout)
     r.raise_for_status()
     data = r.json()  # [{ "n": int, "hex": "..." }, ...]
 
     op_hexes: List[str] = [str(x.get("hex", "")) for x in data if "hex" in x]
-    payloads: List[bytes] = []
-    for h in op_hexes:
-        payloads.extend(_parse_pushdatas_from_opreturn_script_hex(h))
-
-    # Buscamos el hash como ASCII dentro de pushdatas
-    ok = any(expected_sha256_hex.encode("utf-8") in p for p in payloads)
-    return VerifyResult(ok=ok, found_payloads=payloads, opreturn_hexes=op_hexes)
+    return check_opreturn_hexes(op_hexes, expected_sha256_hex, expected_prefix)
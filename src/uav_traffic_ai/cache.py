@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from uav_traffic_ai import __version__
+from uav_traffic_ai.settings import AppSettings
+from uav_traffic_ai.vision.detections import DetectionArrays
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    detections: DetectionArrays
+    annotated_png: Optional[bytes]  # None si la entrada se guardó en modo headless (solo detecciones)
+
+
+def image_digest(img_bgr: np.ndarray) -> str:
+    # Hash del array decodificado (no del fichero): sirve igual para uploads, dataset o frames de vídeo.
+    h = hashlib.sha256()
+    h.update(f"{img_bgr.shape}|{img_bgr.dtype}".encode("utf-8"))
+    h.update(memoryview(np.ascontiguousarray(img_bgr)).cast("B"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Caché en disco de (detecciones, imagen anotada) direccionada por contenido:
+    clave = sha256(hash de imagen, weights, conf, iou, versión del paquete).
+    Cada entrada es <key>.json + <key>.png (el PNG solo si se generó la imagen anotada); el mtime hace de marca LRU
+    y se expulsan las entradas más antiguas cuando el total supera max_bytes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None  # key -> (bytes, mtime)
+        self._total = 0
+
+    def key_for(self, img_bgr: np.ndarray, *, weights: str, conf: float, iou: float, extra: str = "") -> str:
+        parts = [image_digest(img_bgr), weights, repr(float(conf)), repr(float(iou)), __version__]
+        if extra:  # p.ej. configuración de teselas; vacío = mismas claves que antes
+            parts.append(extra)
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        d = self.root / key[:2]
+        return d / f"{key}.json", d / f"{key}.png"
+
+    def _load_index(self) -> Dict[str, Tuple[int, float]]:
+        if self._index is None:
+            index: Dict[str, Tuple[int, float]] = {}
+            if self.root.exists():
+                for json_path in self.root.glob("*/*.json"):
+                    png_path = json_path.with_suffix(".png")
+                    try:
+                        st_json = json_path.stat()
+                    except FileNotFoundError:
+                        continue
+                    png_size = png_path.stat().st_size if png_path.exists() else 0
+                    index[json_path.stem] = (st_json.st_size + png_size, st_json.st_mtime)
+            self._index = index
+            self._total = sum(size for size, _ in index.values())
+        return self._index
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        json_path, png_path = self._paths(key)
+        with self._lock:
+            index = self._load_index()
+            if key not in index:
+                self.stats.misses += 1
+                return None
+            try:
+                dets = DetectionArrays.from_records(json.loads(json_path.read_text(encoding="utf-8")))
+                png = png_path.read_bytes() if png_path.exists() else None
+            except (FileNotFoundError, ValueError):
+                # entrada corrupta o borrada por fuera: la tratamos como miss
+                self._drop(key)
+                self.stats.misses += 1
+                return None
+            os.utime(json_path)  # marca LRU
+            index[key] = (index[key][0], json_path.stat().st_mtime)
+            self.stats.hits += 1
+            return CachedResult(detections=dets, annotated_png=png)
+
+    def put(self, key: str, detections: DetectionArrays, annotated_png: Optional[bytes] = None) -> None:
+        if self.max_bytes <= 0:
+            return
+        json_path, png_path = self._paths(key)
+        payload = json.dumps(detections.to_records(), separators=(",", ":"))
+        with self._lock:
+            index = self._load_index()
+            if key in index:
+                return
+            json_path.parent.mkdir(parents=True, exist_ok=True)
+            # el PNG primero: una entrada solo "existe" cuando su JSON está escrito
+            if annotated_png is not None:
+                png_path.write_bytes(annotated_png)
+            json_path.write_text(payload, encoding="utf-8")
+            size = len(annotated_png or b"") + json_path.stat().st_size
+            index[key] = (size, json_path.stat().st_mtime)
+            self._total += size
+            self._evict()
+
+    def _drop(self, key: str) -> None:
+        assert self._index is not None
+        size, _ = self._index.pop(key, (0, 0.0))
+        self._total -= size
+        for p in self._paths(key):
+            p.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        assert self._index is not None
+        if self._total <= self.max_bytes:
+            return
+        for key, _ in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total <= self.max_bytes:
+                break
+            self._drop(key)
+            self.stats.evictions += 1
+
+
+def cache_from_settings(s: AppSettings) -> Optional[ResultCache]:
+    """RESULT_CACHE_MAX_MB <= 0 desactiva la caché."""
+    if s.result_cache_max_mb <= 0:
+        return None
+    return ResultCache(root=s.result_cache_dir, max_bytes=s.result_cache_max_mb * 1024 * 1024)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from uav_traffic_ai.profiling import count, timer
+from uav_traffic_ai.settings import AppSettings
+from uav_traffic_ai.vision.detections import DetectionArrays
+
+
+@dataclass(frozen=True)
+class DedupConfig:
+    max_hamming: int = 6  # bits distintos (de 64) del dHash: descarta movimientos de cámara o cambios de luz
+    pixel_diff: int = 12  # diferencia en gris (0-255) a partir de la cual un píxel de la miniatura "cambió"
+    # píxeles de la miniatura que pueden cambiar: un coche de 40x20 px en 1080p ocupa ~20, así que uno que entra,
+    # sale o avanza unos píxeles ya rompe el duplicado; 4 absorben el ruido y el JPEG de un frame estático
+    max_changed_px: int = 4
+    max_reuse: int = 30  # frames seguidos sin inferencia como mucho; después se infiere aunque no cambie nada
+    thumb_width: int = 320  # cada píxel de la miniatura cubre ~6x6 px de un frame 1080p
+
+
+@dataclass(frozen=True)
+class FrameSignature:
+    shape: Tuple[int, ...]
+    dhash: int
+    thumb: np.ndarray  # gris uint8, thumb_width de ancho
+
+
+@dataclass
+class DedupStats:
+    frames: int = 0
+    reused: int = 0  # frames que no pasaron por el modelo
+
+    @property
+    def saved_fraction(self) -> float:
+        return self.reused / self.frames if self.frames else 0.0
+
+    def summary(self) -> str:
+        return f"  dedup: {self.reused}/{self.frames} frames sin inferencia ({self.saved_fraction:.0%})"
+
+
+def frame_signature(img_bgr: np.ndarray, thumb_width: int = 320) -> FrameSignature:
+    h, w = img_bgr.shape[:2]
+    tw = max(9, min(w, thumb_width))
+    th = max(8, round(h * tw / w))
+    # INTER_AREA promedia: el ruido del sensor desaparece en la miniatura y un vehículo sigue siendo visible
+    thumb = cv2.cvtColor(cv2.resize(img_bgr, (tw, th), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(thumb, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return FrameSignature(shape=img_bgr.shape, dhash=int(np.packbits(bits).view(">u8")[0]), thumb=thumb)
+
+
+class FrameDeduper:
+    """
+    Detecta frames casi iguales en una secuencia (dron en estacionario) antes de la inferencia.
+    Cada frame se compara con el último que sí pasó por el modelo (el keyframe), no con el anterior: un cambio
+    lento acaba superando el umbral en vez de arrastrarse indefinidamente. Hace falta pasar los dos filtros:
+    el dHash (64 bits, barato y robusto a ruido) y la diferencia píxel a píxel de una miniatura en gris, que es la
+    que ve un vehículo que entra o sale. Un frame duplicado reutiliza las detecciones del keyframe y su evidencia
+    apunta a la del keyframe (Evidence.reused_from), así que sigue habiendo una evidencia por frame.
+
+    Uso secuencial y en orden: check(frame) antes de inferir; después, también en orden, remember() con las
+    detecciones y el sha256 de la evidencia de cada keyframe, y reuse() para cada duplicado. Las dos mitades pueden ir
+    en hilos distintos (inferencia / persistencia en run_batch_pipeline) mientras cada una respete el orden.
+    Los frames de escenas distintas necesitan un FrameDeduper cada una.
+    """
+
+    def __init__(self, config: DedupConfig = DedupConfig()) -> None:
+        self.config = config
+        self.stats = DedupStats()
+        self._key: Optional[FrameSignature] = None
+        self._run = 0  # duplicados seguidos del keyframe actual
+        self.reference: Optional[Tuple[DetectionArrays, str]] = None  # (detecciones, sha256) del keyframe
+
+    def is_duplicate(self, sig: FrameSignature) -> bool:
+        key, c = self._key, self.config
+        if key is None or sig.shape != key.shape or self._run >= c.max_reuse:
+            return False
+        if bin(sig.dhash ^ key.dhash).count("1") > c.max_hamming:
+            return False
+        changed = np.count_nonzero(cv2.absdiff(sig.thumb, key.thumb) > c.pixel_diff)
+        return changed <= c.max_changed_px
+
+    def check(self, img_bgr: np.ndarray) -> bool:
+        """True si el frame se puede servir con las detecciones del keyframe; si no, pasa a ser el keyframe."""
+        with timer("ingest.dedup"):
+            sig = frame_signature(img_bgr, self.config.thumb_width)
+            duplicate = self.is_duplicate(sig)
+        self.stats.frames += 1
+        if duplicate:
+            self._run += 1
+            self.stats.reused += 1
+            count("dedup.reused")
+        else:
+            self._key, self._run = sig, 0
+        return duplicate
+
+    def remember(self, detections: DetectionArrays, sha256: str) -> None:
+        self.reference = (detections, sha256)
+
+    def reuse(self) -> Tuple[DetectionArrays, str]:
+        if self.reference is None:
+            raise RuntimeError("Frame duplicado sin keyframe: falta remember() del frame anterior")
+        return self.reference
+
+    def reset(self) -> None:
+        self._key, self._run, self.reference = None, 0, None
+
+
+def dedup_config_from_settings(s: AppSettings) -> DedupConfig:
+    return DedupConfig(
+        max_hamming=s.dedup_max_hamming,
+        pixel_diff=s.dedup_pixel_diff,
+        max_changed_px=s.dedup_max_changed_px,
+        max_reuse=s.dedup_max_reuse,
+    )
+
+
+def deduper_from_settings(s: AppSettings, *, enabled: Optional[bool] = None) -> Optional[FrameDeduper]:
+    """DEDUP=1 (o enabled=True, p.ej. --dedup) lo activa; None si no."""
+    if not (s.dedup if enabled is None else enabled or s.dedup):
+        return None
+    return FrameDeduper(dedup_config_from_settings(s))
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from uav_traffic_ai.ingest.media import read_image_bgr
+from uav_traffic_ai.settings import AppSettings
+
+LETTERBOX_PAD = 114  # el gris de relleno de YOLO
+
+# memmaps abiertos por proceso: cada worker del modo sharded abre el fichero una vez y comparte las páginas
+_OPEN: Dict[str, np.ndarray] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+def open_frames_file(path: Path) -> np.ndarray:
+    """Array (N, H, W, 3) de solo lectura mapeado en memoria (sin copiar: las páginas las comparte el SO)."""
+    key = str(path)
+    with _OPEN_LOCK:
+        arr = _OPEN.get(key)
+        if arr is None:
+            arr = _OPEN[key] = np.load(path, mmap_mode="r")
+        return arr
+
+
+def fit_frame(img_bgr: np.ndarray, size: int, letterbox: bool = False) -> np.ndarray:
+    """Reduce el lado mayor a `size` (sin ampliar); con letterbox además rellena hasta size x size centrado."""
+    if size <= 0:
+        return img_bgr
+    h, w = img_bgr.shape[:2]
+    scale = min(1.0, size / max(h, w))
+    if scale < 1.0:
+        img_bgr = cv2.resize(img_bgr, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+    if not letterbox:
+        return img_bgr
+    h, w = img_bgr.shape[:2]
+    top, left = (size - h) // 2, (size - w) // 2
+    return cv2.copyMakeBorder(
+        img_bgr, top, size - h - top, left, size - w - left, cv2.BORDER_CONSTANT, value=(LETTERBOX_PAD,) * 3
+    )
+
+
+@dataclass(frozen=True)
+class DecodedFrames:
+    """Frames ya decodificados de una lista de rutas, en el mismo orden. frames[i] es una vista sin copia."""
+
+    path: Path  # .npy con el array (N, H, W, 3) uint8
+    frame_paths: Tuple[Path, ...]
+
+    @property
+    def array(self) -> np.ndarray:
+        return open_frames_file(self.path)
+
+    def __len__(self) -> int:
+        return len(self.frame_paths)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return np.asarray(self.array[index])
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        arr = self.array
+        for i in range(len(self.frame_paths)):
+            yield np.asarray(arr[i])
+
+
+class FrameCache:
+    """
+    Caché en disco de frames decodificados para repetir barridos sobre la misma escena (p.ej. ajustando conf/iou)
+    sin volver a pasar cada JPEG/PNG por cv2.imread. Una lista de frames = un .npy (N, H, W, 3) uint8 que se lee con
+    mmap: los procesos del modo sharded mapean el mismo fichero y no copian nada. La clave cubre rutas, tamaño y mtime
+    de cada fichero y el redimensionado (size/letterbox), así que tocar un frame invalida su entrada.
+    El mtime del .npy hace de marca LRU: al superar max_bytes se borran las entradas más antiguas.
+    Todos los frames deben salir con el mismo tamaño (lo normal dentro de una escena; con letterbox siempre).
+    size/letterbox cambian la geometría del frame: batch --frame-cache solo acepta size=0, porque la evidencia sella el
+    tamaño de imagen, las cajas y la ocupación del original.
+    """
+
+    def __init__(self, root: Path, *, max_bytes: int, size: int = 0, letterbox: bool = False, workers: int = 0) -> None:
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.size = max(0, int(size))
+        self.letterbox = bool(letterbox) and self.size > 0
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self._lock = threading.Lock()
+
+    def key_for(self, frame_paths: Sequence[Path]) -> str:
+        h = hashlib.sha256(f"{self.size}|{int(self.letterbox)}".encode("utf-8"))
+        for p in frame_paths:
+            st = p.stat()
+            h.update(f"|{os.path.abspath(p)}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.root / f"{key}.npy", self.root / f"{key}.json"
+
+    def get(self, frame_paths: Sequence[Path]) -> Optional[DecodedFrames]:
+        npy, meta = self._paths(self.key_for(frame_paths))
+        if not (npy.exists() and meta.exists()):  # sin .json la escritura no terminó
+            return None
+        os.utime(npy)  # marca LRU
+        return DecodedFrames(path=npy, frame_paths=tuple(frame_paths))
+
+    def _decode(self, p: Path) -> np.ndarray:
+        return fit_frame(read_image_bgr(p), self.size, self.letterbox)
+
+    def build(self, frame_paths: Sequence[Path]) -> DecodedFrames:
+        """Decodifica (en hilos: cv2.imread libera el GIL) y escribe el .npy; el .json se escribe el último."""
+        if not frame_paths:
+            raise ValueError("No hay frames que cachear")
+        key = self.key_for(frame_paths)
+        npy, meta = self._paths(key)
+        self.root.mkdir(parents=True, exist_ok=True)
+        first = self._decode(frame_paths[0])
+        tmp = npy.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        arr = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8, shape=(len(frame_paths), *first.shape))
+        try:
+            arr[0] = first
+
+            def fill(i: int) -> None:
+                img = self._decode(frame_paths[i])
+                if img.shape != first.shape:
+                    raise ValueError(
+                        f"{frame_paths[i]} mide {img.shape} y el primer frame {first.shape}: "
+                        "la caché guarda un único tamaño de frame por escena"
+                    )
+                arr[i] = img
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(fill, range(1, len(frame_paths))))
+            arr.flush()
+        except BaseException:
+            del arr
+            tmp.unlink(missing_ok=True)
+            raise
+        del arr
+        tmp.replace(npy)
+        meta.write_text(
+            json.dumps(
+                {
+                    "frames": [str(p) for p in frame_paths],
+                    "shape": [len(frame_paths), *first.shape],
+                    "size": self.size,
+                    "letterbox": self.letterbox,
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        self._evict(keep=npy)
+        return DecodedFrames(path=npy, frame_paths=tuple(frame_paths))
+
+    def get_or_build(self, frame_paths: Sequence[Path]) -> DecodedFrames:
+        return self.get(frame_paths) or self.build(frame_paths)
+
+    def _evict(self, *, keep: Path) -> None:
+        with self._lock:
+            entries: List[Tuple[float, int, Path]] = []
+            for p in self.root.glob("*.npy"):
+                if p.name.endswith(".tmp.npy"):
+                    continue
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+            total = sum(size for _, size, _ in entries)
+            for _, size, p in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if p == keep:
+                    continue
+                try:
+                    p.with_suffix(".json").unlink(missing_ok=True)
+                    p.unlink(missing_ok=True)
+                except OSError:
+                    continue  # en Windows no se puede borrar un .npy que otro proceso tiene mapeado
+                total -= size
+
+
+def frame_cache_from_settings(s: AppSettings) -> Optional[FrameCache]:
+    """FRAME_CACHE_MAX_GB=0 la desactiva."""
+    if s.frame_cache_max_gb <= 0:
+        return None
+    return FrameCache(
+        s.frame_cache_dir,
+        max_bytes=int(s.frame_cache_max_gb * 1024**3),
+        size=s.frame_cache_size,
+        letterbox=s.frame_cache_letterbox,
+    )
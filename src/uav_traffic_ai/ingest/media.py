@@ -1,19 +1,33 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 import cv2
 import numpy as np
 
+from uav_traffic_ai.profiling import timer
+from uav_traffic_ai.settings import AppSettings
+
 
 def read_image_bgr(image_path: Path) -> np.ndarray:
-    img = cv2.imread(str(image_path))
+    with timer("ingest.decode"):
+        img = cv2.imread(str(image_path))
     if img is None:
         raise ValueError(f"No se pudo leer la imagen: {image_path}")
     return img
 
 
+def decode_image_bgr(data: bytes) -> np.ndarray:
+    """Igual que read_image_bgr pero desde los bytes del fichero (png/jpg/webp), p.ej. un upload HTTP."""
+    with timer("ingest.decode"):
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if data else None
+    if img is None:
+        raise ValueError("No se pudo decodificar la imagen")
+    return img
+
+
 def image_size(img_bgr: np.ndarray) -> Tuple[int, int]:
     h, w = img_bgr.shape[:2]
     return w, h
@@ -24,3 +38,45 @@ def encode_png_bytes(img_bgr: np.ndarray) -> bytes:
     if not ok:
         raise ValueError("No se pudo codificar PNG")
     return bytes(buf)
+
+
+IMAGE_FORMATS = ("png", "jpg", "webp")
+
+
+@dataclass(frozen=True)
+class ImageEncoding:
+    """
+    Formato de la imagen anotada. png es sin pérdida (png_level 0-9: 0 = sin comprimir, el más rápido; 9 = el más pequeño);
+    jpg/webp con quality 0-100 pesan bastante menos y codifican más rápido en frames grandes.
+    """
+
+    fmt: str = "png"
+    quality: int = 90
+    png_level: int = 1  # el valor por defecto de cv2.imencode
+
+    @property
+    def ext(self) -> str:
+        return f".{self.fmt}"
+
+    def params(self) -> List[int]:
+        if self.fmt == "jpg":
+            return [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        if self.fmt == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        return [cv2.IMWRITE_PNG_COMPRESSION, self.png_level]
+
+
+PNG = ImageEncoding()
+
+
+def encode_image_bytes(img_bgr: np.ndarray, encoding: ImageEncoding = PNG) -> bytes:
+    with timer("reporting.encode_image"):
+        ok, buf = cv2.imencode(encoding.ext, img_bgr, encoding.params())
+    if not ok:
+        raise ValueError(f"No se pudo codificar {encoding.fmt.upper()}")
+    return bytes(buf)
+
+
+def image_encoding_from_settings(s: AppSettings, fmt: Optional[str] = None) -> ImageEncoding:
+    """fmt sobreescribe ANNOTATED_FORMAT (p.ej. desde --annotate en la CLI)."""
+    return ImageEncoding(fmt=fmt or s.annotated_format, quality=s.annotated_quality, png_level=s.annotated_png_level)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from uav_traffic_ai.schemas import Metrics
+from uav_traffic_ai.settings import AppSettings
+
+
+def metric_signals(m: Metrics) -> Tuple[float, float, float]:
+    # lo que guía la densificación: cuántos vehículos hay y cuánto ocupan
+    return float(sum(m.counts_by_typology.values())), m.density_per_megapixel, m.occupancy_ratio
+
+
+@dataclass(frozen=True)
+class SamplingConfig:
+    budget: int = 64  # inferencias por escena como mucho
+    initial_fraction: float = 0.5  # parte del presupuesto para la pasada uniforme inicial
+    round_size: int = 8  # frames nuevos por ronda (lo natural: un lote del modelo)
+    floor: float = 0.3  # prioridad mínima por frame de hueco: los tramos largos y planos también se muestrean
+
+
+@dataclass(frozen=True)
+class SceneEstimate:
+    """Medias por frame de la escena completa, interpolando linealmente entre los frames analizados."""
+
+    frames: int
+    sampled: int
+    vehicles: float
+    density_per_megapixel: float
+    occupancy_ratio: float
+    counts_by_typology: Dict[str, float]
+
+    def summary(self) -> str:
+        typ = " ".join(f"{k}={v:.2f}" for k, v in sorted(self.counts_by_typology.items()))
+        return (
+            f"  estimación ({self.sampled}/{self.frames} frames): vehículos/frame={self.vehicles:.2f} "
+            f"densidad={self.density_per_megapixel:.2f}/MP ocupación={self.occupancy_ratio:.4f} {typ}"
+        )
+
+
+def estimate_scene(points: Dict[int, Metrics], n_frames: int) -> SceneEstimate:
+    """
+    Con todos los frames es la media exacta; con una muestra, cada frame no analizado toma el valor interpolado
+    entre sus vecinos analizados (los extremos, el del más cercano), así que un tramo denso muestreado con más
+    frames no pesa más que su duración.
+    """
+    if not points:
+        raise ValueError("Sin frames analizados")
+    idx = sorted(points)
+    x = np.arange(n_frames)
+
+    def mean_of(values: List[float]) -> float:
+        return float(np.interp(x, idx, values).mean())
+
+    ms = [points[i] for i in idx]
+    typologies = sorted({t for m in ms for t in m.counts_by_typology})
+    return SceneEstimate(
+        frames=n_frames,
+        sampled=len(idx),
+        vehicles=mean_of([metric_signals(m)[0] for m in ms]),
+        density_per_megapixel=mean_of([m.density_per_megapixel for m in ms]),
+        occupancy_ratio=mean_of([m.occupancy_ratio for m in ms]),
+        counts_by_typology={t: mean_of([float(m.counts_by_typology.get(t, 0)) for m in ms]) for t in typologies},
+    )
+
+
+class AdaptiveSampler:
+    """
+    Muestreo de una escena dentro de un presupuesto de inferencias, en lugar de un frame de cada N.
+    Empieza con una pasada uniforme y dispersa (initial_fraction del presupuesto, primer y último frame incluidos) y,
+    ronda a ronda, añade el punto medio de los huecos entre frames analizados con más prioridad:
+    hueco x (cambio + floor), donde el cambio es la mayor diferencia entre los extremos del hueco de las señales de
+    metric_signals (vehículos, densidad, ocupación) relativa a su nivel medio en la escena. Así la carretera vacía se
+    queda con la muestra inicial y los tramos donde el tráfico sube o baja se densifican. Un pico que empieza y
+    termina dentro de un mismo hueco no se ve hasta que floor lo parte: la pasada inicial fija la resolución mínima.
+    """
+
+    def __init__(self, n_frames: int, config: SamplingConfig = SamplingConfig()) -> None:
+        self.n_frames = n_frames
+        self.config = config
+        self.budget = max(1, min(n_frames, config.budget))
+        self.metrics: Dict[int, Metrics] = {}
+        self._requested: set = set()
+
+    def initial(self) -> List[int]:
+        k = max(2, round(self.budget * self.config.initial_fraction))
+        idx = np.unique(np.linspace(0, self.n_frames - 1, min(k, self.budget)).round().astype(int)).tolist()
+        self._requested.update(idx)
+        return idx
+
+    def observe(self, index: int, metrics: Metrics) -> None:
+        self.metrics[index] = metrics
+
+    def priorities(self) -> List[Tuple[float, int]]:
+        """(prioridad, punto medio) de cada hueco con algún frame sin analizar, de mayor a menor."""
+        pts = sorted(self.metrics)
+        if len(pts) < 2:
+            return []
+        vals = np.array([metric_signals(self.metrics[i]) for i in pts])
+        scale = np.maximum(np.abs(vals).mean(axis=0), 1e-9)
+        change = (np.abs(np.diff(vals, axis=0)) / scale).max(axis=1)
+        gaps = np.diff(pts)
+        out = []
+        for a, gap, c in zip(pts, gaps.tolist(), change.tolist()):
+            mid = a + gap // 2
+            if gap >= 2 and mid not in self._requested:
+                out.append((gap * (c + self.config.floor), mid))
+        out.sort(key=lambda t: (-t[0], t[1]))
+        return out
+
+    def next_round(self) -> List[int]:
+        """Los siguientes frames a analizar ([] si se agotó el presupuesto o ya no quedan huecos)."""
+        remaining = self.budget - len(self._requested)
+        if remaining <= 0:
+            return []
+        picked = sorted(mid for _, mid in self.priorities()[: min(remaining, max(1, self.config.round_size))])
+        self._requested.update(picked)
+        return picked
+
+    def estimate(self) -> SceneEstimate:
+        return estimate_scene(self.metrics, self.n_frames)
+
+
+def adaptive_sample(
+    n_frames: int,
+    evaluate: Callable[[List[int]], Sequence[Metrics]],
+    config: SamplingConfig = SamplingConfig(),
+) -> AdaptiveSampler:
+    """
+    Bucle completo: evaluate(índices) analiza esos frames (en ese orden) y devuelve sus Metrics; se llama una vez
+    por ronda hasta agotar el presupuesto. Devuelve el sampler (metrics y estimate()).
+    """
+    sampler = AdaptiveSampler(n_frames, config)
+    todo = sampler.initial() if n_frames else []
+    while todo:
+        for i, m in zip(todo, evaluate(todo)):
+            sampler.observe(i, m)
+        todo = sampler.next_round()
+    return sampler
+
+
+def sampling_config_from_settings(
+    s: AppSettings, *, budget: Optional[int] = None, round_size: Optional[int] = None
+) -> SamplingConfig:
+    return SamplingConfig(
+        budget=budget or s.sampling_budget,
+        initial_fraction=s.sampling_initial_fraction,
+        round_size=round_size or s.yolo_batch_size,
+        floor=s.sampling_floor,
+    )
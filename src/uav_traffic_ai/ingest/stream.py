@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import cv2
+import numpy as np
+
+from uav_traffic_ai.profiling import timer
+
+StreamSource = Union[str, int, Path]
+
+_END = object()
+
+
+@dataclass(frozen=True)
+class StreamFrame:
+    source: str
+    index: int  # índice del frame en la fuente (no en la salida decimada)
+    timestamp_s: float  # posición en la fuente, en segundos
+    image: np.ndarray
+
+
+@dataclass
+class StreamStats:
+    read: int = 0  # frames leídos de la fuente
+    yielded: int = 0  # frames entregados al consumidor
+    skipped_fps: int = 0  # descartados por target_fps
+    dropped_backpressure: int = 0  # descartados porque el consumidor iba por detrás
+
+
+def _is_live(source: StreamSource) -> bool:
+    if isinstance(source, int):
+        return True
+    s = str(source)
+    return s.isdigit() or "://" in s
+
+
+def open_capture(source: StreamSource) -> cv2.VideoCapture:
+    """Fichero de vídeo (mp4/avi...), índice de cámara ("0") o URL (rtsp://, http://)."""
+    src: Union[str, int] = int(source) if str(source).isdigit() else str(source)
+    cap = cv2.VideoCapture(src)
+    if not cap.isOpened():
+        raise ValueError(f"No se pudo abrir la fuente de vídeo: {source}")
+    return cap
+
+
+class FrameStream:
+    """
+    Generador de frames con un hilo lector y una cola acotada (max_buffer frames): la memoria no
+    crece con la duración del vuelo.
+
+    - target_fps: decimación por timestamp; los frames descartados solo se hacen grab() (sin decodificar).
+    - drop_when_behind: si la cola está llena se descarta el frame más antiguo en vez de bloquear
+      al lector. Por defecto activo en fuentes en vivo (cámara/URL) y en realtime; en ficheros se bloquea
+      y no se pierde ningún frame.
+    - realtime: reproduce un fichero al ritmo de su FPS nominal, como si fuera un feed en vivo
+      (sustituto local de una fuente RTSP para pruebas).
+    """
+
+    def __init__(
+        self,
+        source: StreamSource,
+        *,
+        target_fps: Optional[float] = None,
+        max_buffer: int = 8,
+        drop_when_behind: Optional[bool] = None,
+        realtime: bool = False,
+    ) -> None:
+        self.source = str(source)
+        self.target_fps = target_fps if target_fps and target_fps > 0 else None
+        self.max_buffer = max(1, int(max_buffer))
+        self.realtime = realtime
+        self.live = _is_live(source)
+        self.drop_when_behind = (self.live or realtime) if drop_when_behind is None else drop_when_behind
+        self.stats = StreamStats()
+
+        self._cap = open_capture(source)
+        fps = float(self._cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        self.source_fps = fps if fps > 0 else None
+        self._q: "queue.Queue[object]" = queue.Queue(maxsize=self.max_buffer)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def _timestamp(self, index: int, t_start: float) -> float:
+        if self.source_fps and not self.live:
+            return index / self.source_fps
+        pos_ms = float(self._cap.get(cv2.CAP_PROP_POS_MSEC) or 0.0)
+        # en vivo CAP_PROP_POS_MSEC no siempre está disponible: usamos reloj de pared
+        return pos_ms / 1000.0 if pos_ms > 0 else time.monotonic() - t_start
+
+    def _offer(self, item: object) -> None:
+        if not self.drop_when_behind:
+            while not self._stop.is_set():
+                try:
+                    self._q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            return
+        while True:
+            try:
+                self._q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    old = self._q.get_nowait()
+                    if old is not _END:
+                        self.stats.dropped_backpressure += 1
+                except queue.Empty:
+                    pass
+
+    def _reader(self) -> None:
+        t_start = time.monotonic()
+        next_ts = 0.0
+        index = -1
+        try:
+            while not self._stop.is_set():
+                if not self._cap.grab():
+                    break
+                index += 1
+                self.stats.read += 1
+                ts = self._timestamp(index, t_start)
+
+                if self.realtime and self.source_fps:
+                    delay = t_start + ts - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                if self.target_fps is not None:
+                    if ts + 1e-9 < next_ts:
+                        self.stats.skipped_fps += 1
+                        continue
+                    next_ts = max(next_ts + 1.0 / self.target_fps, ts)
+
+                with timer("ingest.stream_decode"):
+                    ok, img = self._cap.retrieve()
+                if not ok or img is None:
+                    break
+                self._offer(StreamFrame(source=self.source, index=index, timestamp_s=ts, image=img))
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._cap.release()
+            self._offer_end()
+
+    def _offer_end(self) -> None:
+        # el centinela nunca se descarta: si la cola está llena, esperamos a que haya hueco
+        while not self._stop.is_set():
+            try:
+                self._q.put(_END, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __iter__(self) -> Iterator[StreamFrame]:
+        if self._thread is not None:
+            raise RuntimeError("FrameStream solo se puede iterar una vez")
+        self._thread = threading.Thread(target=self._reader, name="frame-stream", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._q.get()
+                if item is _END:
+                    break
+                self.stats.yielded += 1
+                yield item  # type: ignore[misc]
+        finally:
+            self.close()
+        if self._error is not None:
+            raise self._error
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
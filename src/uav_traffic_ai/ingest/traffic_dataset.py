@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import csv
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-import pandas as pd
+from uav_traffic_ai.settings import AppSettings
+
+FRAME_EXTS = {".png", ".jpg", ".jpeg"}
+MANIFEST_VERSION = 1
 
 
 @dataclass(frozen=True)
@@ -17,26 +25,52 @@ class TrafficScene:
 
 
 def load_scenes(scenes_csv: Path, dataset_dir: Path) -> List[TrafficScene]:
-    df = pd.read_csv(scenes_csv)
     scenes: List[TrafficScene] = []
-    for _, row in df.iterrows():
-        scene_id = str(row["Sequence"])
-        folder = (dataset_dir / "dataset" / scene_id).resolve()
-        scenes.append(
-            TrafficScene(
-                scene_id=scene_id,
-                scene_name=str(row["Scene name"]),
-                lat=float(row["lat"]),
-                lon=float(row["long"]),
-                folder=folder,
+    with scenes_csv.open("r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            scene_id = row["Sequence"].strip()
+            folder = (dataset_dir / "dataset" / scene_id).resolve()
+            scenes.append(
+                TrafficScene(
+                    scene_id=scene_id,
+                    scene_name=row["Scene name"].strip(),
+                    lat=float(row["lat"]),
+                    lon=float(row["long"]),
+                    folder=folder,
+                )
             )
-        )
     return scenes
 
 
+def _scan_tree(folder: Path) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Recorre la carpeta de una escena como rglob("*") (sin entrar en enlaces a directorios) pero con os.scandir:
+    el tipo de cada entrada viene del propio listado, sin un stat por fichero. Devuelve el mtime de cada
+    directorio (para invalidar) y las rutas relativas de los frames en el orden de sorted() sobre Path.
+    """
+    dirs: Dict[str, int] = {}
+    found: List[Tuple[str, ...]] = []
+    stack: List[Tuple[Path, Tuple[str, ...]]] = [(folder, ())]
+    while stack:
+        d, parts = stack.pop()
+        rel = "/".join(parts) or "."
+        try:
+            dirs[rel] = d.stat().st_mtime_ns
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir() and not entry.is_symlink():
+                        stack.append((Path(entry.path), parts + (entry.name,)))
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in FRAME_EXTS:
+                        found.append(parts + (entry.name,))
+        except (FileNotFoundError, NotADirectoryError):
+            dirs.setdefault(rel, -1)  # nunca coincide: si la carpeta aparece se escanea
+    # Path ordena por componentes (sin distinguir mayúsculas en Windows): igual que ordenar estas tuplas
+    found.sort(key=(lambda p: tuple(map(os.path.normcase, p))) if os.name == "nt" else None)
+    return dirs, ["/".join(p) for p in found]
+
+
 def list_scene_frames(scene_folder: Path) -> List[Path]:
-    exts = {".png", ".jpg", ".jpeg"}
-    frames = sorted([p for p in scene_folder.rglob("*") if p.is_file() and p.suffix.lower() in exts])
+    frames = [scene_folder / rel for rel in _scan_tree(scene_folder)[1]]
     if not frames:
         raise FileNotFoundError(f"No encuentro frames en {scene_folder}")
     return frames
@@ -46,3 +80,119 @@ def sample_frames(frames: List[Path], stride: int = 8, max_frames: int = 64) ->
     stride = max(1, int(stride))
     sampled = frames[::stride]
     return sampled[: max_frames]
+
+
+class DatasetManifest:
+    """
+    Índice de frames por escena para no recorrer el dataset en cada selección (la UI lo hacía en cada rerun).
+    Por carpeta guarda la lista ordenada de frames y el mtime de cada directorio del árbol: añadir, borrar o
+    renombrar un frame cambia el mtime de su directorio, así que validar una escena cuesta un stat por directorio
+    (no por fichero) y solo se re-escanean las escenas que han cambiado. Las listas quedan en memoria
+    (frames(folder)[i] es O(1)) y en un JSON en disco (`path`) para que el siguiente proceso arranque sin escanear.
+    load_scenes también se cachea por mtime de scenes.csv.
+    """
+
+    def __init__(self, path: Optional[Path] = None, *, workers: int = 0) -> None:
+        self.path = path
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None  # carpeta -> {"dirs", "frames"}
+        self._frames: Dict[str, List[Path]] = {}
+        self._scenes: Dict[Tuple[str, str], Tuple[int, List[TrafficScene]]] = {}
+        self._dirty = False
+        self.scans = 0  # escenas (re)escaneadas por este proceso
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path is not None and self.path.exists():
+                try:
+                    data = json.loads(self.path.read_text(encoding="utf-8"))
+                    if data.get("version") == MANIFEST_VERSION:
+                        self._entries = data["scenes"]
+                except (OSError, ValueError, KeyError):
+                    pass  # manifest corrupto o a medio escribir: se reconstruye
+        return self._entries
+
+    @staticmethod
+    def _is_fresh(folder: Path, entry: Dict[str, Any]) -> bool:
+        for rel, mtime in entry["dirs"].items():
+            try:
+                if (folder / rel).stat().st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _scan(self, folder: Path) -> Tuple[str, Dict[str, Any]]:
+        dirs, frames = _scan_tree(folder)
+        return str(folder), {"dirs": dirs, "frames": frames}
+
+    def refresh(self, folders: Iterable[Path]) -> int:
+        """Valida las carpetas y re-escanea en paralelo las que han cambiado. Devuelve cuántas se escanearon."""
+        folders = [Path(f) for f in folders]
+        with self._lock:
+            entries = self._load()
+            stale = [f for f in folders if str(f) not in entries or not self._is_fresh(f, entries[str(f)])]
+        if not stale:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(stale))) as pool:
+            scanned = list(pool.map(self._scan, stale))
+        with self._lock:
+            entries = self._load()
+            for key, entry in scanned:
+                entries[key] = entry
+                self._frames.pop(key, None)  # la lista de Path se rehace en frames()
+            self.scans += len(scanned)
+            self._dirty = True
+        self.save()
+        return len(scanned)
+
+    def frames(self, folder: Path) -> List[Path]:
+        """Frames ordenados de la escena (misma lista que list_scene_frames). No modificar: es la copia en caché."""
+        self.refresh([folder])
+        key = str(folder)
+        with self._lock:
+            frames = self._frames.get(key)
+            if frames is None:
+                frames = self._frames[key] = [folder / rel for rel in self._load()[key]["frames"]]
+        if not frames:
+            raise FileNotFoundError(f"No encuentro frames en {folder}")
+        return frames
+
+    def frame_at(self, folder: Path, index: int, *, stride: int = 1) -> Path:
+        """El frame `index` de sample_frames(frames, stride) sin construir la muestra."""
+        return self.frames(folder)[index * max(1, int(stride))]
+
+    def scenes(self, scenes_csv: Path, dataset_dir: Path) -> List[TrafficScene]:
+        """load_scenes, releído solo si cambia scenes.csv."""
+        key = (str(scenes_csv), str(dataset_dir))
+        mtime = scenes_csv.stat().st_mtime_ns
+        with self._lock:
+            cached = self._scenes.get(key)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        scenes = load_scenes(scenes_csv, dataset_dir)
+        with self._lock:
+            self._scenes[key] = (mtime, scenes)
+        return scenes
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"version": MANIFEST_VERSION, "scenes": self._entries}, separators=(",", ":"))
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        tmp.replace(self.path)  # atómico: otro proceso nunca lee un manifest a medias
+
+
+def dataset_manifest_from_settings(s: AppSettings) -> Optional[DatasetManifest]:
+    """DATASET_MANIFEST_PATH=0 desactiva el manifest (se recorre la carpeta en cada consulta)."""
+    if s.dataset_manifest_path is None:
+        return None
+    return DatasetManifest(s.dataset_manifest_path)
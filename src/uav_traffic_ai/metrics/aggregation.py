@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import csv
+import math
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from uav_traffic_ai.schemas import Evidence, Metrics
+from uav_traffic_ai.settings import AppSettings
+from uav_traffic_ai.vision.postprocess import TYPOLOGY_MAP
+
+TYPOLOGIES: Tuple[str, ...] = tuple(sorted(set(TYPOLOGY_MAP.values()))) + ("other",)
+
+# Columnas de la tabla compacta: una fila por (escena, run, ventana) con sumas/máximos, así que dos filas de la
+# misma ventana se combinan sumando (lo que permite añadir deltas sin reescribir el fichero).
+TABLE_COLUMNS: Tuple[str, ...] = (
+    "scene_id",
+    "run_id",
+    "window_start",
+    "window_s",
+    "frames",
+    "detections",
+    "density_sum",
+    "density_max",
+    "occupancy_sum",
+    "occupancy_max",
+    "t_first",
+    "t_last",
+    *(f"sum_{t}" for t in TYPOLOGIES),
+    *(f"max_{t}" for t in TYPOLOGIES),
+)
+
+
+EPOCH_MIN_S = 1e9  # por debajo, el tiempo es una posición relativa (vídeo, --fps) y no una fecha
+
+Key = Tuple[str, str, float]  # (escena, run, inicio de ventana)
+
+
+def new_run_id() -> str:
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}_{os.getpid()}"
+
+
+def evidence_time_s(e: Evidence) -> float:
+    """Posición en el vídeo/stream si la hay (relativa, desde 0); si no, created_at_utc en segundos epoch."""
+    if e.source is not None:
+        return float(e.source.timestamp_s)
+    return e.created_at_utc.timestamp()
+
+
+def format_window_start(t: float) -> str:
+    # epoch -> ISO UTC; tiempos relativos (posición en un vídeo) -> +HH:MM:SS
+    if t >= EPOCH_MIN_S:
+        return datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return f"+{int(t) // 3600:02d}:{int(t) % 3600 // 60:02d}:{int(t) % 60:02d}"
+
+
+@dataclass
+class WindowStats:
+    """Agregado de los frames de una ventana. Solo sumas, máximos y extremos: se combina con merge sin perder nada."""
+
+    frames: int = 0
+    detections: int = 0
+    density_sum: float = 0.0
+    density_max: float = 0.0
+    occupancy_sum: float = 0.0
+    occupancy_max: float = 0.0
+    t_first: float = math.inf
+    t_last: float = -math.inf
+    counts_sum: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(TYPOLOGIES, 0))
+    counts_max: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(TYPOLOGIES, 0))
+
+    def add(self, metrics: Metrics, t: float) -> None:
+        self.frames += 1
+        self.detections += sum(metrics.counts_by_typology.values())
+        self.density_sum += metrics.density_per_megapixel
+        self.density_max = max(self.density_max, metrics.density_per_megapixel)
+        self.occupancy_sum += metrics.occupancy_ratio
+        self.occupancy_max = max(self.occupancy_max, metrics.occupancy_ratio)
+        self.t_first = min(self.t_first, t)
+        self.t_last = max(self.t_last, t)
+        for typology, n in metrics.counts_by_typology.items():
+            typology = typology if typology in self.counts_sum else "other"
+            self.counts_sum[typology] += n
+            self.counts_max[typology] = max(self.counts_max[typology], n)
+
+    def merge(self, other: "WindowStats") -> "WindowStats":
+        self.frames += other.frames
+        self.detections += other.detections
+        self.density_sum += other.density_sum
+        self.density_max = max(self.density_max, other.density_max)
+        self.occupancy_sum += other.occupancy_sum
+        self.occupancy_max = max(self.occupancy_max, other.occupancy_max)
+        self.t_first = min(self.t_first, other.t_first)
+        self.t_last = max(self.t_last, other.t_last)
+        for t in TYPOLOGIES:
+            self.counts_sum[t] += other.counts_sum[t]
+            self.counts_max[t] = max(self.counts_max[t], other.counts_max[t])
+        return self
+
+    @property
+    def mean_density(self) -> float:
+        return self.density_sum / self.frames if self.frames else 0.0
+
+    @property
+    def mean_occupancy(self) -> float:
+        return self.occupancy_sum / self.frames if self.frames else 0.0
+
+    def mean_counts(self) -> Dict[str, float]:
+        """Vehículos por frame de cada tipología (media en la ventana)."""
+        return {t: (n / self.frames if self.frames else 0.0) for t, n in self.counts_sum.items()}
+
+    def to_row(self, scene_id: str, run_id: str, window_start: float, window_s: float) -> List[object]:
+        return [
+            scene_id,
+            run_id,
+            repr(window_start),
+            repr(window_s),
+            self.frames,
+            self.detections,
+            repr(self.density_sum),
+            repr(self.density_max),
+            repr(self.occupancy_sum),
+            repr(self.occupancy_max),
+            repr(self.t_first),
+            repr(self.t_last),
+            *(self.counts_sum[t] for t in TYPOLOGIES),
+            *(self.counts_max[t] for t in TYPOLOGIES),
+        ]
+
+    @classmethod
+    def from_row(cls, row: Dict[str, str]) -> "WindowStats":
+        return cls(
+            frames=int(row["frames"]),
+            detections=int(row["detections"]),
+            density_sum=float(row["density_sum"]),
+            density_max=float(row["density_max"]),
+            occupancy_sum=float(row["occupancy_sum"]),
+            occupancy_max=float(row["occupancy_max"]),
+            t_first=float(row["t_first"]),
+            t_last=float(row["t_last"]),
+            counts_sum={t: int(row[f"sum_{t}"]) for t in TYPOLOGIES},
+            counts_max={t: int(row[f"max_{t}"]) for t in TYPOLOGIES},
+        )
+
+
+@dataclass(frozen=True)
+class WindowRow:
+    scene_id: str
+    run_id: str  # "" si la ventana es de fechas (created_at_utc): esas no se repiten entre runs
+    window_start: float
+    window_s: float
+    stats: WindowStats
+
+    def summary(self) -> Dict[str, object]:
+        s = self.stats
+        return {
+            "scene_id": self.scene_id,
+            "run_id": self.run_id,
+            "window_start": format_window_start(self.window_start),
+            "window_s": self.window_s,
+            "frames": s.frames,
+            "mean_density": round(s.mean_density, 4),
+            "peak_density": round(s.density_max, 4),
+            "mean_occupancy": round(s.mean_occupancy, 6),
+            "peak_occupancy": round(s.occupancy_max, 6),
+            **{f"mean_{t}": round(v, 3) for t, v in s.mean_counts().items()},
+            **{f"peak_{t}": n for t, n in s.counts_max.items()},
+        }
+
+
+class TrafficRollup:
+    """
+    Agregados por escena y ventana de tiempo (window_s) que se actualizan con cada evidencia (add), sin releer JSON.
+    Los tiempos relativos (posición en un vídeo o en la escena con --fps) empiezan en 0 en cada run: sus filas
+    llevan además run_id (uno por TrafficRollup, p.ej. por ejecución de la CLI), así que repetir una escena (otro
+    YOLO_CONF, otra pasada) abre filas nuevas en vez de sumar sus frames a las del run anterior. Las ventanas de
+    fechas (created_at_utc) no se solapan entre runs y van con run_id "".
+    La memoria es O(ventanas abiertas), no O(frames): con `path`, al superar max_open_windows las ventanas más
+    antiguas se añaden al fichero (CSV append-only de filas combinables) y salen de memoria; flush() vuelca el resto.
+    windows() combina fichero + memoria y re-agrega a ventanas más largas (múltiplos de window_s) bajo demanda.
+    Sin path todo queda en memoria (runs cortos).
+    """
+
+    def __init__(
+        self,
+        window_s: float = 60.0,
+        *,
+        path: Optional[Path] = None,
+        max_open_windows: int = 4096,
+        run_id: Optional[str] = None,
+    ) -> None:
+        if window_s <= 0:
+            raise ValueError("window_s debe ser > 0")
+        self.window_s = float(window_s)
+        self.path = path
+        self.max_open_windows = max(1, int(max_open_windows))
+        self.run_id = run_id or new_run_id()
+        self._lock = threading.Lock()
+        self._open: Dict[Key, WindowStats] = {}
+        self._header_checked = False
+
+    def _window_start(self, t: float) -> float:
+        return math.floor(t / self.window_s) * self.window_s
+
+    def add_metrics(self, scene_id: Optional[str], metrics: Metrics, t: float) -> None:
+        key = (scene_id or "unknown_scene", self.run_id if t < EPOCH_MIN_S else "", self._window_start(t))
+        with self._lock:
+            stats = self._open.get(key)
+            if stats is None:
+                stats = self._open[key] = WindowStats()
+            stats.add(metrics, t)
+            if self.path is not None and len(self._open) > self.max_open_windows:
+                self._spill(len(self._open) // 2)
+
+    def window_of(self, evidence: Evidence) -> float:
+        """Inicio de la ventana base en la que cae la evidencia."""
+        return self._window_start(evidence_time_s(evidence))
+
+    def add(self, evidence: Evidence, t: Optional[float] = None) -> None:
+        """t por defecto: evidence_time_s (posición en el vídeo o created_at_utc)."""
+        self.add_metrics(evidence.scene.scene_id, evidence.metrics, evidence_time_s(evidence) if t is None else t)
+
+    def _spill(self, n: int) -> None:
+        # las n ventanas más antiguas al fichero; si llega otro frame suyo se abre una fila nueva (se combina al leer)
+        oldest = sorted(self._open, key=lambda k: k[2])[:n]
+        self._append_rows([(k, self._open.pop(k)) for k in oldest])
+
+    def _upgrade_header(self) -> None:
+        # ficheros anteriores a run_id: se reescriben una vez con la columna vacía (eran todos de un mismo "run")
+        assert self.path is not None
+        self._header_checked = True
+        with self.path.open("r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            if tuple(reader.fieldnames or ()) == TABLE_COLUMNS:
+                return
+            rows = [[row.get(c) or "" for c in TABLE_COLUMNS] for row in reader]
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, lineterminator="\n")
+            w.writerow(TABLE_COLUMNS)
+            w.writerows(rows)
+        tmp.replace(self.path)
+
+    def _append_rows(self, items: List[Tuple[Key, WindowStats]]) -> None:
+        assert self.path is not None
+        if not items:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        if not new and not self._header_checked:
+            self._upgrade_header()
+        with self.path.open("a", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, lineterminator="\n")
+            if new:
+                w.writerow(TABLE_COLUMNS)
+            w.writerows(stats.to_row(scene, run, start, self.window_s) for (scene, run, start), stats in items)
+
+    def flush(self) -> None:
+        """Vuelca al fichero todas las ventanas en memoria (sin path no hace nada)."""
+        if self.path is None:
+            return
+        with self._lock:
+            self._append_rows(sorted(self._open.items(), key=lambda kv: kv[0]))
+            self._open.clear()
+
+    def _iter_table(
+        self, others: Optional[List[Dict[str, str]]] = None
+    ) -> Iterator[Tuple[str, str, float, WindowStats]]:
+        if self.path is None or not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                if float(row["window_s"]) != self.window_s:
+                    if others is not None:
+                        others.append(row)
+                    continue  # otra resolución en el mismo fichero: no se mezcla
+                yield row["scene_id"], row.get("run_id") or "", float(row["window_start"]), WindowStats.from_row(row)
+
+    def _iter_all(self) -> Iterator[Tuple[str, str, float, WindowStats]]:
+        yield from self._iter_table()
+        with self._lock:
+            snapshot = [(scene, run, start, stats) for (scene, run, start), stats in self._open.items()]
+        yield from snapshot
+
+    def windows(
+        self,
+        *,
+        scene_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        window_s: Optional[float] = None,
+    ) -> List[WindowRow]:
+        """
+        Ventanas de [start, end) (segundos, misma base que add), opcionalmente re-agregadas a window_s
+        (múltiplo de self.window_s; p.ej. 3600 sobre una base de 60). Ordenadas por escena, run y tiempo.
+        Lee el fichero en streaming: la memoria es O(ventanas del resultado).
+        """
+        return self._aggregate(
+            self._iter_all(), scene_id=scene_id, run_id=run_id, start=start, end=end, window_s=window_s
+        )
+
+    def _aggregate(
+        self,
+        items: Iterable[Tuple[str, str, float, WindowStats]],
+        *,
+        scene_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        window_s: Optional[float] = None,
+    ) -> List[WindowRow]:
+        target = float(window_s or self.window_s)
+        ratio = target / self.window_s
+        if ratio < 1 or abs(ratio - round(ratio)) > 1e-9:
+            raise ValueError(f"window_s={target} debe ser múltiplo de la ventana base {self.window_s}")
+        out: Dict[Key, WindowStats] = {}
+        for scene, run, w_start, stats in items:
+            if (scene_id is not None and scene != scene_id) or (run_id is not None and run != run_id):
+                continue
+            if (start is not None and w_start + self.window_s <= start) or (end is not None and w_start >= end):
+                continue
+            key = (scene, run, math.floor(w_start / target) * target)
+            acc = out.get(key)
+            if acc is None:
+                out[key] = WindowStats().merge(stats)
+            else:
+                acc.merge(stats)
+        return [WindowRow(scene, run, w, target, s) for (scene, run, w), s in sorted(out.items())]
+
+    def compact(self) -> int:
+        """Reescribe el fichero con una fila por (escena, run, ventana) combinando los deltas. Devuelve nº de filas."""
+        if self.path is None:
+            return 0
+        self.flush()
+        with self._lock:
+            # solo el fichero: lo que llegue mientras tanto se queda en memoria para el siguiente flush
+            others: List[Dict[str, str]] = []
+            rows = self._aggregate(self._iter_table(others))
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with tmp.open("w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f, lineterminator="\n")
+                w.writerow(TABLE_COLUMNS)
+                w.writerows(r.stats.to_row(r.scene_id, r.run_id, r.window_start, r.window_s) for r in rows)
+                w.writerows([row.get(c) or "" for c in TABLE_COLUMNS] for row in others)
+            self._header_checked = True
+            tmp.replace(self.path)
+        return len(rows)
+
+
+def save_window_summary(path: Path, rows: Iterable[WindowRow]) -> None:
+    """Tabla legible (medias y picos por ventana) para informes: CSV, una fila por escena y ventana."""
+    rows = list(rows)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        if not rows:
+            return
+        first = rows[0].summary()
+        w.writerow(list(first))
+        w.writerows(list(r.summary().values()) for r in rows)
+
+
+def rollup_from_settings(s: AppSettings, *, run_id: Optional[str] = None) -> Optional[TrafficRollup]:
+    """ROLLUP_WINDOW_S <= 0 desactiva los agregados. run_id por defecto: uno nuevo (fecha UTC + pid)."""
+    if s.rollup_window_s <= 0:
+        return None
+    return TrafficRollup(s.rollup_window_s, path=s.rollup_path, run_id=run_id)
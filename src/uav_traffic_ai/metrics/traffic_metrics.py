@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 from collections import Counter
-from typing import List
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
 
 from uav_traffic_ai.schemas import Detection, Metrics
+from uav_traffic_ai.vision.detections import DetectionArrays
 
 
 def _bbox_area(d: Detection) -> float:
@@ -12,16 +15,33 @@ def _bbox_area(d: Detection) -> float:
     return w * h
 
 
-def compute_metrics(detections: List[Detection], image_w: int, image_h: int) -> Metrics:
-    class_counts = Counter([d.cls_name for d in detections])
-    typology_counts = Counter([d.typology for d in detections])
+def _counts_by(table: Sequence[str], cls: np.ndarray) -> Dict[str, int]:
+    out: Counter = Counter()
+    for i, c in enumerate(np.bincount(cls, minlength=len(table)).tolist()):
+        if c:
+            out[table[i]] += c
+    return dict(out)
 
-    img_area = float(max(1, image_w * image_h))
-    occ = sum(_bbox_area(d) for d in detections) / img_area
 
+def compute_metrics(
+    detections: Union[List[Detection], DetectionArrays], image_w: int, image_h: int
+) -> Metrics:
+    img_area = float(max(1, image_w * image_h))
     megapixels = img_area / 1_000_000.0
     density = (len(detections) / megapixels) if megapixels > 0 else 0.0
 
+    if isinstance(detections, DetectionArrays):
+        # cumsum suma en orden, como sum() sobre la lista: mismo float y por tanto mismo sha256
+        # (np.sum usa suma por pares y puede diferir en el último bit)
+        areas = detections.areas()
+        occ = (float(np.cumsum(areas)[-1]) if len(areas) else 0) / img_area
+        class_counts = _counts_by(detections.names, detections.cls)
+        typology_counts = _counts_by(detections.typologies, detections.cls)
+    else:
+        class_counts = Counter([d.cls_name for d in detections])
+        typology_counts = Counter([d.typology for d in detections])
+        occ = sum(_bbox_area(d) for d in detections) / img_area
+
     return Metrics(
         counts_by_typology=dict(typology_counts),
         counts_by_class=dict(class_counts),
@@ -1,96 +1,551 @@
 from __future__ import annotations
 
+import os
 import time  # Añadido para el sleep del retry
+from dataclasses import replace as dc_replace
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
 
-from uav_traffic_ai.schemas import Evidence, SceneMeta
-from uav_traffic_ai.ingest.media import encode_png_bytes, image_size
+import numpy as np
+
+from uav_traffic_ai.cache import CachedResult, ResultCache
+from uav_traffic_ai.schemas import Detection, Evidence, FrameSource, SceneMeta
+from uav_traffic_ai.ingest.dedup import FrameDeduper
+from uav_traffic_ai.ingest.media import PNG, ImageEncoding, encode_image_bytes, image_size, read_image_bgr
+from uav_traffic_ai.ingest.stream import StreamFrame
 from uav_traffic_ai.metrics.traffic_metrics import compute_metrics
-from uav_traffic_ai.reporting.exporter import ensure_dirs, save_detections_csv, save_json
-from uav_traffic_ai.reporting.hashing import sha256_hex, stable_json_dumps
-from uav_traffic_ai.vision.detector import YoloDetector
+from uav_traffic_ai.profiling import count, default_profiler, evidence_timings_ms, timer
+from uav_traffic_ai.reporting.exporter import detection_rows, ensure_dirs, save_detection_rows, save_json_bytes
+from uav_traffic_ai.reporting.hashing import canonical_json_bytes, canonical_object_chunks, sha256_hex_chunks
+from uav_traffic_ai.reporting.catalog import EvidenceCatalog
+from uav_traffic_ai.reporting.run_store import RunStore
+from uav_traffic_ai.vision.detections import DetectionArrays
+from uav_traffic_ai.vision.detector import Detector, draw_detections
 from uav_traffic_ai.blockchain.bsv_anchor import anchor_sha256_opreturn
+from uav_traffic_ai.blockchain.merkle import BATCH_PREFIX, MerkleProof, build_merkle, save_proof
 from uav_traffic_ai.blockchain.verify import verify_sha256_in_tx_opreturn
 
+T = TypeVar("T")
 
-def _evidence_payload_for_hash(e: Evidence) -> Dict[str, Any]:
-    # mode="json" convierte datetime/UUID/etc a tipos JSON-compatibles
-    d = e.model_dump(mode="json")
+_OPTIONAL_HASHED_FIELDS = ("source", "reused_from")
+# bsv_chain con el que se calcula el hash: el anclaje lo sobrescribe después con la red real (main/test)
+HASHED_BSV_CHAIN = "test"
+
+
+def _drop_unhashed(d: Dict[str, Any]) -> Dict[str, Any]:
     d.pop("txid", None)
     d.pop("verified", None)
+    d.pop("timings", None)
+    # Campos opcionales añadidos después de v1: si no se usan no entran en el payload,
+    # así el hash de una evidencia sin ellos es el mismo que antes de existir.
+    for k in _OPTIONAL_HASHED_FIELDS:
+        if d.get(k) is None:
+            d.pop(k, None)
     return d
 
 
-def run_analysis_on_image(
+def _evidence_payload_for_hash(
+    e: Evidence, detection_records: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Payload del hash como dict (referencia; evidence_sha256 calcula lo mismo sin construirlo entero)."""
+    # mode="json" convierte datetime/UUID/etc a tipos JSON-compatibles
+    if detection_records is None:
+        d = e.model_dump(mode="json")
+    else:
+        # mismas claves y valores que model_dump de cada Detection, sin volver a recorrer los modelos
+        d = e.model_dump(mode="json", exclude={"detections"})
+        d["detections"] = detection_records
+    return _drop_unhashed(d)
+
+
+def _detections_json(e: Evidence, detection_records: Optional[List[Dict[str, Any]]] = None) -> bytes:
+    # Las cajas son casi todo el documento: se serializan una vez y se reutilizan mientras la lista sea la misma
+    # (modificar las cajas en sitio tras build_evidence invalidaría también el sha256: no se hace)
+    cached = e._detections_json
+    if cached is not None and cached[0] is e.detections:
+        return cached[1]
+    if detection_records is None:
+        detection_records = e.model_dump(mode="json", include={"detections"})["detections"]
+    data = canonical_json_bytes(detection_records)
+    e._detections_json = (e.detections, data)
+    return data
+
+
+def _evidence_chunks(
+    e: Evidence, *, for_hash: bool, detection_records: Optional[List[Dict[str, Any]]] = None
+) -> Iterator[bytes]:
+    d = e.model_dump(mode="json", exclude={"detections"})
+    if for_hash:
+        d = _drop_unhashed(d)
+    fields = {k: canonical_json_bytes(v) for k, v in d.items()}
+    fields["detections"] = _detections_json(e, detection_records)
+    return canonical_object_chunks(fields)
+
+
+def evidence_sha256(e: Evidence, detection_records: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    sha256 del JSON determinista de la evidencia, igual byte a byte que
+    sha256_hex(stable_json_dumps(_evidence_payload_for_hash(e))) (ver scripts/check_evidence_hashes.py).
+    El campo sha256 entra tal cual en el payload: para re-verificar, ponerlo a "" antes.
+    """
+    with timer("reporting.hash"):
+        return sha256_hex_chunks(_evidence_chunks(e, for_hash=True, detection_records=detection_records))
+
+
+def recompute_evidence_sha256(e: Evidence) -> str:
+    """
+    sha256 del contenido tal como está ahora, con sha256="" y bsv_chain=HASHED_BSV_CHAIN como en build_evidence (el
+    anclaje cambia bsv_chain después de calcular el hash). Distinto de e.sha256 = el JSON se editó después de
+    generarlo: la prueba Merkle y el OP_RETURN no dicen nada de ese contenido.
+    """
+    return evidence_sha256(e.model_copy(update={"sha256": "", "bsv_chain": HASHED_BSV_CHAIN}))
+
+
+def evidence_json_bytes(e: Evidence) -> bytes:
+    """Contenido de <prefix>.json: stable_json_dumps(e.model_dump(mode="json")) reutilizando las cajas ya serializadas."""
+    return b"".join(_evidence_chunks(e, for_hash=False))
+
+
+def build_evidence(
     *,
+    detections: Union[List[Detection], DetectionArrays],
     img_bgr,
     scene: SceneMeta,
-    detector: YoloDetector,
     model_weights: str,
-) -> Tuple[Evidence, bytes]:
-    det_res = detector.detect_image(img_bgr)
+    created_at: Optional[datetime] = None,
+    source: Optional[FrameSource] = None,
+    reused_from: Optional[str] = None,
+) -> Evidence:
     w, h = image_size(img_bgr)
-    metrics = compute_metrics(det_res.detections, w, h)
+    with timer("metrics.compute"):
+        metrics = compute_metrics(detections, w, h)
+    records = None
+    if isinstance(detections, DetectionArrays):
+        # único punto donde las columnas pasan a modelos del schema
+        records = detections.to_records()
+        detections = detections.to_detections(records)
 
-    created_at = datetime.now(timezone.utc)
+    # created_at forma parte del hash: fijarlo permite reproducir el mismo sha256 (p.ej. serial vs sharded)
+    created_at = created_at or datetime.now(timezone.utc)
     evidence = Evidence(
         created_at_utc=created_at,
         model_weights=model_weights,
         scene=scene,
         image_width=w,
         image_height=h,
-        detections=det_res.detections,
+        detections=detections,
         metrics=metrics,
+        source=source,
+        reused_from=reused_from,
         sha256="",  # se rellena tras calcular hash
-        bsv_chain="test",
+        bsv_chain=HASHED_BSV_CHAIN,
     )
 
-    payload = _evidence_payload_for_hash(evidence)
-    evidence.sha256 = sha256_hex(stable_json_dumps(payload))
+    evidence.sha256 = evidence_sha256(evidence, records)
+    return evidence
+
+
+def detector_cache_key(cache: ResultCache, img_bgr: np.ndarray, detector: Detector) -> str:
+    return cache.key_for(
+        img_bgr, weights=detector.weights, conf=detector.conf, iou=detector.iou, extra=detector.cache_tag
+    )
+
+
+def encode_annotated(
+    *,
+    img_bgr: np.ndarray,
+    detections: DetectionArrays,
+    annotated_bgr: Optional[np.ndarray],
+    cached_png: Optional[bytes],
+    annotate: Optional[ImageEncoding],
+) -> Optional[bytes]:
+    """
+    Imagen anotada en el formato pedido, o None en modo headless (annotate=None).
+    Reutiliza el PNG de la caché si sirve; si el detector no la dibujó (hit de caché guardado sin imagen),
+    se dibuja aquí a partir de las detecciones.
+    """
+    if annotate is None:
+        return None
+    if cached_png is not None and annotate.fmt == "png":
+        return cached_png
+    if annotated_bgr is None:
+        annotated_bgr = draw_detections(img_bgr, detections)
+    return encode_image_bytes(annotated_bgr, annotate)
 
-    annotated_png = encode_png_bytes(det_res.annotated_bgr)
-    return evidence, annotated_png
+
+def cacheable_png(image: Optional[bytes], annotate: Optional[ImageEncoding]) -> Optional[bytes]:
+    # ResultCache solo guarda PNG (sin pérdida); con jpg/webp o headless la entrada lleva solo detecciones
+    return image if annotate is not None and annotate.fmt == "png" else None
+
+
+def run_analysis_on_image(
+    *,
+    img_bgr,
+    scene: SceneMeta,
+    detector: Detector,
+    model_weights: str,
+    created_at: Optional[datetime] = None,
+    cache: Optional[ResultCache] = None,
+    annotate: Optional[ImageEncoding] = PNG,
+) -> Tuple[Evidence, Optional[bytes]]:
+    return run_analysis_on_batch(
+        frames=[img_bgr],
+        scene=scene,
+        detector=detector,
+        model_weights=model_weights,
+        created_at=created_at,
+        cache=cache,
+        annotate=annotate,
+    )[0]
+
+
+def run_analysis_on_batch(
+    *,
+    frames: Sequence[np.ndarray],
+    scene: SceneMeta,
+    detector: Detector,
+    model_weights: str,
+    created_at: Optional[datetime] = None,
+    cache: Optional[ResultCache] = None,
+    sources: Optional[Sequence[Optional[FrameSource]]] = None,
+    annotate: Optional[ImageEncoding] = PNG,
+    deduper: Optional[FrameDeduper] = None,
+) -> List[Tuple[Evidence, Optional[bytes]]]:
+    """
+    Igual que run_analysis_on_image pero con una sola llamada de inferencia para todos los frames.
+    Devuelve un (Evidence, imagen anotada) por frame, en el mismo orden de entrada.
+    Con cache, los frames ya vistos (misma imagen + config del detector) no pasan por el modelo.
+    sources (opcional, uno por frame) se guarda en Evidence.source.
+    annotate=None no dibuja ni codifica la imagen (la segunda posición de cada tupla es None).
+    Con deduper (el de la escena/stream, que se mantiene entre lotes), los frames casi iguales al último inferido
+    no pasan ni por la caché ni por el modelo: reutilizan sus detecciones y lo indican en Evidence.reused_from.
+    Con PROFILE_EVIDENCE=1 cada evidencia lleva en timings sus etapas, con la parte común del lote
+    (caché, inferencia) repartida a partes iguales entre sus frames.
+    """
+    profiler = default_profiler()
+    keys: List[Optional[str]] = [None] * len(frames)
+    found: List[Optional[CachedResult]] = [None] * len(frames)
+    with profiler.collect() as shared:
+        reused = [deduper.check(img) for img in frames] if deduper is not None else [False] * len(frames)
+        todo = [i for i in range(len(frames)) if not reused[i]]
+        if cache is not None:
+            with timer("cache.lookup"):
+                for i in todo:
+                    keys[i] = detector_cache_key(cache, frames[i], detector)
+                    found[i] = cache.get(keys[i])
+
+        miss_idx = [i for i in todo if found[i] is None]
+        count("cache.miss" if cache is not None else "cache.off", len(miss_idx))
+        count("cache.hit", len(todo) - len(miss_idx))
+        draw = annotate is not None
+        if len(miss_idx) == 1:
+            det_results = [detector.detect_image(frames[miss_idx[0]], annotate=draw)]
+        else:
+            det_results = detector.detect_batch([frames[i] for i in miss_idx], annotate=draw)
+        drawn: Dict[int, Optional[np.ndarray]] = {}
+        for i, det_res in zip(miss_idx, det_results):
+            drawn[i] = det_res.annotated_bgr
+            png = None
+            if annotate is not None and annotate.fmt == "png":
+                png = encode_image_bytes(det_res.annotated_bgr, annotate)
+            found[i] = CachedResult(detections=det_res.arrays, annotated_png=png)
+            if cache is not None:
+                cache.put(keys[i], found[i].detections, png)
+    shared = {k: v / len(frames) for k, v in shared.items()} if frames else {}
+
+    out: List[Tuple[Evidence, Optional[bytes]]] = []
+    for i, (img_bgr, res) in enumerate(zip(frames, found)):
+        reused_from = None
+        if reused[i]:
+            # en orden: el keyframe de este duplicado ya pasó por remember() (en este lote o en uno anterior)
+            detections, reused_from = deduper.reuse()
+            res = CachedResult(detections=detections, annotated_png=None)
+        assert res is not None
+        with profiler.collect() as own:
+            evidence = build_evidence(
+                detections=res.detections,
+                img_bgr=img_bgr,
+                scene=scene,
+                model_weights=model_weights,
+                created_at=created_at,
+                source=sources[i] if sources is not None else None,
+                reused_from=reused_from,
+            )
+            if deduper is not None and not reused[i]:
+                deduper.remember(res.detections, evidence.sha256)
+            image = encode_annotated(
+                img_bgr=img_bgr,
+                detections=res.detections,
+                annotated_bgr=drawn.get(i),
+                cached_png=res.annotated_png,
+                annotate=annotate,
+            )
+        if profiler.evidence_timings:
+            # fuera del hash: se puede rellenar después de calcularlo
+            evidence.timings = evidence_timings_ms(shared, own)
+        out.append((evidence, image))
+    return out
+
+
+def iter_batches(items: Sequence[T], batch_size: int) -> Iterator[Sequence[T]]:
+    batch_size = max(1, int(batch_size))
+    for i in range(0, len(items), batch_size):
+        yield items[i : i + batch_size]
+
+
+def run_analysis_on_scene(
+    *,
+    frame_paths: Sequence[Path],
+    scene: SceneMeta,
+    detector: Detector,
+    model_weights: str,
+    batch_size: int = 8,
+    created_at: Optional[datetime] = None,
+    cache: Optional[ResultCache] = None,
+    annotate: Optional[ImageEncoding] = PNG,
+    decoded: Optional[Sequence[np.ndarray]] = None,
+    deduper: Optional[FrameDeduper] = None,
+) -> List[Tuple[Evidence, Optional[bytes]]]:
+    """
+    Procesa los frames de una escena (p.ej. list_scene_frames -> sample_frames) en lotes de batch_size.
+    Solo mantiene en memoria los frames decodificados del lote en curso.
+    decoded: los mismos frames ya decodificados (FrameCache, en el orden de frame_paths): no se llama a imread.
+    deduper: reutiliza las detecciones en frames casi iguales (ver run_analysis_on_batch).
+    """
+    out: List[Tuple[Evidence, Optional[bytes]]] = []
+    for batch_idx in iter_batches(range(len(frame_paths)), batch_size):
+        if decoded is not None:
+            frames = [np.asarray(decoded[i]) for i in batch_idx]
+        else:
+            frames = [read_image_bgr(frame_paths[i]) for i in batch_idx]
+        out.extend(
+            run_analysis_on_batch(
+                frames=frames,
+                scene=scene,
+                detector=detector,
+                model_weights=model_weights,
+                created_at=created_at,
+                cache=cache,
+                annotate=annotate,
+                deduper=deduper,
+            )
+        )
+    return out
+
+
+def run_analysis_on_stream(
+    *,
+    stream: Iterable[StreamFrame],
+    scene: SceneMeta,
+    detector: Detector,
+    model_weights: str,
+    artifacts_base: Path,
+    batch_size: int = 1,
+    cache: Optional[ResultCache] = None,
+    annotate: Optional[ImageEncoding] = PNG,
+    store: Optional[RunStore] = None,
+    catalog: Optional[EvidenceCatalog] = None,
+    deduper: Optional[FrameDeduper] = None,
+) -> Iterator[Tuple[Evidence, Dict[str, Path]]]:
+    """
+    Consume un FrameStream (vídeo o feed en vivo) y persiste una evidencia por frame entregado.
+    Es un generador: solo hay en memoria el lote en curso, independientemente de la duración.
+    batch_size=1 minimiza latencia en vivo; en ficheros un lote mayor mejora el throughput.
+    Con store, los frames se añaden al RunStore en vez de escribir ficheros sueltos en artifacts_base.
+    Con deduper, un dron en estacionario no pasa por el modelo en cada frame (ver run_analysis_on_batch).
+    """
+    batch: List[StreamFrame] = []
+
+    def flush() -> Iterator[Tuple[Evidence, Dict[str, Path]]]:
+        analysed = run_analysis_on_batch(
+            frames=[f.image for f in batch],
+            scene=scene,
+            detector=detector,
+            model_weights=model_weights,
+            cache=cache,
+            sources=[FrameSource(uri=f.source, frame_index=f.index, timestamp_s=f.timestamp_s) for f in batch],
+            annotate=annotate,
+            deduper=deduper,
+        )
+        for f, (evidence, annotated) in zip(batch, analysed):
+            stem = Path(f.source).stem if not f.source.isdigit() else f"cam{f.source}"
+            prefix = f"{scene.scene_id or 'stream'}_{stem}_f{f.index:06d}"
+            if store is not None:
+                paths = store_artifacts(
+                    store=store,
+                    evidence=evidence,
+                    annotated_image=annotated,
+                    prefix=prefix,
+                    encoding=annotate or PNG,
+                    catalog=catalog,
+                )
+            else:
+                paths = persist_artifacts(
+                    artifacts_base=artifacts_base,
+                    evidence=evidence,
+                    annotated_image=annotated,
+                    prefix=prefix,
+                    encoding=annotate or PNG,
+                    catalog=catalog,
+                )
+            yield evidence, paths
+
+    for frame in stream:
+        batch.append(frame)
+        if len(batch) >= max(1, batch_size):
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+
+def frame_prefixes(scene_id: Optional[str], frame_paths: Sequence[Path]) -> Dict[Path, str]:
+    """
+    Prefijo de artefactos de cada frame: <scene_id>_<stem>. Los directorios se recorren enteros (list_scene_frames,
+    resolve_path_frames), así que un frame en una subcarpeta lleva además su ruta relativa a la carpeta común del
+    run, con "__" entre componentes: dos frame_000001.jpg de carpetas distintas no se pisan los ficheros.
+    """
+    paths = [Path(p) for p in frame_paths]
+    if not paths:
+        return {}
+    root = Path(os.path.commonpath([str(p.parent) for p in paths]))
+    return {
+        p: f"{scene_id or 'batch'}_{'__'.join([*p.parent.relative_to(root).parts, p.stem])}" for p in paths
+    }
 
 
 def persist_artifacts(
     *,
     artifacts_base: Path,
     evidence: Evidence,
-    annotated_png: bytes,
+    annotated_image: Optional[bytes],
     prefix: str,
+    encoding: ImageEncoding = PNG,
+    catalog: Optional[EvidenceCatalog] = None,
 ) -> Dict[str, Path]:
-    dirs = ensure_dirs(artifacts_base)
+    """
+    Escribe JSON, CSV de detecciones, .sha256 y, si se generó, la imagen anotada
+    (annotated/<prefix><encoding.ext>, clave "image"). annotated_image=None no escribe imagen (headless).
+    Con catalog, registra la evidencia en el catálogo una vez escritos los ficheros.
+    """
+    with timer("reporting.persist"):
+        dirs = ensure_dirs(artifacts_base)
+
+        json_path = dirs["outputs"] / f"{prefix}.json"
+        csv_path = dirs["outputs"] / f"{prefix}_detections.csv"
+        hash_path = dirs["outputs"] / f"{prefix}.sha256"
+
+        # JSON + CSV
+        save_json_bytes(json_path, evidence_json_bytes(evidence))
+        save_detection_rows(csv_path, detection_rows(evidence.detections))
+
+        hash_path.write_text(evidence.sha256 + "\n", encoding="utf-8")
+        paths = {"json": json_path, "csv": csv_path, "sha256": hash_path}
+
+        # Image
+        if annotated_image is not None:
+            paths["image"] = dirs["annotated"] / f"{prefix}{encoding.ext}"
+            paths["image"].write_bytes(annotated_image)
+
+        if catalog is not None:
+            catalog.add(evidence, path=json_path, prefix=prefix)
+        return paths
+
+
+def store_artifacts(
+    *,
+    store: RunStore,
+    evidence: Evidence,
+    annotated_image: Optional[bytes],
+    prefix: str,
+    encoding: ImageEncoding = PNG,
+    catalog: Optional[EvidenceCatalog] = None,
+) -> Dict[str, Path]:
+    """Como persist_artifacts, pero añade el frame al RunStore del run (sin ficheros por frame)."""
+    with timer("reporting.run_store"):
+        store.append(
+            prefix=prefix,
+            sha256=evidence.sha256,
+            evidence_json=evidence_json_bytes(evidence),
+            detection_rows=detection_rows(evidence.detections),
+            image=annotated_image,
+            image_ext=encoding.ext,
+        )
+    if catalog is not None:
+        catalog.add(evidence, path=store.root, prefix=prefix)
+    return {"run": store.root}
 
-    json_path = dirs["outputs"] / f"{prefix}.json"
-    csv_path = dirs["outputs"] / f"{prefix}_detections.csv"
-    img_path = dirs["annotated"] / f"{prefix}.png"
-    hash_path = dirs["outputs"] / f"{prefix}.sha256"
 
-    # JSON + CSV
-    save_json(json_path, evidence.model_dump(mode="json"))
-    save_detections_csv(
-        csv_path,
+def export_run_store(
+    *,
+    store: RunStore,
+    artifacts_base: Path,
+    prefixes: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Path]]:
+    """
+    Regenera los ficheros por frame (JSON, CSV, .sha256, imagen y .merkle.json si se ancló por lote)
+    de un RunStore, idénticos a los que habría escrito persist_artifacts + persist_batch_anchor.
+    """
+    anchors = store.anchors()
+    out: List[Dict[str, Path]] = []
+    for entry in store.entries(prefixes):
+        evidence = Evidence.model_validate_json(store.read_evidence_json(entry))
+        anchor = anchors.get(entry.sha256)
+        if anchor is not None:
+            evidence.txid = anchor["txid"]
+            evidence.verified = anchor["verified"]
+            evidence.bsv_chain = anchor["bsv_chain"]
+        paths = persist_artifacts(
+            artifacts_base=artifacts_base,
+            evidence=evidence,
+            annotated_image=store.read_image(entry),
+            prefix=entry.prefix,
+            encoding=ImageEncoding(fmt=entry.image_ext.lstrip(".") or PNG.fmt),
+        )
+        if anchor is not None and anchor.get("proof"):
+            paths["merkle"] = save_proof(paths["json"], MerkleProof.from_dict(anchor["proof"]))
+        out.append(paths)
+    return out
+
+
+def store_batch_anchor(
+    *,
+    store: RunStore,
+    evidences: Sequence[Evidence],
+    proofs: Optional[Sequence[MerkleProof]] = None,
+    catalog: Optional[EvidenceCatalog] = None,
+) -> None:
+    """Equivalente a persist_batch_anchor para un RunStore: un registro por evidencia en anchors.jsonl."""
+    store.append_anchors(
         [
             {
-                "cls_name": d.cls_name,
-                "typology": d.typology,
-                "confidence": d.confidence,
-                "x1": d.bbox.x1,
-                "y1": d.bbox.y1,
-                "x2": d.bbox.x2,
-                "y2": d.bbox.y2,
+                "sha256": e.sha256,
+                "txid": e.txid,
+                "verified": e.verified,
+                "bsv_chain": e.bsv_chain,
+                "proof": proofs[i].to_dict() if proofs is not None else None,
             }
-            for d in evidence.detections
-        ],
+            for i, e in enumerate(evidences)
+        ]
     )
+    if catalog is not None:
+        catalog.set_anchors(evidences)
 
-    # Image
-    img_path.write_bytes(annotated_png)
-    hash_path.write_text(evidence.sha256 + "\n", encoding="utf-8")
 
-    return {"json": json_path, "csv": csv_path, "png": img_path, "sha256": hash_path}
+def persist_batch_anchor(
+    *,
+    evidences: Sequence[Evidence],
+    paths: Sequence[Dict[str, Path]],
+    proofs: Sequence[MerkleProof],
+    catalog: Optional[EvidenceCatalog] = None,
+) -> None:
+    """Re-guarda cada JSON con txid/verified y deja su prueba Merkle al lado (<prefix>.merkle.json)."""
+    for evidence, p, proof in zip(evidences, paths, proofs):
+        save_json_bytes(p["json"], evidence_json_bytes(evidence))
+        p["merkle"] = save_proof(p["json"], proof)
+    if catalog is not None:
+        catalog.set_anchors(evidences)
 
 
 def anchor_and_verify(
@@ -114,20 +569,60 @@ def anchor_and_verify(
     evidence.txid = r.txid
     evidence.bsv_chain = chain_name
 
+    evidence.verified = _verify_with_retries(
+        woc_base=woc_base, chain_name=chain_name, txid=evidence.txid, sha256_hex=evidence.sha256
+    )
+    return evidence
+
+
+def _verify_with_retries(*, woc_base: str, chain_name: str, txid: str, sha256_hex: str) -> bool:
     # WhatsOnChain puede tardar un momento en reflejar el OP_RETURN en mempool.
     # Intentamos verificar hasta 6 veces con pausas de 1s.
-    ok = False
-    for _ in range(6):  # ~6s total
-        v = verify_sha256_in_tx_opreturn(
-            woc_base=woc_base,
-            chain_name=chain_name,
-            txid=evidence.txid,
-            expected_sha256_hex=evidence.sha256,
-        )
-        if v.ok:
-            ok = True
-            break
-        time.sleep(1.0)
-    
-    evidence.verified = ok
-    return evidence
\ No newline at end of file
+    with timer("blockchain.confirm"):  # incluye las pausas: lo que espera el usuario tras emitir
+        for _ in range(6):  # ~6s total
+            v = verify_sha256_in_tx_opreturn(
+                woc_base=woc_base,
+                chain_name=chain_name,
+                txid=txid,
+                expected_sha256_hex=sha256_hex,
+            )
+            if v.ok:
+                return True
+            time.sleep(1.0)
+    return False
+
+
+def anchor_batch_and_verify(
+    *,
+    evidences: Sequence[Evidence],
+    chain_name: str,
+    wif: str,
+    dust_sats: int,
+    woc_base: str,
+    scene_id: Optional[str] = None,
+) -> Tuple[List[Evidence], List[MerkleProof]]:
+    """
+    Ancla un lote con una sola tx: construye un árbol Merkle sobre los sha256 de todas las evidencias
+    y publica solo la raíz (prefijo UAVTAIMR_V1). Cada evidencia recibe el txid del lote y su prueba
+    de inclusión, que permite verificarla sin red (salvo una consulta por lote).
+    """
+    root, proofs = build_merkle([e.sha256 for e in evidences])
+    first = evidences[0]
+    r = anchor_sha256_opreturn(
+        chain_name=chain_name,
+        wif=wif,
+        dust_sats=dust_sats,
+        scene_id=scene_id or first.scene.scene_id or "unknown_scene",
+        sha256_hex=root,
+        model=first.model_weights,
+        created_at_utc=max(e.created_at_utc for e in evidences),
+        prefix=BATCH_PREFIX,
+    )
+    ok = _verify_with_retries(woc_base=woc_base, chain_name=chain_name, txid=r.txid, sha256_hex=root)
+
+    for e in evidences:
+        e.txid = r.txid
+        e.bsv_chain = chain_name
+        e.verified = ok
+    proofs = [dc_replace(p, txid=r.txid, bsv_chain=chain_name) for p in proofs]
+    return list(evidences), proofs
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from uav_traffic_ai.settings import AppSettings
+
+PROMETHEUS_PREFIX = "uav_traffic_ai"
+
+
+@dataclass
+class StageStats:
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+    def add(self, count: int, total_s: float, max_s: float) -> None:
+        self.count += count
+        self.total_s += total_s
+        self.max_s = max(self.max_s, max_s)
+
+
+class _NullTimer:
+    """Lo que devuelve timer() con el profiler apagado: un objeto compartido que no mide nada."""
+
+    __slots__ = ()
+    elapsed = 0.0
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("_profiler", "_name", "_t0", "elapsed")
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self._profiler = profiler
+        self._name = name
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.elapsed = time.perf_counter() - self._t0
+        self._profiler.record(self._name, self.elapsed)
+
+
+class Profiler:
+    """
+    Tiempos por etapa (ingest.decode, vision.infer, reporting.hash, blockchain.anchor...) y contadores del proceso.
+    Apagado, timer() devuelve siempre el mismo objeto vacío y count() vuelve sin tocar nada, así que los puntos de
+    medida se pueden dejar en el código caliente. Las etapas se pueden anidar (p.ej. vision.plot dentro de
+    vision.infer): cada una suma su propio tiempo de pared, no son exclusivas.
+    collect() recoge además, por hilo, lo que se mide dentro del bloque (tiempos de una evidencia concreta).
+    """
+
+    def __init__(self, *, enabled: bool = False, evidence_timings: bool = False) -> None:
+        self.enabled = enabled
+        self.evidence_timings = evidence_timings
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stages: Dict[str, StageStats] = {}
+        self._counters: Dict[str, float] = {}
+        self.started_at = time.time()
+
+    def configure(self, *, enabled: bool, evidence_timings: bool = False) -> "Profiler":
+        self.enabled = enabled or evidence_timings
+        self.evidence_timings = evidence_timings
+        return self
+
+    def timer(self, name: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def count(self, name: str, n: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def record(self, name: str, elapsed_s: float) -> None:
+        with self._lock:
+            st = self._stages.get(name)
+            if st is None:
+                st = self._stages[name] = StageStats()
+            st.add(1, elapsed_s, elapsed_s)
+        for sink in getattr(self._local, "sinks", ()):
+            sink[name] = sink.get(name, 0.0) + elapsed_s
+
+    @contextmanager
+    def collect(self) -> Iterator[Dict[str, float]]:
+        """Segundos por etapa medidos en este hilo dentro del bloque (vacío con el profiler apagado)."""
+        sink: Dict[str, float] = {}
+        if not self.enabled:
+            yield sink
+            return
+        sinks = getattr(self._local, "sinks", None)
+        if sinks is None:
+            sinks = self._local.sinks = []
+        sinks.append(sink)
+        try:
+            yield sink
+        finally:
+            sinks.remove(sink)
+
+    # --- export ---
+
+    def snapshot(self, *, clear: bool = False) -> Dict[str, Any]:
+        """
+        Estado como dict serializable. clear=True además lo vacía: es lo que cada worker del modo sharded devuelve
+        tras un shard para que el proceso principal lo sume con merge().
+        """
+        with self._lock:
+            snap = {"stages": {k: asdict(v) for k, v in self._stages.items()}, "counters": dict(self._counters)}
+            if clear:
+                self._stages.clear()
+                self._counters.clear()
+        return snap
+
+    def merge(self, snap: Dict[str, Any]) -> None:
+        with self._lock:
+            for name, st in snap.get("stages", {}).items():
+                self._stages.setdefault(name, StageStats()).add(st["count"], st["total_s"], st["max_s"])
+            for name, n in snap.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        snap = self.snapshot()
+        wall_s = time.time() - self.started_at
+        stages = {}
+        for name, st in sorted(snap["stages"].items(), key=lambda kv: -kv[1]["total_s"]):
+            stages[name] = {
+                **st,
+                "mean_ms": 1000 * st["total_s"] / st["count"] if st["count"] else 0.0,
+                "max_ms": 1000 * st["max_s"],
+                "share": st["total_s"] / wall_s if wall_s > 0 else 0.0,
+            }
+        return {"started_at": self.started_at, "wall_s": wall_s, "stages": stages, "counters": snap["counters"]}
+
+    def prometheus_text(self) -> str:
+        """Formato de exposición de Prometheus (vale para /metrics y para el textfile collector de node_exporter)."""
+        snap = self.snapshot()
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds Tiempo de pared por etapa del pipeline.",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        for name, st in sorted(snap["stages"].items()):
+            lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {st["total_s"]:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {st["count"]}')
+        lines += [f"# HELP {p}_stage_seconds_max Llamada más lenta por etapa.", f"# TYPE {p}_stage_seconds_max gauge"]
+        for name, st in sorted(snap["stages"].items()):
+            lines.append(f'{p}_stage_seconds_max{{stage="{name}"}} {st["max_s"]:.6f}')
+        lines += [f"# HELP {p}_events_total Contadores del pipeline.", f"# TYPE {p}_events_total counter"]
+        for name, n in sorted(snap["counters"].items()):
+            lines.append(f'{p}_events_total{{event="{name}"}} {n:g}')
+        return "\n".join(lines) + "\n"
+
+    def format_table(self) -> str:
+        summary = self.summary()
+        rows = [f"{'etapa':<28} {'llamadas':>9} {'total s':>9} {'media ms':>9} {'máx ms':>9} {'% pared':>8}"]
+        for name, st in summary["stages"].items():
+            rows.append(
+                f"{name:<28} {st['count']:>9} {st['total_s']:>9.3f} {st['mean_ms']:>9.2f} {st['max_ms']:>9.2f} "
+                f"{100 * st['share']:>7.1f}%"
+            )
+        for name, n in sorted(summary["counters"].items()):
+            rows.append(f"{name:<28} {n:>9g}")
+        return "\n".join(rows)
+
+    def save(self, out_dir: Path, run_name: str) -> Dict[str, Path]:
+        """<run_name>.json (resumen del run) y metrics.prom (último run, para el textfile collector)."""
+        out_dir.mkdir(parents=True, exist_ok=True)
+        paths = {"json": out_dir / f"{run_name}.json", "prometheus": out_dir / "metrics.prom"}
+        paths["json"].write_text(json.dumps({"run": run_name, **self.summary()}, indent=2), encoding="utf-8")
+        tmp = paths["prometheus"].with_suffix(".prom.tmp")
+        tmp.write_text(self.prometheus_text(), encoding="utf-8")
+        os.replace(tmp, paths["prometheus"])  # el collector nunca lee un fichero a medias
+        return paths
+
+
+# Un profiler por proceso: las etapas están repartidas por todo el paquete y no se pasa de función en función.
+_DEFAULT_PROFILER = Profiler()
+
+
+def default_profiler() -> Profiler:
+    return _DEFAULT_PROFILER
+
+
+def timer(name: str):
+    """with timer("vision.infer"): ... (no mide nada si el profiler está apagado)."""
+    return _DEFAULT_PROFILER.timer(name)
+
+
+def count(name: str, n: float = 1) -> None:
+    _DEFAULT_PROFILER.count(name, n)
+
+
+def evidence_timings_ms(*sinks: Dict[str, float]) -> Optional[Dict[str, float]]:
+    """
+    Lo que se guarda en Evidence.timings: ms por etapa sumando los sinks de collect() que tocan a un frame (p.ej. su
+    parte del lote y lo suyo propio), o None si no se piden tiempos por evidencia.
+    """
+    if not _DEFAULT_PROFILER.evidence_timings:
+        return None
+    total: Dict[str, float] = {}
+    for sink in sinks:
+        for k, v in sink.items():
+            total[k] = total.get(k, 0.0) + v
+    return {k: round(1000 * v, 3) for k, v in sorted(total.items())} or None
+
+
+def profiler_from_settings(s: AppSettings, *, enabled: Optional[bool] = None) -> Profiler:
+    """PROFILE=1 (o enabled=True, p.ej. --profile) enciende el profiler del proceso; PROFILE_EVIDENCE=1 también."""
+    return _DEFAULT_PROFILER.configure(
+        enabled=s.profile if enabled is None else enabled or s.profile, evidence_timings=s.profile_evidence
+    )
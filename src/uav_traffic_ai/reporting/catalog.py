@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from uav_traffic_ai.profiling import timer
+from uav_traffic_ai.reporting.run_store import ANCHORS_FILE, EVIDENCE_FILE, INDEX_FILE, RunStore
+from uav_traffic_ai.schemas import Evidence
+from uav_traffic_ai.settings import AppSettings
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # opcional: solo acelera el rebuild
+    _loads = json.loads
+
+EVIDENCE_SCHEMA = "uav_traffic_ai_evidence_v1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS evidence (
+    path TEXT NOT NULL,            -- JSON de la evidencia, o directorio del run store
+    prefix TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    scene_id TEXT,
+    scene_name TEXT,
+    created_at_utc TEXT NOT NULL,  -- ISO UTC de ancho fijo: se compara como texto
+    model_weights TEXT,
+    n_detections INTEGER NOT NULL,
+    source_uri TEXT,
+    frame_index INTEGER,
+    bsv_chain TEXT,
+    txid TEXT,
+    verified INTEGER,              -- NULL = sin anclar
+    PRIMARY KEY (path, prefix)
+);
+CREATE INDEX IF NOT EXISTS ix_evidence_scene_time ON evidence (scene_id, created_at_utc);
+CREATE INDEX IF NOT EXISTS ix_evidence_time ON evidence (created_at_utc);
+CREATE INDEX IF NOT EXISTS ix_evidence_verified ON evidence (verified, scene_id, created_at_utc);
+CREATE INDEX IF NOT EXISTS ix_evidence_sha256 ON evidence (sha256);
+CREATE INDEX IF NOT EXISTS ix_evidence_txid ON evidence (txid);
+CREATE TABLE IF NOT EXISTS typology_counts (
+    path TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    typology TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (path, prefix, typology)
+);
+CREATE INDEX IF NOT EXISTS ix_counts_typology ON typology_counts (typology, n);
+"""
+
+_COLUMNS = (
+    "path",
+    "prefix",
+    "sha256",
+    "scene_id",
+    "scene_name",
+    "created_at_utc",
+    "model_weights",
+    "n_detections",
+    "source_uri",
+    "frame_index",
+    "bsv_chain",
+    "txid",
+    "verified",
+)
+
+
+def iso_utc(value: Any) -> str:
+    """datetime o ISO 8601 (con Z u offset) -> 'YYYY-MM-DDTHH:MM:SS.ffffffZ' en UTC (ordenable como texto)."""
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def parse_since(text: str, now: Optional[datetime] = None) -> str:
+    """'7d', '24h', '30m' (hacia atrás desde ahora) o una fecha/hora ISO -> iso_utc."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([dhm])\s*", text)
+    if m:
+        unit = {"d": "days", "h": "hours", "m": "minutes"}[m.group(2)]
+        return iso_utc((now or datetime.now(timezone.utc)) - timedelta(**{unit: float(m.group(1))}))
+    return iso_utc(text)
+
+
+@dataclass(frozen=True)
+class CatalogRow:
+    values: Tuple[Any, ...]  # en el orden de _COLUMNS
+    counts: Dict[str, int]  # tipología -> nº de detecciones
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.values[0], self.values[1]
+
+
+def row_from_evidence(e: Evidence, *, path: Path, prefix: str) -> CatalogRow:
+    src = e.source
+    return CatalogRow(
+        values=(
+            str(path),
+            prefix,
+            e.sha256,
+            e.scene.scene_id,
+            e.scene.scene_name,
+            iso_utc(e.created_at_utc),
+            e.model_weights,
+            len(e.detections),
+            src.uri if src else None,
+            src.frame_index if src else None,
+            e.bsv_chain,
+            e.txid,
+            None if e.verified is None else int(e.verified),
+        ),
+        counts=dict(e.metrics.counts_by_typology),
+    )
+
+
+def row_from_dict(d: Dict[str, Any], *, path: Path, prefix: str) -> CatalogRow:
+    # lo mismo a partir del JSON guardado, sin validar con pydantic (rebuild de miles de ficheros)
+    scene = d.get("scene") or {}
+    src = d.get("source") or {}
+    verified = d.get("verified")
+    return CatalogRow(
+        values=(
+            str(path),
+            prefix,
+            d["sha256"],
+            scene.get("scene_id"),
+            scene.get("scene_name"),
+            iso_utc(d["created_at_utc"]),
+            d.get("model_weights"),
+            len(d.get("detections") or ()),
+            src.get("uri"),
+            src.get("frame_index"),
+            d.get("bsv_chain"),
+            d.get("txid"),
+            None if verified is None else int(verified),
+        ),
+        counts={str(k): int(v) for k, v in ((d.get("metrics") or {}).get("counts_by_typology") or {}).items()},
+    )
+
+
+class EvidenceCatalog:
+    """
+    Índice SQLite de las evidencias guardadas (ficheros por frame o run stores): escena, fecha, sha256, txid,
+    estado de verificación y conteos por tipología, para consultar sin abrir los JSON.
+    Lo actualizan persist_artifacts/store_artifacts al escribir y el código de anclaje al anclar/verificar;
+    `main.py catalog-rebuild` lo reconstruye desde un directorio de artefactos existente.
+    Los JSON siguen siendo la fuente de verdad: el catálogo se puede borrar y regenerar en cualquier momento.
+    WAL: varios procesos (CLI, UI, anchor-worker) pueden escribir a la vez.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- escritura ---
+
+    def add_rows(self, rows: Iterable[CatalogRow]) -> int:
+        """Inserta o reemplaza (misma ruta + prefijo) en una sola transacción."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        placeholders = ",".join("?" * len(_COLUMNS))
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                cur.executemany("DELETE FROM typology_counts WHERE path = ? AND prefix = ?", [r.key for r in rows])
+                cur.executemany(
+                    f"INSERT OR REPLACE INTO evidence ({','.join(_COLUMNS)}) VALUES ({placeholders})",
+                    [r.values for r in rows],
+                )
+                cur.executemany(
+                    "INSERT INTO typology_counts (path, prefix, typology, n) VALUES (?, ?, ?, ?)",
+                    [(*r.key, t, n) for r in rows for t, n in r.counts.items()],
+                )
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def add(self, evidence: Evidence, *, path: Path, prefix: str) -> None:
+        with timer("reporting.catalog"):
+            self.add_rows([row_from_evidence(evidence, path=path, prefix=prefix)])
+
+    def set_anchors(self, evidences: Sequence[Evidence]) -> None:
+        """txid/verified/bsv_chain tras anclar o re-verificar (todas las copias con ese sha256)."""
+        self.set_anchor_values(
+            [(e.txid, None if e.verified is None else int(e.verified), e.bsv_chain, e.sha256) for e in evidences]
+        )
+
+    def set_anchor_values(self, values: Sequence[Tuple[Optional[str], Optional[int], Optional[str], str]]) -> None:
+        # (txid, verified, bsv_chain, sha256)
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                cur.executemany("UPDATE evidence SET txid = ?, verified = ?, bsv_chain = ? WHERE sha256 = ?", values)
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+
+    def set_verified(self, sha256: str, verified: bool) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE evidence SET verified = ? WHERE sha256 = ?", (int(verified), sha256))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.executescript("DELETE FROM typology_counts; DELETE FROM evidence;")
+
+    # --- consulta ---
+
+    def query(
+        self,
+        *,
+        scene_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        sha256: Optional[str] = None,
+        txid: Optional[str] = None,
+        verified: Optional[bool] = None,
+        anchored: Optional[bool] = None,
+        min_counts: Optional[Dict[str, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Filtros combinados con AND. since/until en iso_utc (ver parse_since); verified=False incluye las no ancladas
+        y las que fallaron al verificar; min_counts={"heavy": 3} exige al menos 3 detecciones de esa tipología.
+        Devuelve dicts con las columnas del catálogo y `counts`, de más reciente a más antigua.
+        """
+        where: List[str] = []
+        params: List[Any] = []
+        for column, value in (("scene_id", scene_id), ("sha256", sha256), ("txid", txid)):
+            if value is not None:
+                where.append(f"e.{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("e.created_at_utc >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("e.created_at_utc < ?")
+            params.append(until)
+        if verified is True:
+            where.append("e.verified = 1")
+        elif verified is False:
+            where.append("(e.verified IS NULL OR e.verified = 0)")
+        if anchored is not None:
+            where.append("e.txid IS NOT NULL" if anchored else "e.txid IS NULL")
+        for typology, n in (min_counts or {}).items():
+            where.append(
+                "EXISTS (SELECT 1 FROM typology_counts c WHERE c.path = e.path AND c.prefix = e.prefix "
+                "AND c.typology = ? AND c.n >= ?)"
+            )
+            params.extend([typology, int(n)])
+
+        # conteos en la misma consulta (subconsulta por clave primaria); json_group_object es de SQLite >= 3.38
+        counts_sql = (
+            "(SELECT json_group_object(c.typology, c.n) FROM typology_counts c "
+            "WHERE c.path = e.path AND c.prefix = e.prefix)"
+        )
+        sql = f"SELECT {', '.join('e.' + c for c in _COLUMNS)}, {counts_sql} FROM evidence e"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY e.created_at_utc DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            result = self._conn.execute(sql, params).fetchall()
+        rows: List[Dict[str, Any]] = []
+        for *values, counts in result:
+            r = dict(zip(_COLUMNS, values))
+            r["verified"] = None if r["verified"] is None else bool(r["verified"])
+            r["counts"] = json.loads(counts) if counts else {}
+            rows.append(r)
+        return rows
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM evidence").fetchone()[0])
+
+
+# --- rebuild ---
+
+
+def _scan_json_files(paths: Sequence[str]) -> List[CatalogRow]:
+    rows: List[CatalogRow] = []
+    for p in paths:
+        try:
+            with open(p, "rb") as f:
+                d = _loads(f.read())
+        except (OSError, ValueError):
+            continue
+        if isinstance(d, dict) and d.get("schema_version") == EVIDENCE_SCHEMA:
+            path = Path(p)
+            rows.append(row_from_dict(d, path=path, prefix=path.stem))
+    return rows
+
+
+def _scan_run_chunk(root: str, spans: Sequence[Tuple[str, int, int]]) -> List[CatalogRow]:
+    # spans: (prefix, offset, size) en evidence.jsonl
+    rows: List[CatalogRow] = []
+    with open(Path(root) / EVIDENCE_FILE, "rb") as f:
+        for prefix, offset, size in spans:
+            f.seek(offset)
+            rows.append(row_from_dict(_loads(f.read(size)), path=Path(root), prefix=prefix))
+    return rows
+
+
+def _run_anchor_values(store: RunStore) -> List[Tuple[Optional[str], Optional[int], Optional[str], str]]:
+    return [
+        (a["txid"], None if a["verified"] is None else int(a["verified"]), a["bsv_chain"], sha)
+        for sha, a in store.anchors().items()
+    ]
+
+
+def rebuild_catalog(
+    catalog: EvidenceCatalog,
+    artifacts_dir: Path,
+    *,
+    workers: int = 0,
+    chunk_size: int = 256,
+) -> int:
+    """
+    Recorre artifacts_dir (JSON de evidencia en cualquier subdirectorio y run stores con index.jsonl) y rellena el
+    catálogo. El parseo se reparte entre `workers` procesos (0 = nº de CPUs); la escritura en SQLite es del proceso
+    llamante, en una transacción por trozo. No borra entradas previas (ver EvidenceCatalog.clear).
+    """
+    json_paths: List[str] = []
+    runs: List[Path] = []
+    for dirpath, dirnames, filenames in os.walk(artifacts_dir):
+        if INDEX_FILE in filenames and EVIDENCE_FILE in filenames:
+            runs.append(Path(dirpath))
+            dirnames[:] = []
+            continue
+        dirnames[:] = [d for d in dirnames if d not in {"cache", "queue"}]
+        json_paths.extend(
+            os.path.join(dirpath, f) for f in filenames if f.endswith(".json") and not f.endswith(".merkle.json")
+        )
+
+    tasks: List[Tuple[Any, ...]] = [
+        (_scan_json_files, json_paths[i : i + chunk_size]) for i in range(0, len(json_paths), chunk_size)
+    ]
+    stores = [RunStore(root, readonly=True) for root in runs]
+    for store in stores:
+        spans = [(e.prefix, e.evidence_offset, e.evidence_size) for e in store.entries()]
+        tasks.extend(
+            (_scan_run_chunk, str(store.root), spans[i : i + chunk_size]) for i in range(0, len(spans), chunk_size)
+        )
+
+    n = 0
+    n_workers = workers or os.cpu_count() or 1
+    if n_workers <= 1 or len(tasks) <= 1:
+        for fn, *fn_args in tasks:
+            n += catalog.add_rows(fn(*fn_args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(fn, *fn_args) for fn, *fn_args in tasks]
+            for fut in futures:
+                n += catalog.add_rows(fut.result())
+
+    # en los run stores el anclaje vive aparte (anchors.jsonl): se aplica después de insertar
+    for store in stores:
+        if (store.root / ANCHORS_FILE).exists():
+            catalog.set_anchor_values(_run_anchor_values(store))
+    return n
+
+
+def catalog_from_settings(s: AppSettings) -> Optional[EvidenceCatalog]:
+    """EVIDENCE_CATALOG_PATH=0 desactiva el catálogo."""
+    if s.evidence_catalog_path is None:
+        return None
+    return EvidenceCatalog(s.evidence_catalog_path)
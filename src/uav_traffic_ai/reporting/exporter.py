@@ -1,9 +1,9 @@
 from __future__ import annotations
 
+import csv
+import os
 from pathlib import Path
-from typing import Any, Dict, Tuple
-
-import pandas as pd
+from typing import IO, Any, Dict, Iterable, List, Sequence
 
 from uav_traffic_ai.reporting.hashing import stable_json_dumps
 
@@ -24,6 +24,40 @@ def save_json(path: Path, payload: Dict[str, Any]) -> None:
     path.write_text(text, encoding="utf-8")
 
 
+def save_json_bytes(path: Path, data: bytes) -> None:
+    # bytes ya canónicos (p.ej. pipeline.evidence_json_bytes): mismo contenido que save_json
+    path.write_bytes(data)
+
+
+DETECTION_COLUMNS = ("cls_name", "typology", "confidence", "x1", "y1", "x2", "y2")
+
+
+def detection_rows(detections: Iterable[Any]) -> List[List[Any]]:
+    """Filas del CSV de detecciones (columnas DETECTION_COLUMNS) a partir de Evidence.detections."""
+    return [[d.cls_name, d.typology, d.confidence, d.bbox.x1, d.bbox.y1, d.bbox.x2, d.bbox.y2] for d in detections]
+
+
+def csv_writer(f: IO[str]) -> Any:
+    return csv.writer(f, lineterminator=os.linesep)
+
+
+def write_csv_rows(writer: Any, rows: Iterable[Sequence[Any]]) -> None:
+    # mismo texto que DataFrame.to_csv: floats con repr y NaN como campo vacío (v != v solo es cierto para NaN)
+    writer.writerows([["" if v != v else v for v in r] for r in rows])
+
+
+def save_detection_rows(path: Path, rows: Sequence[Sequence[Any]], columns: Sequence[str] = DETECTION_COLUMNS) -> None:
+    # Mismos bytes que pd.DataFrame(rows).to_csv(path, index=False) (sin filas: solo un salto de línea)
+    # sin construir un DataFrame por frame
+    with path.open("w", encoding="utf-8", newline="") as f:
+        if not rows:
+            f.write(os.linesep)
+            return
+        w = csv_writer(f)
+        w.writerow(columns)
+        write_csv_rows(w, rows)
+
+
 def save_detections_csv(path: Path, detections_rows: list[dict]) -> None:
-    df = pd.DataFrame(detections_rows)
-    df.to_csv(path, index=False)
+    columns = list(detections_rows[0]) if detections_rows else []
+    save_detection_rows(path, [list(r.values()) for r in detections_rows], columns)
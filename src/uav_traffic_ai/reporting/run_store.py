@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import io
+import json
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence
+
+from uav_traffic_ai.reporting.exporter import DETECTION_COLUMNS, csv_writer, write_csv_rows
+from uav_traffic_ai.settings import AppSettings
+
+EVIDENCE_FILE = "evidence.jsonl"
+DETECTIONS_FILE = "detections.csv"
+IMAGES_FILE = "images.pack"
+INDEX_FILE = "index.jsonl"
+ANCHORS_FILE = "anchors.jsonl"
+
+
+@dataclass(frozen=True)
+class RunEntry:
+    """Una línea de index.jsonl: dónde está cada parte del frame dentro de los ficheros del run."""
+
+    prefix: str
+    sha256: str
+    evidence_offset: int
+    evidence_size: int
+    image_offset: int
+    image_size: int  # 0 = sin imagen anotada (headless)
+    image_ext: str
+    detections_offset: int  # filas de este frame en detections.csv (bytes)
+    detections_size: int
+    detections_count: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "prefix": self.prefix,
+            "sha256": self.sha256,
+            "evidence": [self.evidence_offset, self.evidence_size],
+            "image": [self.image_offset, self.image_size, self.image_ext],
+            "detections": [self.detections_offset, self.detections_size, self.detections_count],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "RunEntry":
+        return cls(
+            prefix=d["prefix"],
+            sha256=d["sha256"],
+            evidence_offset=d["evidence"][0],
+            evidence_size=d["evidence"][1],
+            image_offset=d["image"][0],
+            image_size=d["image"][1],
+            image_ext=d["image"][2],
+            detections_offset=d["detections"][0],
+            detections_size=d["detections"][1],
+            detections_count=d["detections"][2],
+        )
+
+
+class RunStore:
+    """
+    Almacén de un run completo en 5 ficheros append-only en lugar de 4 ficheros por frame:
+      evidence.jsonl   JSON canónico de cada evidencia (los mismos bytes que <prefix>.json), uno por línea
+      detections.csv   todas las cajas del run, con la columna prefix delante de las de <prefix>_detections.csv
+      images.pack      imágenes anotadas concatenadas
+      index.jsonl      RunEntry por frame: offsets en evidence.jsonl, images.pack y detections.csv
+      anchors.jsonl    txid/verified/prueba Merkle por sha256 (la evidencia no se reescribe al anclar)
+    Las escrituras se acumulan en memoria y se vuelcan cada flush_every frames. El índice se escribe el último:
+    al reabrir un run interrumpido se recortan los datos que quedaron sin indexar.
+    Los ficheros por frame se regeneran bajo demanda con pipeline.export_run_store.
+    readonly=True solo lee el índice (no recorta ni escribe): sirve con el run todavía abierto por otro proceso.
+    """
+
+    def __init__(self, root: Path, *, flush_every: int = 256, readonly: bool = False) -> None:
+        self.root = root
+        self.flush_every = max(1, int(flush_every))
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._entries: List[RunEntry] = []
+        self._pending: List[RunEntry] = []
+        self._evidence_buf = bytearray()
+        self._images_buf = bytearray()
+        self._csv_buf = bytearray()
+        self._csv_text = io.StringIO()
+        self._csv = csv_writer(self._csv_text)
+        self._files: Dict[str, BinaryIO] = {}
+        self._open()
+
+    # --- escritura ---
+
+    def _open(self) -> None:
+        index_path = self.root / INDEX_FILE
+        if self.readonly and not index_path.exists():
+            raise FileNotFoundError(f"No existe el run {self.root} ({INDEX_FILE})")
+        self.root.mkdir(parents=True, exist_ok=True)
+        index_end = 0
+        if index_path.exists():
+            with index_path.open("rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # línea a medias: volcado interrumpido
+                    self._entries.append(RunEntry.from_dict(json.loads(line)))
+                    index_end += len(line)
+        if self.readonly:
+            return
+        last = self._entries[-1] if self._entries else None
+        self._evidence_end = last.evidence_offset + last.evidence_size + 1 if last else 0
+        self._images_end = last.image_offset + last.image_size if last else 0
+        if last is not None:
+            self._csv_end = last.detections_offset + last.detections_size
+        else:
+            self._csv_end = len(self._csv_rows([("prefix",) + DETECTION_COLUMNS]))
+
+        self._files[EVIDENCE_FILE] = self._open_at(EVIDENCE_FILE, self._evidence_end)
+        self._files[IMAGES_FILE] = self._open_at(IMAGES_FILE, self._images_end)
+        self._files[INDEX_FILE] = self._open_at(INDEX_FILE, index_end)
+        self._files[DETECTIONS_FILE] = self._open_at(DETECTIONS_FILE, 0 if last is None else self._csv_end)
+        if last is None:
+            self._files[DETECTIONS_FILE].write(self._csv_rows([("prefix",) + DETECTION_COLUMNS]))
+
+    def _open_at(self, name: str, size: int) -> BinaryIO:
+        # recorta lo escrito después de la última entrada indexada y sigue añadiendo desde ahí
+        f = (self.root / name).open("r+b" if (self.root / name).exists() else "w+b")
+        f.truncate(size)
+        f.seek(size)
+        return f
+
+    def _csv_rows(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        self._csv_text.seek(0)
+        self._csv_text.truncate()
+        write_csv_rows(self._csv, rows)
+        return self._csv_text.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _index_line(entry: RunEntry) -> bytes:
+        return (json.dumps(entry.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+    def append(
+        self,
+        *,
+        prefix: str,
+        sha256: str,
+        evidence_json: bytes,
+        detection_rows: Sequence[Sequence[Any]],
+        image: Optional[bytes] = None,
+        image_ext: str = "",
+    ) -> RunEntry:
+        if self.readonly:
+            raise RuntimeError(f"Run {self.root} abierto en solo lectura")
+        with self._lock:
+            rows = self._csv_rows([(prefix, *r) for r in detection_rows])
+            entry = RunEntry(
+                prefix=prefix,
+                sha256=sha256,
+                evidence_offset=self._evidence_end,
+                evidence_size=len(evidence_json),
+                image_offset=self._images_end,
+                image_size=len(image) if image is not None else 0,
+                image_ext=image_ext if image is not None else "",
+                detections_offset=self._csv_end,
+                detections_size=len(rows),
+                detections_count=len(detection_rows),
+            )
+            self._evidence_buf += evidence_json
+            self._evidence_buf += b"\n"
+            self._evidence_end += len(evidence_json) + 1
+            if image is not None:
+                self._images_buf += image
+                self._images_end += len(image)
+            self._csv_buf += rows
+            self._csv_end += len(rows)
+            self._pending.append(entry)
+            self._entries.append(entry)
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+            return entry
+
+    def append_anchors(self, records: Sequence[Dict[str, Any]]) -> None:
+        """Registros {sha256, txid, verified, bsv_chain, proof} de un anclaje (un lote = una escritura)."""
+        lines = "".join(
+            json.dumps(r, ensure_ascii=False, sort_keys=True, separators=(",", ":")) + "\n" for r in records
+        )
+        with self._lock, (self.root / ANCHORS_FILE).open("a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        # datos antes que índice: una entrada indexada siempre tiene sus bytes en disco
+        self._files[EVIDENCE_FILE].write(self._evidence_buf)
+        self._files[IMAGES_FILE].write(self._images_buf)
+        self._files[DETECTIONS_FILE].write(self._csv_buf)
+        for name in (EVIDENCE_FILE, IMAGES_FILE, DETECTIONS_FILE):
+            self._files[name].flush()
+        self._files[INDEX_FILE].write(b"".join(self._index_line(e) for e in self._pending))
+        self._files[INDEX_FILE].flush()
+        self._evidence_buf.clear()
+        self._images_buf.clear()
+        self._csv_buf.clear()
+        self._pending.clear()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+
+    def __enter__(self) -> "RunStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # --- lectura ---
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self, prefixes: Optional[Sequence[str]] = None) -> List[RunEntry]:
+        if prefixes is None:
+            return list(self._entries)
+        wanted = set(prefixes)
+        return [e for e in self._entries if e.prefix in wanted]
+
+    def _read(self, name: str, offset: int, size: int) -> bytes:
+        self.flush()  # lo pendiente en memoria también se puede leer
+        with (self.root / name).open("rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def read_evidence_json(self, entry: RunEntry) -> bytes:
+        return self._read(EVIDENCE_FILE, entry.evidence_offset, entry.evidence_size)
+
+    def read_image(self, entry: RunEntry) -> Optional[bytes]:
+        if not entry.image_size:
+            return None
+        return self._read(IMAGES_FILE, entry.image_offset, entry.image_size)
+
+    def anchors(self) -> Dict[str, Dict[str, Any]]:
+        """sha256 -> último registro de anclaje (un re-anclaje o re-verificación posterior manda)."""
+        path = self.root / ANCHORS_FILE
+        out: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        out[record["sha256"]] = record
+        return out
+
+
+def run_store_from_settings(s: AppSettings, name: str) -> RunStore:
+    """Run en ARTIFACTS_DIR/runs/<name> (si ya existe se sigue añadiendo al final)."""
+    return RunStore(s.artifacts_dir / "runs" / name, flush_every=s.run_store_flush_frames)
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class BBox(BaseModel):
@@ -27,6 +27,12 @@ class SceneMeta(BaseModel):
     lon: Optional[float] = None
 
 
+class FrameSource(BaseModel):
+    uri: str  # fichero de vídeo, URL del stream o ruta de la imagen
+    frame_index: int
+    timestamp_s: float  # posición en la fuente
+
+
 class Metrics(BaseModel):
     counts_by_typology: Dict[str, int] = Field(default_factory=dict)
     counts_by_class: Dict[str, int] = Field(default_factory=dict)
@@ -34,6 +40,15 @@ class Metrics(BaseModel):
     occupancy_ratio: float = 0.0  # sum bbox areas / image area
 
 
+class FlowMetrics(BaseModel):
+    # Métricas multi-frame (tracking): cada vehículo se cuenta una sola vez
+    frames: int = 0
+    duration_s: float = 0.0
+    unique_counts_by_typology: Dict[str, int] = Field(default_factory=dict)
+    line_crossings: Dict[str, Dict[str, int]] = Field(default_factory=dict)  # línea -> tipología -> cruces
+    flow_per_minute: float = 0.0  # vehículos únicos / minuto
+
+
 class Evidence(BaseModel):
     schema_version: str = "uav_traffic_ai_evidence_v1"
 
@@ -47,9 +62,22 @@ class Evidence(BaseModel):
     detections: List[Detection]
     metrics: Metrics
 
+    # Posición en el vídeo/stream de origen (None para imágenes sueltas)
+    source: Optional[FrameSource] = None
+
+    # sha256 de la evidencia cuyas detecciones se reutilizaron (frame casi igual, sin inferencia). Entra en el hash
+    reused_from: Optional[str] = None
+
+    # ms por etapa del análisis de este frame (PROFILE_EVIDENCE=1). No entra en el hash: varía en cada ejecución
+    timings: Optional[Dict[str, float]] = None
+
     sha256: str  # sha256 del JSON determinista
 
     # Blockchain
     bsv_chain: str = "test"
     txid: Optional[str] = None
     verified: Optional[bool] = None
+
+    # JSON canónico de `detections` (la lista de la que salió, bytes): lo rellena pipeline.py para
+    # serializar las cajas una sola vez entre el hash y los ficheros. No forma parte del modelo.
+    _detections_json: Optional[Tuple[List[Detection], bytes]] = PrivateAttr(default=None)
@@ -0,0 +1,477 @@
+from __future__ import annotations
+
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import requests
+
+from uav_traffic_ai.blockchain.anchor_queue import AnchorQueue
+from uav_traffic_ai.blockchain.merkle import BatchRootVerifier, load_proof, proof_path_for
+from uav_traffic_ai.blockchain.verify import verify_sha256_in_tx_opreturn
+from uav_traffic_ai.cache import ResultCache
+from uav_traffic_ai.ingest.media import PNG, ImageEncoding, decode_image_bgr
+from uav_traffic_ai.pipeline import persist_artifacts, recompute_evidence_sha256, run_analysis_on_image
+from uav_traffic_ai.profiling import default_profiler, timer
+from uav_traffic_ai.reporting.catalog import EvidenceCatalog
+from uav_traffic_ai.schemas import Evidence, SceneMeta
+from uav_traffic_ai.settings import AppSettings
+from uav_traffic_ai.vision.detections import DetectionArrays
+from uav_traffic_ai.vision.detector import DetectionResult, Detector, draw_detections
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+_PREFIX_RE = re.compile(r"^[\w-][\w.-]{0,127}$")  # sin separadores: el prefijo acaba en un nombre de fichero
+_UNSAFE_RE = re.compile(r"[^\w-]+")
+
+
+@dataclass
+class BatcherStats:
+    requests: int = 0
+    batches: int = 0
+    frames: int = 0
+    largest_batch: int = 0
+    infer_s: float = 0.0
+
+    @property
+    def mean_batch(self) -> float:
+        return self.frames / self.batches if self.batches else 0.0
+
+
+@dataclass
+class _Pending:
+    frames: Sequence[np.ndarray]
+    future: Future = field(default_factory=Future)
+
+
+class DynamicBatcher:
+    """
+    Agrupa en una sola llamada de inferencia los frames que llegan a la vez desde varios hilos (una petición HTTP
+    por hilo). El hilo del batcher toma la primera petición de la cola y espera a más hasta juntar max_batch frames
+    o hasta que pasan max_wait_ms desde la primera: con carga baja cada petición paga como mucho ese retardo, con
+    carga alta los lotes se llenan solos y el modelo procesa varios frames por llamada.
+    Las peticiones que se anuncian con incoming() (desde que empiezan a decodificar la imagen) permiten no esperar
+    en balde: si todas las que están en curso ya van en el lote, se infiere sin agotar max_wait_ms.
+    La inferencia va sin anotar (headless); dibujar, codificar y persistir lo hace cada hilo de petición.
+    """
+
+    def __init__(self, detector: Detector, *, max_batch: int = 8, max_wait_ms: float = 10.0) -> None:
+        self.detector = detector
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.stats = BatcherStats()
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._incoming = 0
+
+    @contextmanager
+    def incoming(self) -> Iterator[None]:
+        with self._lock:
+            self._incoming += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._incoming -= 1
+
+    def _others_coming(self, collected: int) -> bool:
+        with self._lock:
+            return self._incoming > collected or not self._queue.empty()
+
+    def start(self) -> "DynamicBatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="dynamic-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, frames: Sequence[np.ndarray]) -> "Future[List[DetectionResult]]":
+        if self._thread is None:
+            raise RuntimeError("DynamicBatcher no está arrancado (start())")
+        item = _Pending(frames=list(frames))
+        self._queue.put(item)
+        return item.future
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            pending = [first]
+            n = len(first.frames)
+            deadline = time.monotonic() + self.max_wait_s
+            while n < self.max_batch:
+                timeout = deadline - time.monotonic() if self._others_coming(len(pending)) else 0.0
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True  # se procesa lo ya recogido antes de salir
+                    break
+                pending.append(item)
+                n += len(item.frames)
+            self._run(pending)
+
+    def _run(self, pending: List[_Pending]) -> None:
+        frames = [f for p in pending for f in p.frames]
+        t0 = time.perf_counter()
+        try:
+            results = self.detector.detect_batch(frames, annotate=False)
+        except BaseException as exc:  # el error llega a cada petición del lote, el hilo sigue vivo
+            for p in pending:
+                p.future.set_exception(exc)
+            return
+        st = self.stats
+        st.infer_s += time.perf_counter() - t0
+        st.requests += len(pending)
+        st.batches += 1
+        st.frames += len(frames)
+        st.largest_batch = max(st.largest_batch, len(frames))
+        i = 0
+        for p in pending:
+            p.future.set_result(results[i : i + len(p.frames)])
+            i += len(p.frames)
+
+
+class BatchingDetector(Detector):
+    """
+    Detector que delega la inferencia en un DynamicBatcher. Conserva weights/conf/iou/teselas, model_id y cache_tag
+    del detector real, así que run_analysis_on_image lo usa tal cual (misma clave de ResultCache, misma evidencia).
+    """
+
+    def __init__(self, batcher: DynamicBatcher) -> None:
+        base = batcher.detector
+        super().__init__(base.weights, base.conf, base.iou, base.tiling)
+        self.backend = base.backend
+        self.batcher = batcher
+
+    @property
+    def model_id(self) -> str:
+        return self.batcher.detector.model_id
+
+    @property
+    def cache_tag(self) -> str:
+        return self.batcher.detector.cache_tag
+
+    def _infer(self, frames: Sequence[np.ndarray], imgsz: Optional[int] = None) -> List[DetectionArrays]:
+        # solo por completar la interfaz: detect_batch no pasa por aquí (teselas y tamaño los decide el detector real)
+        return [r.arrays for r in self.batcher.submit(frames).result()]
+
+    def detect_batch(self, frames: Sequence[np.ndarray], *, annotate: bool = True) -> List[DetectionResult]:
+        if not frames:  # todo salió de la caché de resultados
+            return []
+        # la inferencia (vision.infer) corre en el hilo del batcher: aquí se ve la espera completa, cola incluida
+        with timer("service.batch_wait"):
+            results = self.batcher.submit(frames).result()
+        if not annotate:
+            return results
+        return [
+            DetectionResult(arrays=r.arrays, annotated_bgr=draw_detections(img, r.arrays))
+            for img, r in zip(frames, results)
+        ]
+
+
+class InferenceService:
+    """
+    Lo que hay detrás de los endpoints HTTP: analizar (run_analysis_on_image + persist_artifacts, con la inferencia
+    agrupada por el DynamicBatcher), encolar el anclaje de una evidencia ya guardada y verificarla.
+    Es seguro llamarlo desde varios hilos: ResultCache, EvidenceCatalog y AnchorQueue llevan su propio lock.
+    """
+
+    def __init__(
+        self,
+        *,
+        artifacts_dir: Path,
+        detector: Detector,
+        woc_base: str,
+        chain_name: str,
+        max_batch: int = 8,
+        max_wait_ms: float = 10.0,
+        annotate: Optional[ImageEncoding] = PNG,
+        cache: Optional[ResultCache] = None,
+        catalog: Optional[EvidenceCatalog] = None,
+        anchor_queue: Optional[AnchorQueue] = None,
+    ) -> None:
+        self.artifacts_dir = artifacts_dir
+        self.woc_base = woc_base
+        self.chain_name = chain_name
+        self.annotate = annotate
+        self.cache = cache
+        self.catalog = catalog
+        self.anchor_queue = anchor_queue
+        self.batcher = DynamicBatcher(detector, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self.detector = BatchingDetector(self.batcher)
+        self.started_at = time.time()
+
+    def start(self) -> "InferenceService":
+        self.batcher.start()
+        if self.anchor_queue is not None:
+            self.anchor_queue.start()
+        return self
+
+    def stop(self) -> None:
+        self.batcher.stop()
+        if self.anchor_queue is not None:
+            self.anchor_queue.stop()
+
+    def _json_path(self, prefix: str) -> Path:
+        if not _PREFIX_RE.match(prefix):
+            raise ValueError(f"Prefijo no válido: {prefix!r}")
+        return self.artifacts_dir / "outputs" / f"{prefix}.json"
+
+    def analyze(
+        self,
+        data: bytes,
+        *,
+        scene: SceneMeta,
+        prefix: Optional[str] = None,
+        annotate: bool = True,
+        anchor: bool = False,
+    ) -> Dict[str, Any]:
+        if prefix is not None:
+            self._json_path(prefix)  # validar antes de inferir
+        encoding = self.annotate if annotate else None
+        with self.batcher.incoming():
+            evidence, image = run_analysis_on_image(
+                img_bgr=decode_image_bgr(data),
+                scene=scene,
+                detector=self.detector,
+                model_weights=self.detector.model_id,
+                cache=self.cache,
+                annotate=encoding,
+            )
+        if prefix is None:
+            # scene_id viene de la query string: solo [\w-] en el nombre de fichero (nada de "../")
+            scene_part = _UNSAFE_RE.sub("_", scene.scene_id or "").strip("_")[:64] or "api"
+            prefix = f"{scene_part}_{evidence.sha256[:16]}"
+            self._json_path(prefix)
+        paths = persist_artifacts(
+            artifacts_base=self.artifacts_dir,
+            evidence=evidence,
+            annotated_image=image,
+            prefix=prefix,
+            encoding=encoding or PNG,
+            catalog=self.catalog,
+        )
+        out: Dict[str, Any] = {
+            "prefix": prefix,
+            "sha256": evidence.sha256,
+            "paths": {k: str(v) for k, v in paths.items()},
+            "evidence": evidence.model_dump(mode="json"),
+        }
+        if anchor:
+            out["anchor"] = self._submit(evidence, paths["json"])
+        return out
+
+    def _submit(self, evidence: Evidence, json_path: Path) -> Dict[str, Any]:
+        if self.anchor_queue is None:
+            raise RuntimeError("El servicio se arrancó sin cola de anclaje")
+        job_id = self.anchor_queue.submit(evidence, json_path)
+        return self.anchor_status(job_id)
+
+    def anchor(self, prefix: str) -> Dict[str, Any]:
+        """Encola el anclaje de una evidencia ya guardada (outputs/<prefix>.json). No bloquea."""
+        json_path = self._json_path(prefix)
+        if not json_path.exists():
+            raise FileNotFoundError(f"No existe la evidencia {prefix}")
+        evidence = Evidence.model_validate_json(json_path.read_text(encoding="utf-8"))
+        return self._submit(evidence, json_path)
+
+    def anchor_status(self, job_id: str) -> Dict[str, Any]:
+        job = self.anchor_queue.job(job_id) if self.anchor_queue is not None else None
+        if job is None:
+            raise FileNotFoundError(f"No existe el trabajo de anclaje {job_id}")
+        return asdict(job)
+
+    def verify(
+        self, *, prefix: Optional[str] = None, txid: Optional[str] = None, sha256: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Con prefix, verifica la evidencia guardada (prueba Merkle + raíz on-chain si se ancló por lote, si no su
+        propio hash en el OP_RETURN) después de recalcular su sha256 a partir del contenido: un JSON editado da
+        ok=false aunque conserve el campo sha256. Con txid + sha256, comprueba directamente ese hash en esa tx.
+        """
+        if prefix is not None:
+            json_path = self._json_path(prefix)
+            if not json_path.exists():
+                raise FileNotFoundError(f"No existe la evidencia {prefix}")
+            evidence = Evidence.model_validate_json(json_path.read_text(encoding="utf-8"))
+            sha256 = evidence.sha256
+            if recompute_evidence_sha256(evidence) != sha256:
+                error = "el contenido no coincide con su sha256"
+                return {"ok": False, "txid": evidence.txid, "sha256": sha256, "error": error}
+            if proof_path_for(json_path).exists():
+                proof = load_proof(json_path)
+                verifier = BatchRootVerifier(woc_base=self.woc_base, chain_name=self.chain_name)
+                return {"ok": verifier.verify(sha256, proof), "txid": proof.txid, "sha256": sha256, "root": proof.root}
+            txid = evidence.txid
+            if not txid:
+                return {"ok": False, "txid": None, "sha256": sha256, "error": "evidencia sin anclar"}
+        if not txid or not sha256:
+            raise ValueError("Indica prefix, o txid y sha256")
+        res = verify_sha256_in_tx_opreturn(
+            woc_base=self.woc_base, chain_name=self.chain_name, txid=txid, expected_sha256_hex=sha256
+        )
+        return {"ok": res.ok, "txid": txid, "sha256": sha256}
+
+    def health(self) -> Dict[str, Any]:
+        st = self.batcher.stats
+        out: Dict[str, Any] = {
+            "ok": True,
+            "model": self.detector.model_id,
+            "backend": self.detector.backend,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "max_batch": self.batcher.max_batch,
+            "max_wait_ms": 1000 * self.batcher.max_wait_s,
+            "batcher": {**asdict(st), "mean_batch": round(st.mean_batch, 2)},
+        }
+        if self.anchor_queue is not None:
+            out["anchor_queue"] = self.anchor_queue.counts()
+        return out
+
+
+def _param(params: Dict[str, List[str]], name: str) -> Optional[str]:
+    values = params.get(name)
+    return values[-1] if values and values[-1] != "" else None
+
+
+def _flag(params: Dict[str, List[str]], name: str, default: bool) -> bool:
+    value = _param(params, name)
+    return default if value is None else value.lower() not in {"0", "false", "no"}
+
+
+def _float(params: Dict[str, List[str]], name: str) -> Optional[float]:
+    value = _param(params, name)
+    return float(value) if value is not None else None
+
+
+def make_handler(service: InferenceService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: una estación que sube frames seguidos reutiliza la conexión
+        disable_nagle_algorithm = True  # cabeceras y cuerpo van en dos write: sin esto, +40 ms por el ACK retardado
+
+        def log_message(self, *args) -> None:  # silencio
+            pass
+
+        def _send(self, code: int, payload: object) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_text(self, code: int, text: str) -> None:
+            body = text.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> Optional[bytes]:
+            n = int(self.headers.get("Content-Length") or 0)
+            if n > MAX_BODY_BYTES:
+                self.close_connection = True  # no se lee el cuerpo: la conexión no se puede reutilizar
+                self._send(413, {"error": f"cuerpo de más de {MAX_BODY_BYTES} bytes"})
+                return None
+            return self.rfile.read(n) if n else b""
+
+        def _handle(self, method: str) -> None:
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            try:
+                if method == "POST":
+                    data = self._body()
+                    if data is None:
+                        return
+                if method == "GET" and url.path == "/health":
+                    return self._send(200, service.health())
+                if method == "GET" and url.path == "/metrics":  # vacío salvo con PROFILE=1 / serve --profile
+                    return self._send_text(200, default_profiler().prometheus_text())
+                if method == "POST" and url.path == "/analyze":
+                    scene = SceneMeta(
+                        scene_id=_param(params, "scene_id"),
+                        scene_name=_param(params, "scene_name"),
+                        lat=_float(params, "lat"),
+                        lon=_float(params, "lon"),
+                    )
+                    return self._send(
+                        200,
+                        service.analyze(
+                            data,
+                            scene=scene,
+                            prefix=_param(params, "prefix"),
+                            annotate=_flag(params, "annotate", True),
+                            anchor=_flag(params, "anchor", False),
+                        ),
+                    )
+                if method == "POST" and url.path == "/anchor":
+                    prefix = _param(params, "prefix")
+                    if prefix is None and data:
+                        body = json.loads(data)
+                        if not isinstance(body, dict) or not isinstance(body.get("prefix", ""), str):
+                            raise ValueError('El cuerpo de /anchor debe ser un objeto JSON: {"prefix": "..."}')
+                        prefix = body.get("prefix")
+                    if prefix is None:
+                        raise ValueError("Falta prefix")
+                    return self._send(202, service.anchor(prefix))
+                if method == "GET" and url.path == "/anchor":
+                    job_id = _param(params, "job_id")
+                    if job_id is None:
+                        raise ValueError("Falta job_id")
+                    return self._send(200, service.anchor_status(job_id))
+                if method == "GET" and url.path == "/verify":
+                    prefix, txid, sha256 = (_param(params, k) for k in ("prefix", "txid", "sha256"))
+                    return self._send(200, service.verify(prefix=prefix, txid=txid, sha256=sha256))
+                self._send(404, {"error": "not found"})
+            except FileNotFoundError as exc:
+                self._send(404, {"error": str(exc)})
+            except ValueError as exc:  # también json.JSONDecodeError y parámetros numéricos mal formados
+                self._send(400, {"error": str(exc)})
+            except requests.RequestException as exc:  # WhatsOnChain caído o con error
+                self._send(502, {"error": f"{type(exc).__name__}: {exc}"})
+            except Exception as exc:
+                self._send(500, {"error": f"{type(exc).__name__}: {exc}"})
+
+        def do_GET(self) -> None:
+            self._handle("GET")
+
+        def do_POST(self) -> None:
+            self._handle("POST")
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # backlog de listen (5 por defecto): con ráfagas de conexiones se perdían SYN (+1 s)
+
+
+def make_server(service: InferenceService, host: str, port: int) -> ThreadingHTTPServer:
+    """Un hilo por conexión; las peticiones de /analyze se encuentran en el DynamicBatcher del servicio."""
+    return _Server((host, port), make_handler(service))
+
+
+def service_from_settings(s: AppSettings, *, detector: Detector, **kwargs) -> InferenceService:
+    kwargs.setdefault("artifacts_dir", s.artifacts_dir)
+    kwargs.setdefault("max_batch", s.service_max_batch)
+    kwargs.setdefault("max_wait_ms", s.service_max_wait_ms)
+    return InferenceService(detector=detector, woc_base=s.woc_base, chain_name=s.bsv_chain, **kwargs)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional
 
 from dotenv import load_dotenv
 import os
@@ -18,16 +18,68 @@ class AppSettings:
 
     traffic_dataset_dir: Path
     traffic_scenes_csv: Path
+    dataset_manifest_path: Optional[Path]
 
     yolo_weights: str
     yolo_conf: float
     yolo_iou: float
+    yolo_batch_size: int
+    yolo_tile_size: int
+    yolo_tile_overlap: float
+    yolo_tile_min_std: float
+    yolo_tile_full_frame: bool
+
+    detector_backend: str
+    detector_model_path: Optional[str]
+    detector_threads: int
+    detector_warmup: bool
+
+    annotated_format: str
+    annotated_quality: int
+    annotated_png_level: int
+
+    result_cache_dir: Path
+    result_cache_max_mb: int
+    frame_cache_dir: Path
+    frame_cache_max_gb: float
+    frame_cache_size: int
+    frame_cache_letterbox: bool
+
+    run_store_flush_frames: int
+    evidence_catalog_path: Optional[Path]
+    rollup_window_s: float
+    rollup_path: Path
 
     bsv_chain: ChainName
     bsv_wif_testnet: str
     bsv_dust_sats: int
 
     woc_base: str
+    woc_concurrency: int
+    woc_max_rps: float
+    opreturn_cache_path: Path
+
+    anchor_queue_dir: Path
+    anchor_concurrency: int
+
+    service_host: str
+    service_port: int
+    service_max_batch: int
+    service_max_wait_ms: float
+
+    profile: bool
+    profile_evidence: bool
+    profile_dir: Path
+
+    dedup: bool
+    dedup_max_hamming: int
+    dedup_pixel_diff: int
+    dedup_max_changed_px: int
+    dedup_max_reuse: int
+
+    sampling_budget: int
+    sampling_initial_fraction: float
+    sampling_floor: float
 
 
 def load_settings() -> AppSettings:
@@ -37,10 +89,45 @@ def load_settings() -> AppSettings:
 
     traffic_dataset_dir = Path(os.getenv("TRAFFIC_DATASET_DIR", "data/raw/traffic")).resolve()
     traffic_scenes_csv = Path(os.getenv("TRAFFIC_SCENES_CSV", str(traffic_dataset_dir / "scenes.csv"))).resolve()
+    dataset_manifest = os.getenv("DATASET_MANIFEST_PATH", "").strip() or str(
+        artifacts_dir / "cache" / "dataset_manifest.json"
+    )
+    dataset_manifest_path = None if dataset_manifest == "0" else Path(dataset_manifest).resolve()
 
     yolo_weights = os.getenv("YOLO_WEIGHTS", "yolov8s.pt")
     yolo_conf = float(os.getenv("YOLO_CONF", "0.25"))
     yolo_iou = float(os.getenv("YOLO_IOU", "0.7"))
+    yolo_batch_size = max(1, int(os.getenv("YOLO_BATCH_SIZE", "8")))
+    yolo_tile_size = max(0, int(os.getenv("YOLO_TILE_SIZE", "0")))
+    yolo_tile_overlap = min(0.9, max(0.0, float(os.getenv("YOLO_TILE_OVERLAP", "0.2"))))
+    yolo_tile_min_std = float(os.getenv("YOLO_TILE_MIN_STD", "0"))
+    yolo_tile_full_frame = os.getenv("YOLO_TILE_FULL_FRAME", "1").strip().lower() not in {"0", "false", "no"}
+
+    detector_backend = os.getenv("DETECTOR_BACKEND", "ultralytics").strip().lower()
+    if detector_backend not in {"ultralytics", "onnx", "openvino"}:
+        detector_backend = "ultralytics"
+    detector_model_path = os.getenv("DETECTOR_MODEL_PATH", "").strip() or None
+    detector_threads = max(0, int(os.getenv("DETECTOR_THREADS", "0")))
+    detector_warmup = os.getenv("DETECTOR_WARMUP", "1").strip().lower() not in {"0", "false", "no"}
+
+    annotated_format = os.getenv("ANNOTATED_FORMAT", "png").strip().lower().lstrip(".").replace("jpeg", "jpg")
+    if annotated_format not in {"png", "jpg", "webp"}:
+        annotated_format = "png"
+    annotated_quality = min(100, max(1, int(os.getenv("ANNOTATED_QUALITY", "90"))))
+    annotated_png_level = min(9, max(0, int(os.getenv("ANNOTATED_PNG_LEVEL", "1"))))
+
+    result_cache_dir = Path(os.getenv("RESULT_CACHE_DIR", str(artifacts_dir / "cache" / "results"))).resolve()
+    result_cache_max_mb = int(os.getenv("RESULT_CACHE_MAX_MB", "1024"))
+    frame_cache_dir = Path(os.getenv("FRAME_CACHE_DIR", str(artifacts_dir / "cache" / "frames"))).resolve()
+    frame_cache_max_gb = max(0.0, float(os.getenv("FRAME_CACHE_MAX_GB", "20")))
+    frame_cache_size = max(0, int(os.getenv("FRAME_CACHE_SIZE", "0")))
+    frame_cache_letterbox = os.getenv("FRAME_CACHE_LETTERBOX", "0").strip().lower() in {"1", "true", "yes"}
+
+    run_store_flush_frames = max(1, int(os.getenv("RUN_STORE_FLUSH_FRAMES", "256")))
+    evidence_catalog = os.getenv("EVIDENCE_CATALOG_PATH", "").strip() or str(artifacts_dir / "catalog.sqlite")
+    evidence_catalog_path = None if evidence_catalog == "0" else Path(evidence_catalog).resolve()
+    rollup_window_s = max(0.0, float(os.getenv("ROLLUP_WINDOW_S", "60")))
+    rollup_path = Path(os.getenv("ROLLUP_PATH", str(artifacts_dir / "rollups" / "rollup.csv"))).resolve()
 
     bsv_chain = os.getenv("BSV_CHAIN", "test").strip().lower()
     if bsv_chain not in {"main", "test"}:
@@ -50,17 +137,87 @@ def load_settings() -> AppSettings:
     bsv_dust_sats = int(os.getenv("BSV_DUST_SATS", "546"))
 
     woc_base = os.getenv("WOC_BASE", "https://api.whatsonchain.com").rstrip("/")
+    woc_concurrency = max(1, int(os.getenv("WOC_CONCURRENCY", "8")))
+    woc_max_rps = float(os.getenv("WOC_MAX_RPS", "3"))
+    opreturn_cache_path = Path(
+        os.getenv("OPRETURN_CACHE_PATH", str(artifacts_dir / "cache" / "opreturn.jsonl"))
+    ).resolve()
+
+    anchor_queue_dir = Path(os.getenv("ANCHOR_QUEUE_DIR", str(artifacts_dir / "queue" / "anchor"))).resolve()
+    anchor_concurrency = max(1, int(os.getenv("ANCHOR_CONCURRENCY", "2")))
+
+    service_host = os.getenv("SERVICE_HOST", "127.0.0.1")
+    service_port = int(os.getenv("SERVICE_PORT", "8080"))
+    service_max_batch = max(1, int(os.getenv("SERVICE_MAX_BATCH", "8")))
+    service_max_wait_ms = max(0.0, float(os.getenv("SERVICE_MAX_WAIT_MS", "10")))
+
+    profile = os.getenv("PROFILE", "0").strip().lower() not in {"0", "false", "no"}
+    profile_evidence = os.getenv("PROFILE_EVIDENCE", "0").strip().lower() not in {"0", "false", "no"}
+    profile_dir = Path(os.getenv("PROFILE_DIR", str(artifacts_dir / "profile"))).resolve()
+
+    dedup = os.getenv("DEDUP", "0").strip().lower() not in {"0", "false", "no"}
+    dedup_max_hamming = min(64, max(0, int(os.getenv("DEDUP_MAX_HAMMING", "6"))))
+    dedup_pixel_diff = min(255, max(0, int(os.getenv("DEDUP_PIXEL_DIFF", "12"))))
+    dedup_max_changed_px = max(0, int(os.getenv("DEDUP_MAX_CHANGED_PX", "4")))
+    dedup_max_reuse = max(0, int(os.getenv("DEDUP_MAX_REUSE", "30")))
+
+    sampling_budget = max(1, int(os.getenv("SAMPLING_BUDGET", "64")))
+    sampling_initial_fraction = min(1.0, max(0.0, float(os.getenv("SAMPLING_INITIAL_FRACTION", "0.5"))))
+    sampling_floor = max(0.0, float(os.getenv("SAMPLING_FLOOR", "0.3")))
 
     return AppSettings(
         app_name=os.getenv("APP_NAME", "UAV Traffic AI"),
         artifacts_dir=artifacts_dir,
         traffic_dataset_dir=traffic_dataset_dir,
         traffic_scenes_csv=traffic_scenes_csv,
+        dataset_manifest_path=dataset_manifest_path,
         yolo_weights=yolo_weights,
         yolo_conf=yolo_conf,
         yolo_iou=yolo_iou,
+        yolo_batch_size=yolo_batch_size,
+        yolo_tile_size=yolo_tile_size,
+        yolo_tile_overlap=yolo_tile_overlap,
+        yolo_tile_min_std=yolo_tile_min_std,
+        yolo_tile_full_frame=yolo_tile_full_frame,
+        detector_backend=detector_backend,
+        detector_model_path=detector_model_path,
+        detector_threads=detector_threads,
+        detector_warmup=detector_warmup,
+        annotated_format=annotated_format,
+        annotated_quality=annotated_quality,
+        annotated_png_level=annotated_png_level,
+        result_cache_dir=result_cache_dir,
+        result_cache_max_mb=result_cache_max_mb,
+        frame_cache_dir=frame_cache_dir,
+        frame_cache_max_gb=frame_cache_max_gb,
+        frame_cache_size=frame_cache_size,
+        frame_cache_letterbox=frame_cache_letterbox,
+        run_store_flush_frames=run_store_flush_frames,
+        evidence_catalog_path=evidence_catalog_path,
+        rollup_window_s=rollup_window_s,
+        rollup_path=rollup_path,
         bsv_chain=bsv_chain,  # type: ignore[assignment]
         bsv_wif_testnet=bsv_wif_testnet,
         bsv_dust_sats=bsv_dust_sats,
         woc_base=woc_base,
+        woc_concurrency=woc_concurrency,
+        woc_max_rps=woc_max_rps,
+        opreturn_cache_path=opreturn_cache_path,
+        anchor_queue_dir=anchor_queue_dir,
+        anchor_concurrency=anchor_concurrency,
+        service_host=service_host,
+        service_port=service_port,
+        service_max_batch=service_max_batch,
+        service_max_wait_ms=service_max_wait_ms,
+        profile=profile,
+        profile_evidence=profile_evidence,
+        profile_dir=profile_dir,
+        dedup=dedup,
+        dedup_max_hamming=dedup_max_hamming,
+        dedup_pixel_diff=dedup_pixel_diff,
+        dedup_max_changed_px=dedup_max_changed_px,
+        dedup_max_reuse=dedup_max_reuse,
+        sampling_budget=sampling_budget,
+        sampling_initial_fraction=sampling_initial_fraction,
+        sampling_floor=sampling_floor,
     )
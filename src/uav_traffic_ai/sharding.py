@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from uav_traffic_ai.ingest.frame_cache import DecodedFrames, open_frames_file
+from uav_traffic_ai.ingest.media import PNG, ImageEncoding
+from uav_traffic_ai.pipeline import frame_prefixes, iter_batches, persist_artifacts, run_analysis_on_scene
+from uav_traffic_ai.profiling import default_profiler
+from uav_traffic_ai.schemas import Evidence, SceneMeta
+from uav_traffic_ai.vision.detector import Detector, make_detector
+from uav_traffic_ai.vision.tiling import TileConfig
+
+# Detector del proceso worker: se carga una vez en el initializer y se reutiliza en cada shard.
+_WORKER_DETECTOR: Optional[Detector] = None
+
+
+@dataclass(frozen=True)
+class ShardTask:
+    unit: int  # posición global del shard: ordena el merge
+    scene: SceneMeta
+    frame_paths: Tuple[Path, ...]
+    decoded: Optional[Tuple[Path, int]] = None  # (.npy de FrameCache, índice del primer frame): el worker lo mapea
+    prefixes: Tuple[str, ...] = ()  # de frame_prefixes sobre la escena completa, no sobre el shard
+
+
+@dataclass(frozen=True)
+class FrameResult:
+    scene_id: Optional[str]
+    frame_path: Path
+    evidence: Evidence
+    annotated_image: Optional[bytes]  # None si el worker ya persistió los artefactos o sin anotación
+    paths: Optional[Dict[str, Path]]
+
+
+@dataclass(frozen=True)
+class ShardRunStats:
+    workers: int
+    frames: int
+    wall_s: float
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.wall_s if self.wall_s > 0 else 0.0
+
+
+def _init_worker(
+    weights: str,
+    conf: float,
+    iou: float,
+    torch_threads: int,
+    tiling: Optional[TileConfig] = None,
+    backend: str = "ultralytics",
+    model_path: Optional[str] = None,
+    profile: Tuple[bool, bool] = (False, False),
+) -> None:
+    global _WORKER_DETECTOR
+    # el profiler del proceso principal no viaja al worker: se enciende igual y cada shard devuelve lo medido
+    default_profiler().configure(enabled=profile[0], evidence_timings=profile[1])
+    # Repartimos los cores: sin esto cada worker lanza cpu_count hilos de torch/OpenCV y se pisan.
+    try:
+        import cv2
+
+        cv2.setNumThreads(1)
+    except ImportError:
+        pass
+    try:
+        import torch
+
+        torch.set_num_threads(max(1, torch_threads))
+    except ImportError:
+        pass
+    _WORKER_DETECTOR = make_detector(
+        backend=backend,
+        weights=weights,
+        conf=conf,
+        iou=iou,
+        tiling=tiling,
+        model_path=model_path,
+        threads=torch_threads,
+    )
+
+
+def _run_shard(
+    task: ShardTask,
+    batch_size: int,
+    created_at: datetime,
+    artifacts_base: Optional[Path],
+    annotate: Optional[ImageEncoding] = PNG,
+) -> Tuple[int, List[FrameResult], Dict[str, Any]]:
+    if _WORKER_DETECTOR is None:
+        raise RuntimeError("Worker sin inicializar (falta _init_worker)")
+    decoded = None
+    if task.decoded is not None:
+        npy, first = task.decoded
+        decoded = open_frames_file(npy)[first : first + len(task.frame_paths)]
+    analysed = run_analysis_on_scene(
+        frame_paths=task.frame_paths,
+        scene=task.scene,
+        detector=_WORKER_DETECTOR,
+        model_weights=_WORKER_DETECTOR.model_id,
+        batch_size=batch_size,
+        created_at=created_at,
+        annotate=annotate,
+        decoded=decoded,
+    )
+
+    out: List[FrameResult] = []
+    prefixes = task.prefixes
+    if not prefixes:
+        by_path = frame_prefixes(task.scene.scene_id, task.frame_paths)
+        prefixes = tuple(by_path[p] for p in task.frame_paths)
+    for p, prefix, (evidence, annotated) in zip(task.frame_paths, prefixes, analysed):
+        paths = None
+        if artifacts_base is not None:
+            # persistimos en el worker para no mandar la imagen de vuelta por el pipe
+            paths = persist_artifacts(
+                artifacts_base=artifacts_base,
+                evidence=evidence,
+                annotated_image=annotated,
+                prefix=prefix,
+                encoding=annotate or PNG,
+            )
+            annotated = None
+        out.append(
+            FrameResult(
+                scene_id=task.scene.scene_id,
+                frame_path=p,
+                evidence=evidence,
+                annotated_image=annotated,
+                paths=paths,
+            )
+        )
+    return task.unit, out, default_profiler().snapshot(clear=True)
+
+
+def make_shards(
+    scenes: Sequence[Tuple[SceneMeta, Sequence[Path]]],
+    *,
+    batch_size: int,
+    batches_per_shard: int = 2,
+    decoded: Optional[Sequence[Optional[DecodedFrames]]] = None,
+) -> List[ShardTask]:
+    """
+    Corta cada escena en shards contiguos alineados a batch_size: cada lote que ve el modelo es
+    exactamente el mismo que en run_analysis_on_scene serial, así que las detecciones (y el sha256)
+    no dependen del número de workers.
+    decoded (uno por escena) hace que cada shard lea sus frames del mmap en vez de decodificarlos.
+    """
+    shard_len = max(1, batch_size) * max(1, batches_per_shard)
+    tasks: List[ShardTask] = []
+    for k, (scene, frames) in enumerate(scenes):
+        scene_decoded = decoded[k] if decoded is not None else None
+        prefixes = frame_prefixes(scene.scene_id, frames)
+        for start, chunk in enumerate(iter_batches(list(frames), shard_len)):
+            tasks.append(
+                ShardTask(
+                    unit=len(tasks),
+                    scene=scene,
+                    frame_paths=tuple(chunk),
+                    decoded=(scene_decoded.path, start * shard_len) if scene_decoded is not None else None,
+                    prefixes=tuple(prefixes[Path(p)] for p in chunk),
+                )
+            )
+    return tasks
+
+
+def run_sharded(
+    *,
+    scenes: Sequence[Tuple[SceneMeta, Sequence[Path]]],
+    workers: int,
+    weights: str,
+    conf: float,
+    iou: float,
+    batch_size: int = 8,
+    batches_per_shard: int = 2,
+    created_at: Optional[datetime] = None,
+    artifacts_base: Optional[Path] = None,
+    tiling: Optional[TileConfig] = None,
+    backend: str = "ultralytics",
+    model_path: Optional[str] = None,
+    annotate: Optional[ImageEncoding] = PNG,
+    decoded: Optional[Sequence[Optional[DecodedFrames]]] = None,
+) -> Tuple[List[FrameResult], ShardRunStats]:
+    """
+    Reparte los frames de una o varias escenas entre N procesos, cada uno con su propio Detector.
+    El resultado sale en el orden de entrada (escena, frame) sin importar qué worker terminó antes.
+    created_at se fija una vez para todo el run (por defecto, ahora) y se comparte con los workers.
+    decoded: FrameCache de cada escena (o None); los workers mapean el mismo .npy sin copiarlo.
+    Sin dedup: un FrameDeduper por shard cambiaría reused_from (y el sha256) en los bordes respecto al modo serial.
+    """
+    workers = max(1, int(workers))
+    created_at = created_at or datetime.now(timezone.utc)
+    tasks = make_shards(scenes, batch_size=batch_size, batches_per_shard=batches_per_shard, decoded=decoded)
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    profiler = default_profiler()
+
+    t0 = time.perf_counter()
+    by_unit: Dict[int, List[FrameResult]] = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            weights,
+            conf,
+            iou,
+            torch_threads,
+            tiling,
+            backend,
+            model_path,
+            (profiler.enabled, profiler.evidence_timings),
+        ),
+    ) as pool:
+        futures = [
+            pool.submit(_run_shard, task, batch_size, created_at, artifacts_base, annotate) for task in tasks
+        ]
+        for fut in futures:
+            unit, results, profile = fut.result()
+            by_unit[unit] = results
+            profiler.merge(profile)
+
+    merged = [r for unit in sorted(by_unit) for r in by_unit[unit]]
+    stats = ShardRunStats(workers=workers, frames=len(merged), wall_s=time.perf_counter() - t0)
+    return merged, stats
+
+
+def scaling_report(runs: Sequence[ShardRunStats]) -> str:
+    """Speedup y eficiencia (speedup / workers) respecto al run con menos workers."""
+    if not runs:
+        return ""
+    base = min(runs, key=lambda r: r.workers)
+    lines = [f"{'workers':>7} {'frames/s':>10} {'speedup':>8} {'efficiency':>10}"]
+    for r in sorted(runs, key=lambda r: r.workers):
+        speedup = (r.fps / base.fps) if base.fps > 0 else 0.0
+        efficiency = speedup * base.workers / r.workers
+        lines.append(f"{r.workers:>7} {r.fps:>10.2f} {speedup:>8.2f} {efficiency:>10.1%}")
+    return "\n".join(lines)
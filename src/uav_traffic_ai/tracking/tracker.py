@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from uav_traffic_ai.schemas import Detection, FlowMetrics
+from uav_traffic_ai.vision.detections import DetectionArrays
+
+
+@dataclass(frozen=True)
+class CountingLine:
+    name: str
+    p1: Tuple[float, float]
+    p2: Tuple[float, float]
+
+    @classmethod
+    def parse(cls, spec: str, name: Optional[str] = None) -> "CountingLine":
+        """'x1,y1,x2,y2' (píxeles)."""
+        x1, y1, x2, y2 = (float(v) for v in spec.split(","))
+        return cls(name=name or spec, p1=(x1, y1), p2=(x2, y2))
+
+
+@dataclass
+class Track:
+    track_id: int
+    box: np.ndarray  # xyxy
+    first_frame: int
+    last_frame: int
+    hits: int = 1
+    missed: int = 0
+    typology: str = "other"  # voto mayoritario de las detecciones asociadas
+    typology_votes: Counter = field(default_factory=Counter)
+    crossed: set = field(default_factory=set)
+
+    def vote(self, typology: str) -> None:
+        self.typology_votes[typology] += 1
+        if typology != self.typology and self.typology_votes[typology] > self.typology_votes[self.typology]:
+            self.typology = typology
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU (len(a), len(b)) entre cajas xyxy, sin bucles Python."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    # float32 basta para IoU y reduce a la mitad el tráfico de memoria de las matrices T x D
+    a = a.astype(np.float32, copy=False)
+    b = b.astype(np.float32, copy=False)
+    iw = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    np.maximum(iw, 0, out=iw)
+    np.maximum(ih, 0, out=ih)
+    inter = iw * ih
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    np.maximum(union, 1e-9, out=union)
+    return inter / union
+
+
+def _greedy_match(score: np.ndarray, valid: np.ndarray, higher_is_better: bool) -> List[Tuple[int, int]]:
+    """
+    Asignación greedy sobre los candidatos válidos ordenados por score.
+    Los candidatos suelen ser ~1 por detección, así que el bucle es corto aunque la matriz sea grande.
+    """
+    rows, cols = np.nonzero(valid)
+    if len(rows) == 0:
+        return []
+    vals = score[rows, cols]
+    order = np.argsort(-vals if higher_is_better else vals, kind="stable")
+    used_r: set = set()
+    used_c: set = set()
+    pairs: List[Tuple[int, int]] = []
+    for k in order:
+        r, c = int(rows[k]), int(cols[k])
+        if r in used_r or c in used_c:
+            continue
+        used_r.add(r)
+        used_c.add(c)
+        pairs.append((r, c))
+    return pairs
+
+
+class IouTracker:
+    """
+    Tracker multi-objeto ligero (estilo SORT sin Kalman) para detecciones de YoloDetector:
+    1) asocia por IoU; 2) los que quedan, por distancia de centroides relativa al tamaño de la caja
+    (vehículos pequeños en vistas aéreas a pocos FPS apenas solapan entre frames).
+    Un track se confirma con min_hits apariciones y se cierra tras max_missed frames sin verse.
+    """
+
+    def __init__(
+        self,
+        *,
+        iou_threshold: float = 0.3,
+        centroid_gate: float = 1.0,
+        max_missed: int = 5,
+        min_hits: int = 2,
+        lines: Sequence[CountingLine] = (),
+        match_typology: bool = True,
+    ) -> None:
+        self.iou_threshold = iou_threshold
+        self.centroid_gate = centroid_gate  # distancia máxima en diagonales de caja
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+        self.lines = list(lines)
+        self.match_typology = match_typology
+
+        self._active: List[Track] = []
+        self._next_id = 1
+        self._unique: Counter = Counter()  # tipología -> tracks confirmados
+        self._crossings: Dict[str, Counter] = defaultdict(Counter)
+        self._typology_codes: Dict[str, int] = {}
+        self._frames = 0
+        self._t_first: Optional[float] = None
+        self._t_last: Optional[float] = None
+
+    def update_from_detections(
+        self,
+        detections: Union[Sequence[Detection], DetectionArrays],
+        frame_index: int,
+        timestamp_s: Optional[float] = None,
+    ) -> np.ndarray:
+        if isinstance(detections, DetectionArrays):
+            boxes = detections.xyxy.astype(np.float64)
+            return self.update(boxes, detections.typology_list(), frame_index, timestamp_s)
+        boxes = np.array([[d.bbox.x1, d.bbox.y1, d.bbox.x2, d.bbox.y2] for d in detections], dtype=np.float64)
+        return self.update(boxes.reshape(-1, 4), [d.typology for d in detections], frame_index, timestamp_s)
+
+    def update(
+        self,
+        boxes: np.ndarray,
+        typologies: Sequence[str],
+        frame_index: int,
+        timestamp_s: Optional[float] = None,
+    ) -> np.ndarray:
+        """Devuelve el track_id asignado a cada detección (mismo orden que boxes)."""
+        self._frames += 1
+        if timestamp_s is not None:
+            self._t_first = timestamp_s if self._t_first is None else self._t_first
+            self._t_last = timestamp_s
+
+        n = len(boxes)
+        ids = np.full(n, -1, dtype=np.int64)
+        typ = list(typologies)
+        tracks = self._active
+        track_boxes = np.array([t.box for t in tracks], dtype=np.float64).reshape(-1, 4)
+
+        same_typ = np.ones((len(tracks), n), dtype=bool)
+        if self.match_typology and len(tracks) and n:
+            # comparamos códigos enteros, no strings: la matriz T x D es el coste dominante
+            det_codes = np.array([self._code(t) for t in typ], dtype=np.int32)
+            track_codes = np.array([self._code(t.typology) for t in tracks], dtype=np.int32)
+            same_typ = track_codes[:, None] == det_codes[None, :]
+
+        # 1) IoU
+        iou = iou_matrix(track_boxes, boxes)
+        pairs = _greedy_match(iou, (iou >= self.iou_threshold) & same_typ, higher_is_better=True)
+
+        # 2) centroides para lo que no ha casado por IoU
+        free_t = np.ones(len(tracks), dtype=bool)
+        free_d = np.ones(n, dtype=bool)
+        for r, c in pairs:
+            free_t[r] = False
+            free_d[c] = False
+        if free_t.any() and free_d.any():
+            # solo la submatriz libre: tras el IoU suele quedar una fracción pequeña
+            ti = np.nonzero(free_t)[0]
+            di = np.nonzero(free_d)[0]
+            tb, db = track_boxes[ti], boxes[di]
+            ct = (tb[:, :2] + tb[:, 2:]) / 2.0
+            cd = (db[:, :2] + db[:, 2:]) / 2.0
+            diff = ct[:, None, :] - cd[None, :, :]
+            dist2 = diff[..., 0] ** 2 + diff[..., 1] ** 2
+            wh = tb[:, 2:] - tb[:, :2]
+            gate2 = (self.centroid_gate**2) * (wh[:, 0] ** 2 + wh[:, 1] ** 2)
+            valid = (dist2 <= gate2[:, None]) & same_typ[np.ix_(ti, di)]
+            pairs.extend((int(ti[r]), int(di[c])) for r, c in _greedy_match(dist2, valid, higher_is_better=False))
+
+        matched_t = np.zeros(len(tracks), dtype=bool)
+        for r, c in pairs:
+            t = tracks[r]
+            t.box = boxes[c]
+            t.last_frame = frame_index
+            t.hits += 1
+            t.missed = 0
+            t.vote(typ[c])
+            if t.hits == self.min_hits:
+                self._unique[t.typology] += 1
+            ids[c] = t.track_id
+            matched_t[r] = True
+
+        if self.lines and pairs:
+            rows = np.array([r for r, _ in pairs])
+            cols = np.array([c for _, c in pairs])
+            prev = (track_boxes[rows, :2] + track_boxes[rows, 2:]) / 2.0
+            cur = (boxes[cols, :2] + boxes[cols, 2:]) / 2.0
+            self._count_crossings([tracks[r] for r in rows], prev, cur)
+
+        # tracks sin asociar envejecen; los caducados salen de la lista activa
+        survivors: List[Track] = []
+        for i, t in enumerate(tracks):
+            if not matched_t[i]:
+                t.missed += 1
+            if t.missed <= self.max_missed:
+                survivors.append(t)
+
+        # detecciones sin asociar abren track nuevo
+        for c in np.nonzero(ids < 0)[0]:
+            t = Track(
+                track_id=self._next_id,
+                box=boxes[c],
+                first_frame=frame_index,
+                last_frame=frame_index,
+                typology=typ[c],
+                typology_votes=Counter({typ[c]: 1}),
+            )
+            self._next_id += 1
+            if self.min_hits <= 1:
+                self._unique[t.typology] += 1
+            ids[c] = t.track_id
+            survivors.append(t)
+
+        self._active = survivors
+        return ids
+
+    def _code(self, typology: str) -> int:
+        return self._typology_codes.setdefault(typology, len(self._typology_codes))
+
+    def _count_crossings(self, tracks: List[Track], prev: np.ndarray, cur: np.ndarray) -> None:
+        for line in self.lines:
+            p1 = np.asarray(line.p1, dtype=np.float64)
+            d = np.asarray(line.p2, dtype=np.float64) - p1
+            # lado de la línea (signo del producto vectorial) antes y después
+            # (un centroide justo sobre la línea cuenta como lado positivo, si no se perdería el cruce)
+            side_prev = (d[0] * (prev[:, 1] - p1[1]) - d[1] * (prev[:, 0] - p1[0])) >= 0
+            side_cur = (d[0] * (cur[:, 1] - p1[1]) - d[1] * (cur[:, 0] - p1[0])) >= 0
+            changed = side_prev != side_cur
+            if not changed.any():
+                continue
+            # el cruce debe caer dentro del segmento, no en su prolongación
+            seg = cur - prev
+            denom = seg[:, 0] * d[1] - seg[:, 1] * d[0]
+            safe = np.where(denom == 0, 1.0, denom)
+            u = ((p1[0] - prev[:, 0]) * seg[:, 1] - (p1[1] - prev[:, 1]) * seg[:, 0]) / safe
+            within = changed & (denom != 0) & (u >= 0.0) & (u <= 1.0)
+            for k in np.nonzero(within)[0]:
+                t = tracks[k]
+                if line.name in t.crossed:
+                    continue  # un vehículo cuenta una vez por línea
+                t.crossed.add(line.name)
+                self._crossings[line.name][t.typology] += 1
+
+    @property
+    def active_tracks(self) -> List[Track]:
+        return list(self._active)
+
+    def summary(self, fps: Optional[float] = None) -> FlowMetrics:
+        """Sin timestamps, la duración se estima con fps (frames procesados / fps)."""
+        duration = 0.0
+        if self._t_first is not None and self._t_last is not None:
+            duration = self._t_last - self._t_first
+        elif fps:
+            duration = self._frames / fps
+        total = sum(self._unique.values())
+        return FlowMetrics(
+            frames=self._frames,
+            duration_s=float(duration),
+            unique_counts_by_typology=dict(self._unique),
+            line_crossings={k: dict(v) for k, v in self._crossings.items()},
+            flow_per_minute=float(total / (duration / 60.0)) if duration > 0 else 0.0,
+        )
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from uav_traffic_ai.schemas import Detection
+from uav_traffic_ai.vision.postprocess import map_typology
+
+# Validar la lista entera de una vez (pydantic-core) es bastante más rápido que un modelo por caja
+_DETECTIONS_ADAPTER: TypeAdapter[List[Detection]] = TypeAdapter(List[Detection])
+
+
+@dataclass(frozen=True)
+class DetectionArrays:
+    """
+    Detecciones de un frame en columnas NumPy (una fila por caja) + tabla de clases.
+    Es la representación del camino caliente (detector -> métricas -> tracking -> caché);
+    los modelos pydantic (Detection/BBox) solo se crean al construir la Evidence.
+    Los valores se guardan con el dtype del modelo (float32): al pasar a float de Python
+    salen los mismos números que antes, así que el sha256 de la evidencia no cambia.
+    """
+
+    xyxy: np.ndarray  # (N, 4)
+    conf: np.ndarray  # (N,)
+    cls: np.ndarray  # (N,) int, índice en names
+    names: Tuple[str, ...]  # id de clase -> nombre
+    typologies: Tuple[str, ...]  # id de clase -> tipología
+
+    def __len__(self) -> int:
+        return int(self.cls.shape[0])
+
+    @classmethod
+    def empty(cls) -> "DetectionArrays":
+        return cls(
+            xyxy=np.zeros((0, 4), dtype=np.float32),
+            conf=np.zeros(0, dtype=np.float32),
+            cls=np.zeros(0, dtype=np.int64),
+            names=(),
+            typologies=(),
+        )
+
+    @classmethod
+    def from_yolo(
+        cls, xyxy: np.ndarray, conf: np.ndarray, class_ids: np.ndarray, names: Mapping[int, str]
+    ) -> "DetectionArrays":
+        class_ids = class_ids.astype(np.int64, copy=False)
+        size = max([-1, *names.keys()] + ([int(class_ids.max())] if len(class_ids) else [])) + 1
+        table = tuple(str(names.get(i, "unknown")) for i in range(size))
+        return cls(
+            xyxy=xyxy.reshape(-1, 4),
+            conf=conf.reshape(-1),
+            cls=class_ids.reshape(-1),
+            names=table,
+            typologies=tuple(map_typology(n) for n in table),
+        )
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]]) -> "DetectionArrays":
+        """Desde dicts con la forma de Detection.model_dump() (p.ej. la caché de resultados)."""
+        if not records:
+            return cls.empty()
+        index: Dict[Tuple[str, str], int] = {}
+        ids = [index.setdefault((str(r["cls_name"]), str(r["typology"])), len(index)) for r in records]
+        b = [r["bbox"] for r in records]
+        return cls(
+            xyxy=np.array([[x["x1"], x["y1"], x["x2"], x["y2"]] for x in b], dtype=np.float64),
+            conf=np.array([r["confidence"] for r in records], dtype=np.float64),
+            cls=np.array(ids, dtype=np.int64),
+            names=tuple(n for n, _ in index),
+            typologies=tuple(t for _, t in index),
+        )
+
+    @classmethod
+    def from_detections(cls, detections: Sequence[Detection]) -> "DetectionArrays":
+        return cls.from_records([d.model_dump() for d in detections])
+
+    def cls_names(self) -> List[str]:
+        names = self.names
+        return [names[i] for i in self.cls.tolist()]
+
+    def typology_list(self) -> List[str]:
+        typ = self.typologies
+        return [typ[i] for i in self.cls.tolist()]
+
+    def areas(self) -> np.ndarray:
+        """Área de cada caja en float64 (ancho/alto negativos cuentan como 0)."""
+        b = self.xyxy.astype(np.float64, copy=False)
+        w = np.maximum(b[:, 2] - b[:, 0], 0.0)
+        h = np.maximum(b[:, 3] - b[:, 1], 0.0)
+        return w * h
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Dicts con la forma JSON de Detection, sin pasar por pydantic."""
+        return [
+            {"cls_name": n, "confidence": c, "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}, "typology": t}
+            for n, t, c, (x1, y1, x2, y2) in zip(
+                self.cls_names(), self.typology_list(), self.conf.tolist(), self.xyxy.tolist()
+            )
+        ]
+
+    def to_detections(self, records: Optional[List[Dict[str, Any]]] = None) -> List[Detection]:
+        """records: el resultado de to_records() si ya se ha calculado (p.ej. para el hash)."""
+        return _DETECTIONS_ADAPTER.validate_python(self.to_records() if records is None else records)
@@ -1,56 +1,249 @@
 from __future__ import annotations
 
+import threading
+from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Any, List, Optional, Sequence, Tuple
 
+import cv2
 import numpy as np
-from ultralytics import YOLO
 
-from uav_traffic_ai.schemas import BBox, Detection
-from uav_traffic_ai.vision.postprocess import map_typology
+from uav_traffic_ai.profiling import count, timer
+from uav_traffic_ai.schemas import Detection
+from uav_traffic_ai.settings import AppSettings
+from uav_traffic_ai.vision.detections import DetectionArrays
+from uav_traffic_ai.vision.tiling import TileConfig, has_texture, merge_tile_detections, tile_grid
 
 
 @dataclass(frozen=True)
 class DetectionResult:
-    detections: List[Detection]
-    annotated_bgr: np.ndarray  # imagen con boxes dibujados
+    arrays: DetectionArrays
+    annotated_bgr: Optional[np.ndarray]  # imagen con boxes dibujados; None si se pidió sin anotar
 
+    @property
+    def detections(self) -> List[Detection]:
+        return self.arrays.to_detections()
 
-class YoloDetector:
-    def __init__(self, weights: str, conf: float, iou: float) -> None:
+
+def _class_color(class_id: int) -> Tuple[int, int, int]:
+    rng = np.random.default_rng(class_id)
+    return tuple(int(v) for v in rng.integers(64, 256, size=3))  # type: ignore[return-value]
+
+
+def draw_detections(img_bgr: np.ndarray, arrays: DetectionArrays) -> np.ndarray:
+    """Cajas + etiqueta "clase conf" sobre una copia del frame (cuando no hay un Results de ultralytics)."""
+    with timer("vision.draw"):
+        out = img_bgr.copy()
+        thickness = max(1, round(max(out.shape[:2]) / 1000))
+        boxes = zip(arrays.xyxy.astype(int).tolist(), arrays.conf.tolist(), arrays.cls.tolist())
+        for (x1, y1, x2, y2), c, k in boxes:
+            color = _class_color(k)
+            cv2.rectangle(out, (x1, y1), (x2, y2), color, thickness)
+            label = f"{arrays.names[k]} {c:.2f}"
+            cv2.putText(out, label, (x1, max(0, y1 - 3)), cv2.FONT_HERSHEY_SIMPLEX, 0.4 * thickness, color, thickness)
+        return out
+
+
+class Detector(ABC):
+    """
+    Interfaz común de los backends de inferencia. Cada backend implementa _infer (detecciones de un lote
+    de imágenes, opcionalmente a un imgsz fijo); batching, teselas y anotación son comunes.
+    model_lock serializa las llamadas al runtime cuando este no admite varios hilos a la vez; las vistas de
+    DetectorRegistry (copias ligeras) comparten el mismo lock que el modelo cargado.
+    """
+
+    backend = "base"
+
+    def __init__(self, weights: str, conf: float, iou: float, tiling: Optional[TileConfig] = None) -> None:
         self.weights = weights
         self.conf = conf
         self.iou = iou
+        self.tiling = tiling or TileConfig()
+        self.model_lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        """Lo que se guarda en Evidence.model_weights."""
+        return self.weights
+
+    @property
+    def cache_tag(self) -> str:
+        """Configuración que cambia las detecciones además de weights/conf/iou (clave de ResultCache)."""
+        return self.tiling.cache_tag()
+
+    @abstractmethod
+    def _infer(self, frames: Sequence[np.ndarray], imgsz: Optional[int] = None) -> List[DetectionArrays]:
+        ...
+
+    def _infer_annotated(self, frames: Sequence[np.ndarray]) -> List[DetectionResult]:
+        arrays = self._infer(frames)
+        return [DetectionResult(arrays=a, annotated_bgr=draw_detections(f, a)) for f, a in zip(frames, arrays)]
+
+    def _use_tiles(self, img_bgr: np.ndarray) -> bool:
+        return self.tiling.enabled and max(img_bgr.shape[:2]) > self.tiling.size
+
+    def detect_image(self, img_bgr: np.ndarray, *, annotate: bool = True) -> DetectionResult:
+        return self.detect_batch([img_bgr], annotate=annotate)[0]
+
+    def detect_batch(self, frames: Sequence[np.ndarray], *, annotate: bool = True) -> List[DetectionResult]:
+        """
+        Un DetectionResult por frame, en el mismo orden.
+        annotate=False no dibuja nada (headless): la imagen se puede generar después con draw_detections.
+        """
+        if not frames:
+            return []
+        count("vision.frames", len(frames))
+        count("vision.calls")
+        with timer("vision.infer"):  # incluye teselas y anotación (vision.draw / vision.plot)
+            if self.tiling.enabled and any(self._use_tiles(f) for f in frames):
+                return self.detect_tiled(frames, annotate=annotate)
+            if not annotate:
+                return [DetectionResult(arrays=a, annotated_bgr=None) for a in self._infer(frames)]
+            return self._infer_annotated(frames)
+
+    def detect_tiled(self, frames: Sequence[np.ndarray], *, annotate: bool = True) -> List[DetectionResult]:
+        """
+        Trocea cada frame en teselas solapadas de tiling.size px (sin reescalar: los vehículos pequeños
+        conservan su resolución), infiere todas las teselas de todos los frames por lotes y fusiona
+        las cajas de las costuras con NMS vectorizado (vision/tiling.py).
+        """
+        cfg = self.tiling
+        jobs: List[Tuple[int, int, int, np.ndarray]] = []  # (frame, x0, y0, tesela)
+        for fi, img in enumerate(frames):
+            h, w = img.shape[:2]
+            for x0, y0, x1, y1 in tile_grid(w, h, cfg.size, cfg.overlap):
+                tile = img[y0:y1, x0:x1]
+                if has_texture(tile, cfg.min_std):
+                    jobs.append((fi, x0, y0, tile))
+
+        count("vision.tiles", len(jobs))
+        parts: List[List[Tuple[DetectionArrays, int, int]]] = [[] for _ in frames]
+        imgsz = int(np.ceil(cfg.size / 32) * 32)  # múltiplo del stride del modelo
+        step = max(1, cfg.max_tiles_per_call)
+        for s in range(0, len(jobs), step):
+            chunk = jobs[s : s + step]
+            for (fi, x0, y0, _), arrays in zip(chunk, self._infer([j[3] for j in chunk], imgsz=imgsz)):
+                parts[fi].append((arrays, x0, y0))
+
+        if cfg.full_frame:
+            for fi, arrays in enumerate(self._infer(frames)):
+                parts[fi].append((arrays, 0, 0))
+
+        out: List[DetectionResult] = []
+        for img, frame_parts in zip(frames, parts):
+            arrays = merge_tile_detections(frame_parts, threshold=cfg.merge_threshold)
+            annotated = draw_detections(img, arrays) if annotate else None
+            out.append(DetectionResult(arrays=arrays, annotated_bgr=annotated))
+        return out
+
+
+class YoloDetector(Detector):
+    """Backend por defecto: ultralytics (PyTorch)."""
+
+    backend = "ultralytics"
+
+    def __init__(self, weights: str, conf: float, iou: float, tiling: Optional[TileConfig] = None) -> None:
+        super().__init__(weights, conf, iou, tiling)
+        # import aquí: con los backends ONNX/OpenVINO no hace falta cargar torch
+        from ultralytics import YOLO
+
         self.model = YOLO(weights)
 
-    def detect_image(self, img_bgr: np.ndarray) -> DetectionResult:
-        # Ultralytics: results = model.predict(...)
+    def _predict(self, frames: Sequence[np.ndarray], imgsz: Optional[int] = None) -> List[Any]:
+        # Ultralytics acepta una lista de arrays y devuelve un Results por frame, en el mismo orden.
+        kwargs = {"imgsz": imgsz} if imgsz else {}
+        # predict() guarda conf/iou en el predictor compartido: dos vistas a la vez se pisarían los umbrales
+        with self.model_lock:
+            return self.model.predict(list(frames), conf=self.conf, iou=self.iou, verbose=False, **kwargs)
+
+    def _infer(self, frames: Sequence[np.ndarray], imgsz: Optional[int] = None) -> List[DetectionArrays]:
+        return [self._to_arrays(r) for r in self._predict(frames, imgsz)]
+
+    def _infer_annotated(self, frames: Sequence[np.ndarray]) -> List[DetectionResult]:
         # result.plot() devuelve imagen anotada. :contentReference[oaicite:1]{index=1}
-        results = self.model.predict(img_bgr, conf=self.conf, iou=self.iou, verbose=False)
-        r0 = results[0]
-        names = r0.names  # id -> name
+        return [self._to_detection_result(r) for r in self._predict(frames)]
 
-        dets: List[Detection] = []
+    @staticmethod
+    def _to_arrays(r0: Any) -> DetectionArrays:
+        # Sin bucle por caja: los tensores pasan tal cual a columnas NumPy
         if r0.boxes is not None and len(r0.boxes) > 0:
-            xyxy = r0.boxes.xyxy.cpu().numpy()
-            confs = r0.boxes.conf.cpu().numpy()
-            clss = r0.boxes.cls.cpu().numpy().astype(int)
-
-            for i in range(len(xyxy)):
-                cls_name = str(names.get(int(clss[i]), "unknown"))
-                dets.append(
-                    Detection(
-                        cls_name=cls_name,
-                        confidence=float(confs[i]),
-                        bbox=BBox(
-                            x1=float(xyxy[i][0]),
-                            y1=float(xyxy[i][1]),
-                            x2=float(xyxy[i][2]),
-                            y2=float(xyxy[i][3]),
-                        ),
-                        typology=map_typology(cls_name),
-                    )
-                )
-
-        annotated = r0.plot()
-        return DetectionResult(detections=dets, annotated_bgr=annotated)
+            return DetectionArrays.from_yolo(
+                r0.boxes.xyxy.cpu().numpy(),
+                r0.boxes.conf.cpu().numpy(),
+                r0.boxes.cls.cpu().numpy().astype(int),
+                r0.names,  # id -> name
+            )
+        return DetectionArrays.empty()
+
+    def _to_detection_result(self, r0: Any) -> DetectionResult:
+        with timer("vision.plot"):
+            annotated = r0.plot()
+        return DetectionResult(arrays=self._to_arrays(r0), annotated_bgr=annotated)
+
+
+def tile_config_from_settings(s: AppSettings) -> TileConfig:
+    return TileConfig(
+        size=s.yolo_tile_size,
+        overlap=s.yolo_tile_overlap,
+        min_std=s.yolo_tile_min_std,
+        full_frame=s.yolo_tile_full_frame,
+    )
+
+
+BACKENDS = ("ultralytics", "onnx", "openvino")
+
+
+def make_detector(
+    *,
+    backend: str,
+    weights: str,
+    conf: float,
+    iou: float,
+    tiling: Optional[TileConfig] = None,
+    model_path: Optional[str] = None,
+    threads: int = 0,
+) -> Detector:
+    """
+    backend "onnx"/"openvino" cargan el modelo exportado (scripts/export_model.py); model_path por defecto
+    es el que genera ultralytics junto a los pesos (yolov8s.onnx, yolov8s_openvino_model/).
+    """
+    if backend == "ultralytics":
+        return YoloDetector(weights=weights, conf=conf, iou=iou, tiling=tiling)
+    if backend in ("onnx", "openvino"):
+        from uav_traffic_ai.vision.onnx_backend import OnnxDetector, OpenVinoDetector, exported_model_path
+
+        cls = OnnxDetector if backend == "onnx" else OpenVinoDetector
+        return cls(
+            weights=weights,
+            conf=conf,
+            iou=iou,
+            tiling=tiling,
+            model_path=model_path or exported_model_path(weights, backend),
+            threads=threads,
+        )
+    raise ValueError(f"DETECTOR_BACKEND desconocido: {backend!r} (opciones: {', '.join(BACKENDS)})")
+
+
+def detector_from_settings(
+    s: AppSettings,
+    *,
+    conf: Optional[float] = None,
+    iou: Optional[float] = None,
+    warmup: Optional[bool] = None,
+) -> Detector:
+    """
+    Detector del registro del proceso (vision/registry.py): los pesos se cargan la primera vez y después solo
+    cambia la vista. conf/iou sobreescriben YOLO_CONF/YOLO_IOU (p.ej. desde la UI) sin recargar el modelo.
+    """
+    from uav_traffic_ai.vision.registry import default_registry
+
+    return default_registry().get(
+        backend=s.detector_backend,
+        weights=s.yolo_weights,
+        conf=s.yolo_conf if conf is None else conf,
+        iou=s.yolo_iou if iou is None else iou,
+        tiling=tile_config_from_settings(s),
+        model_path=s.detector_model_path,
+        threads=s.detector_threads,
+        warmup=s.detector_warmup if warmup is None else warmup,
+    )
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import ast
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from uav_traffic_ai.vision.detections import DetectionArrays
+from uav_traffic_ai.vision.detector import Detector
+from uav_traffic_ai.vision.tiling import TileConfig, nms
+
+
+def exported_model_path(weights: str, backend: str) -> str:
+    """Ruta que deja `YOLO(weights).export(format=...)` junto a los pesos."""
+    stem = Path(weights).with_suffix("")
+    return str(stem.with_suffix(".onnx")) if backend == "onnx" else f"{stem}_openvino_model"
+
+
+def letterbox(img_bgr: np.ndarray, size: Tuple[int, int]) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Igual que el LetterBox de ultralytics (centrado, relleno gris 114) a un tamaño fijo (h, w).
+    Devuelve (imagen, escala, (pad_x, pad_y)) para deshacer la transformación en las cajas.
+    """
+    h, w = img_bgr.shape[:2]
+    new_h, new_w = size
+    r = min(new_h / h, new_w / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    dw, dh = (new_w - nw) / 2, (new_h - nh) / 2
+    if (nw, nh) != (w, h):
+        img_bgr = cv2.resize(img_bgr, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    out = cv2.copyMakeBorder(img_bgr, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return out, r, (left, top)
+
+
+def to_blob(images: Sequence[np.ndarray]) -> np.ndarray:
+    # BGR HWC uint8 -> RGB NCHW float32 [0, 1]
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def decode_yolov8(
+    pred: np.ndarray,
+    *,
+    conf: float,
+    iou: float,
+    gain: float,
+    pad: Tuple[int, int],
+    shape: Tuple[int, int],
+    names: Dict[int, str],
+    max_det: int = 300,
+) -> DetectionArrays:
+    """
+    Salida de YOLOv8 exportado para una imagen: (4 + nc, N) con cx, cy, w, h y un score por clase.
+    Filtra por conf, NMS por clase y devuelve las cajas en píxeles de la imagen original.
+    """
+    p = pred.T
+    scores = p[:, 4:]
+    cls = scores.argmax(axis=1)
+    best = scores[np.arange(len(cls)), cls]
+    m = best > conf
+    if not m.any():
+        return DetectionArrays.empty()
+    p, cls, best = p[m], cls[m], best[m]
+
+    xyxy = np.empty((len(p), 4), dtype=np.float32)
+    xyxy[:, 0] = p[:, 0] - p[:, 2] / 2
+    xyxy[:, 1] = p[:, 1] - p[:, 3] / 2
+    xyxy[:, 2] = p[:, 0] + p[:, 2] / 2
+    xyxy[:, 3] = p[:, 1] + p[:, 3] / 2
+    keep = nms(xyxy, best, cls, iou_threshold=iou, max_det=max_det)
+
+    xyxy = xyxy[keep]
+    xyxy -= np.array([pad[0], pad[1], pad[0], pad[1]], dtype=np.float32)
+    xyxy /= gain
+    h, w = shape
+    xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, w)
+    xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, h)
+    return DetectionArrays.from_yolo(xyxy, best[keep].astype(np.float32), cls[keep], names)
+
+
+class OnnxDetector(Detector):
+    """
+    YOLOv8 exportado a ONNX sobre ONNX Runtime (CPU). Preproceso (letterbox) y NMS en NumPy,
+    con las mismas detecciones que YoloDetector salvo diferencias numéricas menores
+    (ver scripts/bench_backends.py).
+    """
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        weights: str,
+        conf: float,
+        iou: float,
+        tiling: Optional[TileConfig] = None,
+        *,
+        model_path: str,
+        threads: int = 0,
+    ) -> None:
+        super().__init__(weights, conf, iou, tiling)
+        if not Path(model_path).exists():
+            raise FileNotFoundError(
+                f"No existe el modelo exportado {model_path}. Genéralo con: "
+                f"python scripts/export_model.py --format {self.backend}"
+            )
+        self.model_path = model_path
+        self.names: Dict[int, str] = {}
+        self.input_shape: Tuple[object, ...] = (1, 3, 640, 640)
+        self._load(threads)
+
+    @property
+    def model_id(self) -> str:
+        return Path(self.model_path).name
+
+    @property
+    def cache_tag(self) -> str:
+        # otro runtime da detecciones (ligeramente) distintas: no comparte entradas con ultralytics
+        tiles = self.tiling.cache_tag()
+        return f"{self.backend}:{self.model_id}" + (f"|{tiles}" if tiles else "")
+
+    def _load(self, threads: int) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("DETECTOR_BACKEND=onnx requiere onnxruntime (pip install onnxruntime)") from e
+        opts = ort.SessionOptions()
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_shape = tuple(inp.shape)
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def _input_size(self, imgsz: Optional[int]) -> Tuple[int, int]:
+        h, w = self.input_shape[2], self.input_shape[3]
+        if isinstance(h, int) and isinstance(w, int):
+            return h, w  # modelo exportado con tamaño fijo
+        return (imgsz or 640, imgsz or 640)
+
+    def _infer(self, frames: Sequence[np.ndarray], imgsz: Optional[int] = None) -> List[DetectionArrays]:
+        size = self._input_size(imgsz)
+        boxed = [letterbox(f, size) for f in frames]
+        blob = to_blob([b[0] for b in boxed])
+        if isinstance(self.input_shape[0], int) and self.input_shape[0] != len(frames):
+            # batch fijo (export por defecto: 1): una llamada por imagen
+            pred = np.concatenate([self._run(blob[i : i + 1]) for i in range(len(frames))])
+        else:
+            pred = self._run(blob)
+        return [
+            decode_yolov8(
+                pred[i],
+                conf=self.conf,
+                iou=self.iou,
+                gain=gain,
+                pad=pad,
+                shape=f.shape[:2],
+                names=self.names,
+            )
+            for i, (f, (_, gain, pad)) in enumerate(zip(frames, boxed))
+        ]
+
+
+class OpenVinoDetector(OnnxDetector):
+    """Mismo pre/post-proceso que OnnxDetector, con el runtime de OpenVINO (suele ser el más rápido en Intel)."""
+
+    backend = "openvino"
+
+    def _load(self, threads: int) -> None:
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise RuntimeError("DETECTOR_BACKEND=openvino requiere openvino (pip install openvino)") from e
+        path = Path(self.model_path)
+        xml = next(path.glob("*.xml")) if path.is_dir() else path
+        core = ov.Core()
+        model = core.read_model(str(xml))
+        config = {"INFERENCE_NUM_THREADS": threads} if threads > 0 else {}
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.input_shape = tuple(
+            d.get_length() if d.is_static else "dynamic" for d in model.inputs[0].get_partial_shape()
+        )
+        meta = xml.parent / "metadata.yaml"
+        if meta.exists():
+            import yaml
+
+            self.names = {int(k): str(v) for k, v in yaml.safe_load(meta.read_text(encoding="utf-8"))["names"].items()}
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        # compiled(...) reutiliza una única infer request: no admite llamadas concurrentes
+        with self.model_lock:
+            return self.compiled([blob])[self.compiled.output(0)]
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from uav_traffic_ai.vision.detector import Detector, make_detector
+from uav_traffic_ai.vision.tiling import TileConfig
+
+ModelKey = Tuple[str, str, Optional[str], int]  # (backend, weights, model_path, threads)
+
+
+@dataclass
+class ModelLoadStats:
+    backend: str
+    weights: str
+    model_id: str
+    load_s: float
+    first_inference_s: Optional[float]  # warm-up (None si se cargó sin calentar)
+    hits: int = 0  # peticiones servidas sin recargar (incluye cambios de conf/iou/teselas)
+
+    def summary(self) -> str:
+        warm = f"{self.first_inference_s:.2f}s" if self.first_inference_s is not None else "-"
+        return (
+            f"modelo {self.model_id} ({self.backend}): carga {self.load_s:.2f}s, "
+            f"primera inferencia {warm}, reutilizado {self.hits}x"
+        )
+
+
+class DetectorRegistry:
+    """
+    Detectores compartidos por el proceso. Los pesos se cargan una vez por (backend, weights, model_path, threads);
+    conf/iou/teselas solo cambian la vista que se devuelve (una copia ligera que comparte el modelo cargado), así
+    que mover un umbral en la UI no vuelve a leer los pesos. Las vistas comparten también model_lock: las inferencias
+    de varios hilos sobre el mismo modelo se serializan en los runtimes que no son reentrantes (ultralytics guarda
+    conf/iou en su predictor). La carga hace una inferencia de calentamiento sobre un frame vacío (la primera llamada
+    de ultralytics/ONNX Runtime inicializa el predictor y es varias veces más lenta) y guarda ambos tiempos en stats().
+    """
+
+    def __init__(self, *, max_views: int = 64, warmup_size: int = 640) -> None:
+        self.max_views = max(1, int(max_views))
+        self.warmup_size = warmup_size
+        self._lock = threading.Lock()
+        self._models: Dict[ModelKey, Detector] = {}
+        self._stats: Dict[ModelKey, ModelLoadStats] = {}
+        self._views: "OrderedDict[tuple, Detector]" = OrderedDict()
+
+    def _load(self, key: ModelKey, *, conf: float, iou: float, warmup: bool) -> Detector:
+        backend, weights, model_path, threads = key
+        t0 = time.perf_counter()
+        base = make_detector(
+            backend=backend, weights=weights, conf=conf, iou=iou, model_path=model_path, threads=threads
+        )
+        load_s = time.perf_counter() - t0
+        first_inference_s = None
+        if warmup:
+            t0 = time.perf_counter()
+            base._infer([np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)])
+            first_inference_s = time.perf_counter() - t0
+        self._models[key] = base
+        self._stats[key] = ModelLoadStats(
+            backend=backend,
+            weights=weights,
+            model_id=base.model_id,
+            load_s=load_s,
+            first_inference_s=first_inference_s,
+        )
+        return base
+
+    def get(
+        self,
+        *,
+        backend: str,
+        weights: str,
+        conf: float,
+        iou: float,
+        tiling: Optional[TileConfig] = None,
+        model_path: Optional[str] = None,
+        threads: int = 0,
+        warmup: bool = True,
+    ) -> Detector:
+        key: ModelKey = (backend, weights, model_path, threads)
+        tiling = tiling or TileConfig()
+        view_key = (key, float(conf), float(iou), tiling)
+        with self._lock:
+            # la carga va dentro del lock: dos sesiones de la UI a la vez no cargan el modelo dos veces
+            base = self._models.get(key)
+            if base is None:
+                base = self._load(key, conf=conf, iou=iou, warmup=warmup)
+            else:
+                self._stats[key].hits += 1
+            detector = self._views.get(view_key)
+            if detector is None:
+                detector = copy.copy(base)
+                detector.conf, detector.iou, detector.tiling = float(conf), float(iou), tiling
+                self._views[view_key] = detector
+                while len(self._views) > self.max_views:
+                    self._views.popitem(last=False)
+            self._views.move_to_end(view_key)
+            return detector
+
+    def stats(self) -> List[ModelLoadStats]:
+        with self._lock:
+            return list(self._stats.values())
+
+    def stats_for(self, detector: Detector) -> Optional[ModelLoadStats]:
+        with self._lock:
+            for key, base in self._models.items():
+                if base.backend == detector.backend and base.model_id == detector.model_id:
+                    return self._stats[key]
+        return None
+
+    def clear(self) -> None:
+        """Suelta todos los modelos (la siguiente petición vuelve a cargar)."""
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+            self._views.clear()
+
+
+# Un registro por proceso: Streamlit re-ejecuta el script en cada interacción pero no recarga los módulos.
+_DEFAULT_REGISTRY = DetectorRegistry()
+
+
+def default_registry() -> DetectorRegistry:
+    return _DEFAULT_REGISTRY
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from uav_traffic_ai.vision.detections import DetectionArrays
+
+Tile = Tuple[int, int, int, int]  # x0, y0, x1, y1 en píxeles del frame
+
+
+@dataclass(frozen=True)
+class TileConfig:
+    """
+    Inferencia por teselas (sliced inference) para frames 4K+ con vehículos pequeños.
+    size=0 la desactiva. min_std > 0 salta las teselas sin textura (cielo, campo, asfalto liso).
+    full_frame añade la pasada normal sobre el frame completo, que recoge los vehículos grandes
+    que quedan partidos entre teselas.
+    """
+
+    size: int = 0
+    overlap: float = 0.2
+    min_std: float = 0.0
+    full_frame: bool = True
+    merge_threshold: float = 0.6  # IoS por encima del cual dos cajas de la misma clase son el mismo objeto
+    max_tiles_per_call: int = 16  # teselas por llamada a model.predict (acota la memoria)
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def cache_tag(self) -> str:
+        # parte de la clave de ResultCache: otra configuración de teselas da otras detecciones
+        if not self.enabled:
+            return ""
+        return f"tiles:{self.size}:{self.overlap}:{self.min_std}:{int(self.full_frame)}:{self.merge_threshold}"
+
+
+def _starts(total: int, size: int, step: int) -> List[int]:
+    if total <= size:
+        return [0]
+    starts = list(range(0, total - size, step))
+    starts.append(total - size)  # la última tesela pegada al borde, sin relleno
+    return starts
+
+
+def tile_grid(width: int, height: int, size: int, overlap: float) -> List[Tile]:
+    step = max(1, int(round(size * (1.0 - overlap))))
+    return [
+        (x, y, min(x + size, width), min(y + size, height))
+        for y in _starts(height, size, step)
+        for x in _starts(width, size, step)
+    ]
+
+
+def has_texture(tile_bgr: np.ndarray, min_std: float) -> bool:
+    # desviación típica sobre una submuestra 1/4: basta para distinguir una tesela lisa y cuesta ~nada
+    if min_std <= 0:
+        return True
+    return float(tile_bgr[::4, ::4].std()) >= min_std
+
+
+def box_overlap(a: np.ndarray, b: np.ndarray, metric: str = "iou") -> np.ndarray:
+    """
+    Matriz (len(a), len(b)) de solape entre cajas xyxy.
+    metric="ios" (intersección / área de la menor) detecta también un trozo de vehículo cortado
+    por el borde de una tesela frente a la caja completa de la tesela vecina.
+    """
+    a = a.astype(np.float32, copy=False)
+    b = b.astype(np.float32, copy=False)
+    iw = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    np.maximum(iw, 0, out=iw)
+    np.maximum(ih, 0, out=ih)
+    inter = iw * ih
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    if metric == "ios":
+        denom = np.minimum(area_a[:, None], area_b[None, :])
+    else:
+        denom = area_a[:, None] + area_b[None, :] - inter
+    np.maximum(denom, 1e-9, out=denom)
+    return inter / denom
+
+
+def _overlap_pairs(
+    boxes: np.ndarray, classes: np.ndarray, *, threshold: float, metric: str, chunk: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pares (i, j), i < j, de la misma clase con solape > threshold, sin construir la matriz N x N:
+    con las cajas ordenadas por x1, un bloque de filas solo puede solapar con las columnas cuyo x1
+    no pasa del x2 máximo del bloque (barrido por bandas).
+    """
+    n = len(boxes)
+    xs = np.argsort(boxes[:, 0], kind="stable")
+    bx = boxes[xs]
+    rows: List[np.ndarray] = []
+    cols: List[np.ndarray] = []
+    for s in range(0, n, chunk):
+        rb = bx[s : s + chunk]
+        hi = int(np.searchsorted(bx[:, 0], rb[:, 2].max(), side="right"))
+        r, c = np.nonzero(box_overlap(rb, bx[s:hi], metric) > threshold)
+        a, b = xs[r + s], xs[c + s]
+        rows.append(np.minimum(a, b))
+        cols.append(np.maximum(a, b))
+    i = np.concatenate(rows)
+    j = np.concatenate(cols)
+    valid = (i != j) & (classes[i] == classes[j])
+    pairs = np.unique(np.stack([i[valid], j[valid]], axis=1), axis=0)  # ordenados por i, luego j
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _greedy_suppress(pi: np.ndarray, pj: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pares (i, j) ordenados por i (rango por score). Devuelve (quién suprime, a quién)."""
+    sup = [False] * n
+    keepers: List[int] = []
+    victims: List[int] = []
+    for i, j in zip(pi.tolist(), pj.tolist()):
+        # cuando llegamos a los pares de i, ya se sabe si alguien con más score lo suprimió
+        if sup[i] or sup[j]:
+            continue
+        sup[j] = True
+        keepers.append(i)
+        victims.append(j)
+    return np.array(keepers, dtype=np.int64), np.array(victims, dtype=np.int64)
+
+
+def nms(
+    xyxy: np.ndarray,
+    scores: np.ndarray,
+    classes: np.ndarray,
+    *,
+    iou_threshold: float,
+    max_det: int = 300,
+    chunk: int = 256,
+) -> np.ndarray:
+    """NMS greedy por clase (como el de ultralytics). Índices conservados, por score descendente."""
+    n = len(scores)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-scores, kind="stable")
+    pi, pj = _overlap_pairs(xyxy[order], classes[order], threshold=iou_threshold, metric="iou", chunk=chunk)
+    _, v = _greedy_suppress(pi, pj, n)
+    suppressed = np.zeros(n, dtype=bool)
+    suppressed[v] = True
+    return order[np.flatnonzero(~suppressed)][:max_det]
+
+
+def nms_merge(
+    xyxy: np.ndarray,
+    scores: np.ndarray,
+    classes: np.ndarray,
+    *,
+    threshold: float,
+    metric: str = "ios",
+    chunk: int = 256,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    NMS greedy por clase que además fusiona: la caja que sobrevive pasa a ser la unión de las que suprime
+    (un coche partido por una costura vuelve a tener su caja completa).
+    Los solapes se calculan con NumPy por bandas (_overlap_pairs); en Python solo se recorren los pares
+    duplicados, que en un frame con teselas son los de las costuras.
+    Devuelve (índices conservados ordenados por score descendente, cajas resultantes).
+    """
+    n = len(scores)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), xyxy.reshape(0, 4)
+
+    order = np.argsort(-scores, kind="stable")
+    boxes = xyxy[order]  # a partir de aquí, índice = rango por score
+    pi, pj = _overlap_pairs(boxes, classes[order], threshold=threshold, metric=metric, chunk=chunk)
+    k, v = _greedy_suppress(pi, pj, n)
+    suppressed = np.zeros(n, dtype=bool)
+    suppressed[v] = True
+
+    merged = boxes.copy()
+    if len(k):
+        np.minimum.at(merged[:, 0], k, boxes[v, 0])
+        np.minimum.at(merged[:, 1], k, boxes[v, 1])
+        np.maximum.at(merged[:, 2], k, boxes[v, 2])
+        np.maximum.at(merged[:, 3], k, boxes[v, 3])
+
+    keep = np.flatnonzero(~suppressed)
+    return order[keep], merged[keep]
+
+
+def merge_tile_detections(
+    parts: Sequence[Tuple[DetectionArrays, int, int]], *, threshold: float
+) -> DetectionArrays:
+    """parts: (detecciones de la tesela, x0, y0). Pasa a coordenadas del frame y quita duplicados."""
+    parts = [p for p in parts if len(p[0])]
+    if not parts:
+        return DetectionArrays.empty()
+    ref = max((p[0] for p in parts), key=lambda a: len(a.names))  # todas vienen del mismo modelo
+    xyxy = np.concatenate([a.xyxy + np.array([x0, y0, x0, y0], dtype=a.xyxy.dtype) for a, x0, y0 in parts])
+    conf = np.concatenate([a.conf for a, _, _ in parts])
+    cls = np.concatenate([a.cls for a, _, _ in parts])
+    # Dos trozos de un mismo coche pueden no solaparse lo bastante entre sí y sí con la caja fusionada:
+    # se repite la pasada sobre el resultado hasta que no cambia (normalmente 2 pasadas).
+    for _ in range(3):
+        keep, xyxy = nms_merge(xyxy, conf, cls, threshold=threshold)
+        done = len(keep) == len(conf)
+        conf, cls = conf[keep], cls[keep]
+        if done:
+            break
+    return DetectionArrays(xyxy=xyxy, conf=conf, cls=cls, names=ref.names, typologies=ref.typologies)